@@ -0,0 +1,108 @@
+"""
+Benchmark of the goodput of an overloaded service with and without the admission control (see
+fast_api_users.middlewares.admission_middleware)
+
+The service is simulated: a backend (e.g. DynamoDB) serving `capacity` requests in `latency` seconds,
+slower in proportion beyond that concurrency, whose work goes on even when the client gave up.
+The clients send requests at a constant rate, as a multiple of the capacity (--load), and give up
+after --timeout seconds. The goodput is the rate of the 200 responses received in time.
+
+Usage:
+    python benchmarks/fast_api_admission.py [--loads 0.5 1 2 4] [--duration 5] [--timeout 0.5]
+"""
+import os
+import time
+import asyncio
+import argparse
+from typing import List, Optional
+
+# before the import of the app: no logs
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from starlette.types import Send, Scope, Receive  # noqa: E402
+from fast_api_users.metrics import ServiceMetrics  # noqa: E402
+from fast_api_users.middlewares.admission_middleware import AdmissionControlMiddleware  # noqa: E402
+
+from micro_core.prometheus import MetricsRegistry  # noqa: E402
+from micro_core.concurrency_limit import GradientLimit  # noqa: E402
+
+
+class Backend:
+    def __init__(self, capacity: int, latency: float):
+        self.capacity = capacity
+        self.latency = latency
+        self.in_flight = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(self.latency * max(1.0, self.in_flight / self.capacity))
+        finally:
+            self.in_flight -= 1
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def call(app, method: str) -> int:
+    status: List[int] = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    await app({"type": "http", "method": method, "path": "/users/", "headers": [], "state": {}}, receive, send)
+    return status[0]
+
+
+async def client(app, method: str, timeout: float) -> Optional[int]:
+    # the work of the backend is not cancelled when the client gives up
+    try:
+        return await asyncio.wait_for(asyncio.shield(call(app, method)), timeout)
+    except asyncio.TimeoutError:
+        return None
+
+
+async def run(admission: bool, load: float, duration: float, timeout: float, capacity: int, latency: float) -> str:
+    backend = Backend(capacity, latency)
+    app = backend
+    if admission:
+        app = AdmissionControlMiddleware(backend, GradientLimit(), ServiceMetrics(MetricsRegistry()))
+    rate = load * capacity / latency
+    requests = []
+    start = time.perf_counter()
+    for index in range(int(rate * duration)):
+        delay = start + index / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        method = "POST" if index % 5 == 0 else "GET"
+        requests.append(asyncio.create_task(client(app, method, timeout)))
+    results = await asyncio.gather(*requests)
+    # drain the backend, the abandoned work included
+    while backend.in_flight:
+        await asyncio.sleep(latency)
+    ok, shed, timed_out = results.count(200), results.count(503), results.count(None)
+    limit = f"{app.limit.limit:>6}" if isinstance(app, AdmissionControlMiddleware) else f"{'-':>6}"
+    return f"{ok / duration:>9.0f} {shed:>8} {timed_out:>9} {limit}"
+
+
+async def main(loads: List[float], duration: float, timeout: float, capacity: int, latency: float):
+    print(f"capacity {capacity / latency:.0f} requests/s, client timeout {timeout}s, {duration}s per run")
+    print(f"{'load':>5} {'admission':>10} {'goodput/s':>9} {'shed':>8} {'timed out':>9} {'limit':>6}")
+    for load in loads:
+        for admission in (False, True):
+            result = await run(admission, load, duration, timeout, capacity, latency)
+            print(f"{load:>5} {str(admission):>10} {result}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loads", type=float, nargs="+", default=[0.5, 1, 2, 4])
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--timeout", type=float, default=0.5)
+    parser.add_argument("--capacity", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    asyncio.run(main(args.loads, args.duration, args.timeout, args.capacity, args.latency))
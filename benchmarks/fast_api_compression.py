@@ -0,0 +1,74 @@
+"""
+Benchmark of the bytes saved against the CPU time of the response compression (see
+fast_api_users.middlewares.compression_middleware) on typical GET /users bodies
+
+Every body is compressed in a single chunk, like a complete response, with every available codec
+(gzip, plus br and zstd when brotli and zstandard are installed) at a few levels.
+
+Usage:
+    python benchmarks/fast_api_compression.py [--pages 10 100] [--repeat 200]
+"""
+import json
+import time
+import uuid
+import argparse
+import statistics
+from typing import Dict, List
+
+from fast_api_users.middlewares.compression_middleware import GZIP, ZSTD, BROTLI, _Compressor, available_codecs
+
+LEVELS: Dict[str, List[int]] = {GZIP: [1, 4, 6, 9], BROTLI: [1, 4, 6, 11], ZSTD: [1, 3, 6, 12]}
+
+
+def create_bodies(pages: List[int]) -> Dict[str, bytes]:
+    bodies = {}
+    for size in pages:
+        users = [
+            {
+                "user_id": str(uuid.uuid4()),
+                "name": f"name-{index}",
+                "surname": f"surname-{index}",
+                "address": f"{index} living street",
+            }
+            for index in range(size)
+        ]
+        token = "eyJ1c2VyX2lkIjogIjEyMyJ9"
+        bodies[f"users x{size}"] = json.dumps({"users": users, "next_token": token}).encode("utf-8")
+        ids = [user["user_id"] for user in users]
+        bodies[f"only_ids x{size}"] = json.dumps({"user_ids": ids, "next_token": token}).encode("utf-8")
+    return bodies
+
+
+def measure(body: bytes, codec: str, level: int, repeat: int) -> tuple:
+    """
+    Returns:
+        (tuple): the size of the compressed body and the median CPU time in microseconds
+    """
+    timings = []
+    compressed = b""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compressed = _Compressor(codec, level).compress(body, last=True)
+        timings.append((time.perf_counter() - start) * 1_000_000)
+    return len(compressed), statistics.median(timings)
+
+
+def main(pages: List[int], repeat: int):
+    print(f"codecs available: {available_codecs()}, median of {repeat} runs")
+    print(f"{'body':<16} {'bytes':>8} {'codec':>6} {'level':>6} {'compressed':>11} {'ratio':>7} {'us':>9}")
+    for name, body in create_bodies(pages).items():
+        for codec in available_codecs():
+            for level in LEVELS[codec]:
+                size, elapsed = measure(body, codec, level, repeat)
+                print(
+                    f"{name:<16} {len(body):>8} {codec:>6} {level:>6} {size:>11} "
+                    f"{size / len(body):>7.3f} {elapsed:>9.1f}"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    main(pages=args.pages, repeat=args.repeat)
@@ -0,0 +1,106 @@
+"""
+Benchmark of the throughput and the latency of fast_api_users under concurrent clients
+
+The app is served in process (httpx ASGI transport, no network), GET /users/{user_id} reads
+a fake table whose get_item sleeps for --latency milliseconds like a DynamoDB round trip.
+Two strategies are compared:
+    - inline: the blocking call runs on the event loop (the routes before the BlockingExecutor),
+      the requests are served one at a time whatever the number of clients
+    - executor: the blocking call runs on the BlockingExecutor (see fast_api_users.dependencies.executor),
+      the throughput scales with the clients up to the size of the pool
+
+Usage:
+    python benchmarks/fast_api_concurrency.py [--clients 1 8 32 64] [--requests 20] [--latency 20] [--workers 50]
+"""
+import os
+import time
+import asyncio
+import argparse
+from typing import Any, Dict, List, TypeVar, Callable, Optional
+
+# before the import of the app: the logging middleware would log every request
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx  # noqa: E402
+from fast_api_users.app import app  # noqa: E402
+from fast_api_users.dependencies.users import users_table  # noqa: E402
+from fast_api_users.dependencies.executor import BlockingExecutor, aws_executor  # noqa: E402
+
+T = TypeVar("T")
+
+
+class FakeTable:
+    def __init__(self, latency: float):
+        self._latency = latency
+
+    def get_item(self, hash_key_value: str) -> Optional[Dict[str, Any]]:
+        time.sleep(self._latency)
+        return {"user_id": hash_key_value, "name": "test", "surname": "testing", "created_at": "2023-01-01"}
+
+
+class InlineExecutor(BlockingExecutor):
+    """Runs the blocking calls on the event loop"""
+
+    def __init__(self):
+        self.max_workers = 0
+
+    async def run(self, function: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return function(*args, **kwargs)
+
+    def shutdown(self, wait: bool = True):
+        pass
+
+
+async def run_clients(clients: int, requests: int) -> List[float]:
+    """
+    Returns:
+        (List[float]): the latency in milliseconds of every request
+    """
+    latencies: List[float] = []
+    transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+
+        async def run_client(client_id: int):
+            for request in range(requests):
+                start = time.perf_counter()
+                response = await client.get(f"/users/{client_id}-{request}")
+                latencies.append((time.perf_counter() - start) * 1000)
+                response.raise_for_status()
+
+        await asyncio.gather(*(run_client(client_id) for client_id in range(clients)))
+    return latencies
+
+
+def percentile(values: List[float], rank: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * rank / 100))]
+
+
+def main(clients: List[int], requests: int, latency: float, workers: int):
+    table = FakeTable(latency=latency / 1000)
+    strategies: Dict[str, BlockingExecutor] = {
+        "inline": InlineExecutor(),
+        "executor": BlockingExecutor(max_workers=workers),
+    }
+    print(f"{requests} requests per client, get_item latency {latency} ms, executor of {workers} threads")
+    print(f"{'strategy':<10} {'clients':>8} {'rps':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    for name, executor in strategies.items():
+        app.dependency_overrides = {users_table: lambda: table, aws_executor: lambda: executor}
+        for count in clients:
+            start = time.perf_counter()
+            latencies = asyncio.run(run_clients(clients=count, requests=requests))
+            rps = len(latencies) / (time.perf_counter() - start)
+            p50, p99 = percentile(latencies, 50), percentile(latencies, 99)
+            print(f"{name:<10} {count:>8} {rps:>10.1f} {p50:>10.1f} {p99:>10.1f}")
+        executor.shutdown()
+    app.dependency_overrides = {}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=20.0)
+    parser.add_argument("--workers", type=int, default=50)
+    args = parser.parse_args()
+    main(clients=args.clients, requests=args.requests, latency=args.latency, workers=args.workers)
@@ -0,0 +1,108 @@
+"""
+Benchmark of the overhead of the fast_api_users middlewares on the /users/health route
+
+The same route is served in process (httpx ASGI transport, no network) by three apps:
+    - none: no middleware, the baseline
+    - base_http: the previous CorrelationIdMiddleware and LoggingMiddleware (two BaseHTTPMiddleware,
+      every one runs the app in a task and copies the body through a memory stream)
+    - pure_asgi: the RequestContextMiddleware (see fast_api_users.middlewares.request_context_middleware)
+The logs are written to a discarded stream, so that the figures include the logging.
+
+Usage:
+    python benchmarks/fast_api_middlewares.py [--requests 2000] [--clients 1]
+"""
+import io
+import os
+import time
+import uuid
+import asyncio
+import logging
+import argparse
+import statistics
+from typing import Dict, List
+
+# before the import of the app: the logs are redirected below
+os.environ.setdefault("LOG_LEVEL", "INFO")
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from fast_api_users.app import health  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+from fast_api_users.middlewares.request_context_middleware import RequestContextMiddleware  # noqa: E402
+
+
+class CorrelationIdMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        request.state.correlation_id = request.headers.get("x-correlation-id", str(uuid.uuid4()))
+        response = await call_next(request)
+        response.headers["x-correlation-id"] = request.state.correlation_id
+        return response
+
+
+class LoggingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        logger = logging.getLogger()
+        req_uuid = request.state.correlation_id
+        logger.info(
+            "Request",
+            extra={"uuid": req_uuid, "type": "api-request", "method": request.method, "url": str(request.url)},
+        )
+        response = await call_next(request)
+        logger.info("Response sent", extra={"uuid": req_uuid, "type": "api-response", "code": response.status_code})
+        return response
+
+
+def build_apps() -> Dict[str, FastAPI]:
+    apps: Dict[str, FastAPI] = {}
+    for name in ["none", "base_http", "pure_asgi"]:
+        app = apps[name] = FastAPI()
+        app.get("/users/health")(health)
+    apps["base_http"].add_middleware(LoggingMiddleware)
+    apps["base_http"].add_middleware(CorrelationIdMiddleware)
+    apps["pure_asgi"].add_middleware(RequestContextMiddleware)
+    return apps
+
+
+async def run_requests(app: FastAPI, requests: int, clients: int) -> List[float]:
+    """
+    Returns:
+        (List[float]): the latency in microseconds of every request
+    """
+    latencies: List[float] = []
+    transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+
+        async def run_client():
+            for _ in range(requests // clients):
+                start = time.perf_counter()
+                response = await client.get("/users/health")
+                latencies.append((time.perf_counter() - start) * 1_000_000)
+                response.raise_for_status()
+
+        await asyncio.gather(*(run_client() for _ in range(clients)))
+    return latencies
+
+
+def main(requests: int, clients: int):
+    root = logging.getLogger()
+    for handler in root.handlers:
+        if isinstance(handler, logging.StreamHandler):
+            handler.setStream(io.StringIO())
+    print(f"{requests} requests, {clients} clients")
+    print(f"{'middlewares':<12} {'rps':>10} {'p50 us':>10} {'p99 us':>10}")
+    for name, app in build_apps().items():
+        asyncio.run(run_requests(app, requests=min(requests, 100), clients=clients))  # warm up
+        start = time.perf_counter()
+        latencies = asyncio.run(run_requests(app, requests=requests, clients=clients))
+        rps = len(latencies) / (time.perf_counter() - start)
+        p50 = statistics.median(latencies)
+        p99 = sorted(latencies)[int(len(latencies) * 0.99) - 1]
+        print(f"{name:<12} {rps:>10.1f} {p50:>10.1f} {p99:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=1)
+    args = parser.parse_args()
+    main(requests=args.requests, clients=args.clients)
@@ -0,0 +1,90 @@
+"""
+Benchmark of the CPU time spent building and serializing a page of GET /users
+
+Two paths render the same page of DynamoDB items:
+    - response_model: the previous path, pick_keys and UserIterator, then the validation of the
+      response_model and jsonable_encoder by FastAPI (serialize_response) and the JSONResponse
+    - fast: the precompiled ModelProjection of User rendered by the FastJSONResponse (orjson if installed)
+      (see fast_api_users.models.serialization)
+
+Usage:
+    python benchmarks/fast_api_serialization.py [--items 100] [--repeat 2000]
+"""
+import os
+import time
+import uuid
+import asyncio
+import argparse
+import statistics
+from typing import Any, Dict, List, Callable, Awaitable
+
+# before the import of the app: no logs
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from fastapi.routing import APIRoute, serialize_response  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fast_api_users.app import app  # noqa: E402
+from fast_api_users.models.users_model import User, UserIterator  # noqa: E402
+from fast_api_users.models.serialization import FastJSONResponse, orjson  # noqa: E402
+from fast_api_users.routers.users_router import USER_PROJECTION  # noqa: E402
+
+from micro_core.utils import pick_keys  # noqa: E402
+
+
+def create_items(count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "user_id": str(uuid.uuid4()),
+            "name": f"name-{index}",
+            "surname": f"surname-{index}",
+            "address": f"{index} living street",
+            "created_at": "2023-01-01T00:00:00",
+        }
+        for index in range(count)
+    ]
+
+
+def get_users_route() -> APIRoute:
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.path == "/users/" and "GET" in route.methods:
+            return route
+    raise Exception("Route GET /users/ not found")
+
+
+async def measure(render: Callable[[], Awaitable[bytes]], repeat: int) -> List[float]:
+    """Time in microseconds of every render, CPU bound: no I/O"""
+    await render()  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await render()
+        timings.append((time.perf_counter() - start) * 1_000_000)
+    return timings
+
+
+async def main(items: int, repeat: int):
+    page = create_items(items)
+    route = get_users_route()
+
+    async def response_model() -> bytes:
+        content = UserIterator(users=pick_keys(dicts=page, keys=User.__fields__.keys()), next_token="token")
+        serialized = await serialize_response(field=route.response_field, response_content=content)
+        return JSONResponse(serialized).body
+
+    async def fast() -> bytes:
+        return FastJSONResponse({"users": USER_PROJECTION.project_all(page), "next_token": "token"}).body
+
+    print(f"page of {items} users, {repeat} renders, json library: {'orjson' if orjson else 'json'}")
+    print(f"{'path':<16} {'mean us':>10} {'p50 us':>10} {'bytes':>8}")
+    for name, render in [("response_model", response_model), ("fast", fast)]:
+        timings = await measure(render, repeat)
+        size = len(await render())
+        print(f"{name:<16} {statistics.mean(timings):>10.1f} {statistics.median(timings):>10.1f} {size:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(items=args.items, repeat=args.repeat))
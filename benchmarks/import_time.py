@@ -0,0 +1,90 @@
+"""
+Benchmark of the import time of the Lambda handlers, the part of the cold start spent before the
+handler runs, with a budget per service to catch the regressions
+
+Every module is imported in a fresh interpreter with `python -X importtime`, the breakdown sums
+the self time of the modules by top-level package (e.g. boto3, fastapi, micro_aws).
+The AWS_EXECUTION_ENV variable is removed, so that the init phase of the services is not run.
+
+Usage:
+    python benchmarks/import_time.py [--repeat 5] [--top 8] [--scale 1.0] [module ...]
+
+The exit code is 1 when the median import time of a module is over its budget (times the scale,
+to adapt the budgets to slower machines).
+"""
+import os
+import sys
+import argparse
+import subprocess
+from typing import Dict, List, Tuple, Optional
+from collections import defaultdict
+
+# milliseconds, measured on a developer laptop with a margin of ~50%
+BUDGETS: Dict[str, float] = {
+    "sqs_users_processor.app": 100,
+    "sqs_batch_processing.app": 450,
+    "fast_api_users.app": 450,
+    "powertools_hello_world.app": 450,
+}
+
+
+def import_times(module: str) -> Tuple[float, Dict[str, float]]:
+    """
+    Returns:
+        (Tuple):
+            total (float): the cumulative import time of the module in milliseconds
+            packages (Dict[str, float]): the self import time in milliseconds by top-level package
+    """
+    env = {name: value for name, value in os.environ.items() if name != "AWS_EXECUTION_ENV"}
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total: Optional[float] = None
+    packages: Dict[str, float] = defaultdict(float)
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        packages[name.strip().split(".")[0]] += int(self_us) / 1000
+        if name.strip() == module:
+            total = int(cumulative_us) / 1000
+    if total is None:
+        raise Exception(f"Module={module} not found in the import time output")
+    return total, packages
+
+
+def benchmark(module: str, repeat: int) -> Tuple[float, Dict[str, float]]:
+    """Median import time of the module, with the breakdown of the median run"""
+    import_times(module)  # warm up the bytecode cache
+    runs = sorted((import_times(module) for _ in range(repeat)), key=lambda run: run[0])
+    return runs[len(runs) // 2]
+
+
+def main(modules: List[str], repeat: int, top: int, scale: float) -> int:
+    over_budget = []
+    for module in modules:
+        total, packages = benchmark(module, repeat)
+        budget = BUDGETS.get(module)
+        limit = budget * scale if budget else None
+        status = "no budget" if limit is None else ("OVER BUDGET" if total > limit else "ok")
+        print(f"{module}: {total:.1f} ms (budget {f'{limit:.0f} ms' if limit else '-'}) {status}")
+        for package, elapsed in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+            print(f"    {package:<30} {elapsed:>8.1f} ms")
+        if limit is not None and total > limit:
+            over_budget.append(module)
+    print(f"median of {repeat} runs, budgets scaled by {scale}: {len(over_budget)} over budget")
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=list(BUDGETS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--scale", type=float, default=1.0)
+    args = parser.parse_args()
+    sys.exit(main(modules=args.modules, repeat=args.repeat, top=args.top, scale=args.scale))
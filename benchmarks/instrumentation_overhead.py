@@ -0,0 +1,71 @@
+"""
+Benchmark of the overhead of the invocation metrics (see micro_aws.instrumentation)
+
+The handler processes a batch of no-op records inside a few phases, so that the figures
+are the cost of the instrumentation itself: with no sink (disabled), an in-memory sink
+and the EMF sink writing to a discarded stream.
+
+Usage:
+    python benchmarks/instrumentation_overhead.py [--repeat 2000] [--records 10]
+"""
+import io
+import argparse
+import statistics
+from timeit import default_timer
+from typing import Any, Dict, List, Optional
+
+from micro_aws.base_handler import BaseLambdaHandler
+from micro_aws.instrumentation import EmfSink, MetricsSink, InMemorySink
+
+
+class Context:
+    def get_remaining_time_in_millis(self) -> int:
+        return 60_000
+
+
+class Handler(BaseLambdaHandler):
+    def handle_request(self, event: Dict[str, Any], context: Any, **kwargs: Any) -> List[int]:
+        with self.instrumentation.phase("parse"):
+            records = list(event["records"])
+        return self.process_within_budget(items=records, process=self._process, context=context)
+
+    def _process(self, records: List[int]):
+        with self.instrumentation.phase("dynamodb"):
+            pass
+        with self.instrumentation.phase("s3"):
+            pass
+        for _ in records:
+            self.instrumentation.observe("record", 0.1)
+
+
+def run(sink: Optional[MetricsSink], records: int, repeat: int) -> float:
+    """Median time in microseconds of a single invocation"""
+    handler = Handler()
+    handler.metrics_sink = sink
+    event = {"records": list(range(records))}
+    context = Context()
+    timings = []
+    for _ in range(repeat):
+        start = default_timer()
+        handler(event, context)
+        timings.append(default_timer() - start)
+    return statistics.median(timings) * 1_000_000
+
+
+def main(repeat: int, records: int):
+    sinks: Dict[str, Optional[MetricsSink]] = {
+        "disabled": None,
+        "in-memory": InMemorySink(),
+        "emf": EmfSink(namespace="Benchmark", dimensions={"Service": "benchmark"}, stream=io.StringIO()),
+    }
+    print(f"{'sink':>10} {'invocation us':>14}")
+    for name, sink in sinks.items():
+        print(f"{name:>10} {run(sink, records, repeat):>14.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--records", type=int, default=10)
+    args = parser.parse_args()
+    main(repeat=args.repeat, records=args.records)
@@ -0,0 +1,85 @@
+"""
+Benchmark of the CPU cost against the bytes saved by the SQS message compression
+(see micro_core.compression and micro_aws.sqs_queue.SqsQueue)
+
+SQS charges every 64 KB chunk of a payload as a separate request, so the interesting
+figure is how many chunks we save per message and how much CPU it costs on both sides.
+
+Usage:
+    python benchmarks/sqs_compression.py [--repeat 200]
+"""
+import json
+import uuid
+import random
+import argparse
+import statistics
+from timeit import default_timer
+from typing import Any, Dict, List, Callable
+
+from micro_core.utils import AwsEncoder
+from micro_core.compression import GZIP, DEFLATE, compress_body, decompress_body
+
+SQS_CHUNK_SIZE = 64 * 1024
+
+# number of users events per message, from a single event to a large fan-out
+PAYLOAD_SIZES = [1, 10, 100, 500, 1500]
+LEVELS = [1, 6, 9]
+
+
+def user_event(index: int) -> Dict[str, Any]:
+    return {
+        "action": random.choice(["create-user", "delete-user"]),
+        "user_id": str(uuid.uuid4()),
+        "user": {
+            "name": f"name-{index}",
+            "surname": f"surname-{index}",
+            "address": f"{random.randint(1, 200)} Main Street, Dublin",
+        },
+    }
+
+
+def payload(events: int) -> str:
+    body: List[Dict[str, Any]] = [user_event(index) for index in range(events)]
+    return json.dumps(body, cls=AwsEncoder)
+
+
+def timeit(function: Callable[[], Any], repeat: int) -> float:
+    """Median time in microseconds of a single call"""
+    timings = []
+    for _ in range(repeat):
+        start = default_timer()
+        function()
+        timings.append(default_timer() - start)
+    return statistics.median(timings) * 1_000_000
+
+
+def chunks(size: int) -> int:
+    return -(-size // SQS_CHUNK_SIZE)
+
+
+def main(repeat: int):
+    random.seed(42)
+    print(
+        f"{'events':>7} {'codec':>8} {'level':>5} {'raw B':>9} {'sent B':>9} {'ratio':>6} "
+        f"{'chunks':>9} {'enc us':>9} {'dec us':>9}"
+    )
+    for events in PAYLOAD_SIZES:
+        body = payload(events)
+        raw_size = len(body.encode("utf-8"))
+        for codec in [GZIP, DEFLATE]:
+            for level in LEVELS:
+                compressed, applied = compress_body(body=body, codec=codec, threshold=0, level=level)
+                sent_size = len(compressed)
+                encode_us = timeit(lambda: compress_body(body=body, codec=codec, threshold=0, level=level), repeat)
+                decode_us = timeit(lambda: decompress_body(body=compressed, codec=applied), repeat)
+                print(
+                    f"{events:>7} {codec:>8} {level:>5} {raw_size:>9} {sent_size:>9} "
+                    f"{sent_size / raw_size:>6.2f} {chunks(raw_size):>4}->{chunks(sent_size):<4} "
+                    f"{encode_us:>9.1f} {decode_us:>9.1f}"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    main(repeat=parser.parse_args().repeat)
@@ -1,8 +1,123 @@
+from __future__ import annotations
+
+import time
 from abc import ABC, abstractmethod
-from typing import Any, Dict
+from typing import Any, Dict, List, TypeVar, Callable, Iterator, Optional, Sequence
+from contextlib import contextmanager
+
+from micro_core.utils import chunked
+from micro_aws.instrumentation import NULL_INSTRUMENTATION, MetricsSink, Instrumentation, start_invocation
+
+T = TypeVar("T")
+
+# seconds kept free before the Lambda timeout, to report the outcome of the invocation
+DEFAULT_SAFETY_MARGIN = 0.5
+# weight of the last sample in the exponentially weighted moving average
+DEFAULT_SMOOTHING = 0.3
+
+
+class LatencyEstimator:
+    """
+    Exponentially weighted moving average of the seconds needed to process a single record
+
+    Remarks:
+        The handler instance lives as long as the Lambda container, so does the estimate:
+        the first invocations of a cold container have no estimate and process every record.
+    """
+
+    def __init__(self, smoothing: float = DEFAULT_SMOOTHING):
+        """
+        Args:
+            smoothing (float): the weight of the last sample, between 0 (ignore it) and 1 (only the last sample
+                counts). Optional, defaulted to 0.3.
+
+        Raises:
+            ValueError: the smoothing is not between 0 and 1
+        """
+        if not 0 < smoothing <= 1:
+            raise ValueError(f"Invalid smoothing={smoothing}, expected a value in (0, 1]")
+        self._smoothing = smoothing
+        self.value: Optional[float] = None
+
+    def update(self, elapsed: float, count: int = 1):
+        """
+        Args:
+            elapsed (float): the seconds needed to process the records
+            count (int): the number of records processed. Optional, defaulted to 1.
+        """
+        sample = elapsed / max(count, 1)
+        if self.value is None:
+            self.value = sample
+        else:
+            self.value += self._smoothing * (sample - self.value)
+
+
+class TimeBudget:
+    """
+    Time left to the current invocation before the Lambda timeout
+
+    Reference:
+        https://docs.aws.amazon.com/lambda/latest/dg/python-context.html
+    """
+
+    def __init__(
+        self,
+        context: Any,
+        estimator: LatencyEstimator,
+        safety_margin: float = DEFAULT_SAFETY_MARGIN,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            context (object): the Lambda context, it provides get_remaining_time_in_millis
+            estimator (LatencyEstimator): the estimate of the seconds needed to process a record
+            safety_margin (float): the seconds kept free before the timeout. Optional, defaulted to 0.5.
+            clock (Callable[[], float]): the monotonic clock in seconds. Optional, defaulted to time.monotonic.
+        """
+        self._clock = clock
+        self._deadline = clock() + context.get_remaining_time_in_millis() / 1000
+        self._estimator = estimator
+        self._safety_margin = safety_margin
+
+    def remaining(self) -> float:
+        """
+        Returns:
+            (float): the seconds left before the timeout, minus the safety margin
+        """
+        return self._deadline - self._safety_margin - self._clock()
+
+    def can_start(self, count: int = 1) -> bool:
+        """
+        Returns:
+            (bool): True if the projected finish of the next records comes before the deadline minus
+                the safety margin
+        """
+        return (self._estimator.value or 0.0) * count <= self.remaining()
+
+    @contextmanager
+    def measure(self, count: int = 1) -> Iterator[None]:
+        """
+        Update the latency estimate with the time spent in the block
+
+        Args:
+            count (int): the number of records processed in the block. Optional, defaulted to 1.
+        """
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self._estimator.update(self._clock() - start, count)
 
 
 class BaseLambdaHandler(ABC):
+    # see TimeBudget, the handlers can override them
+    safety_margin: float = DEFAULT_SAFETY_MARGIN
+    smoothing: float = DEFAULT_SMOOTHING
+    _latency_estimator: Optional[LatencyEstimator] = None
+    # see micro_aws.instrumentation, the metrics are collected only when a sink is set
+    metrics_sink: Optional[MetricsSink] = None
+    instrumentation: Instrumentation = NULL_INSTRUMENTATION
+
     def __call__(self, event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         """
         Entry point of the order processing
@@ -23,8 +138,74 @@ class BaseLambdaHandler(ABC):
         >>>
         >>> if os.environ.get('AWS_EXECUTION_ENV'):
         >>>     lambda_handler = NewHandler()
+        >>>     # optional, one EMF line with the metrics of every invocation
+        >>>     lambda_handler.metrics_sink = EmfSink(namespace="MicroAws")
+        """
+        if self.metrics_sink is None:
+            return self.handle_request(event=event, context=context)
+        self.instrumentation = start_invocation()
+        try:
+            return self.handle_request(event=event, context=context)
+        finally:
+            self.metrics_sink.emit(self.instrumentation.finish())
+            self.instrumentation = NULL_INSTRUMENTATION
+
+    def time_budget(self, context: Any, clock: Callable[[], float] = time.monotonic) -> TimeBudget:
+        """
+        Args:
+            context (object): Object that provides methods, properties and information about the invocation,
+                function, and execution environment.
+            clock (Callable[[], float]): the monotonic clock in seconds. Optional, defaulted to time.monotonic.
+
+        Returns:
+            (TimeBudget): the time budget of the invocation, the latency estimate is shared by all the
+                invocations of the handler
+        """
+        if self._latency_estimator is None:
+            self._latency_estimator = LatencyEstimator(smoothing=self.smoothing)
+        return TimeBudget(
+            context=context,
+            estimator=self._latency_estimator,
+            safety_margin=self.safety_margin,
+            clock=clock,
+        )
+
+    def process_within_budget(
+        self,
+        items: Sequence[T],
+        process: Callable[[List[T]], None],
+        context: Any,
+        chunk_size: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> List[T]:
+        """
+        Process the items in chunks, as long as the projected finish of the next chunk comes
+        before the Lambda timeout (see TimeBudget)
+
+        Remarks:
+            A batch that runs into the timeout is retried as a whole, stopping early lets the handler
+            report the outcome of the items processed and retry only the remaining ones.
+
+        Args:
+            items (Sequence[T]): the items to process (e.g. records)
+            process (Callable[[List[T]], None]): the function that processes a chunk of items
+            context (object): Object that provides methods, properties and information about the invocation,
+                function, and execution environment.
+            chunk_size (int): the number of items passed to every process call. Optional, defaulted to 1.
+            clock (Callable[[], float]): the monotonic clock in seconds. Optional, defaulted to time.monotonic.
+
+        Returns:
+            (List[T]): the items not processed, in their original order
         """
-        return self.handle_request(event=event, context=context)
+        budget = self.time_budget(context=context, clock=clock)
+        processed = 0
+        for chunk in chunked(items, chunk_size):
+            if not budget.can_start(len(chunk)):
+                break
+            with budget.measure(len(chunk)):
+                process(chunk)
+            processed += len(chunk)
+        return list(items[processed:])
 
     @abstractmethod
     def handle_request(
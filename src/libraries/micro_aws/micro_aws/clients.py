@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import os
+import time
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple, Callable, Optional
+from dataclasses import field, dataclass
+
+# boto3 is imported when the first client is built, not at import time (see the Lambda cold start)
+if TYPE_CHECKING:
+    from boto3.session import Session
+    from botocore.config import Config
+
+LOGGER = logging.getLogger()
+
+DEFAULT_PROFILE = "default"
+# prefix of the environment variables read by ClientProfile.from_env
+ENV_PREFIX = "MICRO_AWS_"
+
+# called after every API call: service (e.g. dynamodb), operation (e.g. GetItem), seconds, error code or None
+CallObserver = Callable[[str, str, float, Optional[str]], None]
+_STARTED_AT = "micro_aws_started_at"
+
+
+@dataclass(frozen=True)
+class ClientProfile:
+    """
+    Settings of the boto3 clients built by a ClientRegistry
+
+    Attributes:
+        name (str): the name of the profile
+        max_pool_connections (int): the size of the connection pool of every client, it bounds the number
+            of requests sent in parallel by the threads sharing the client (botocore default: 10)
+        connect_timeout (float): seconds to establish a connection (botocore default: 60)
+        read_timeout (float): seconds to wait for a response (botocore default: 60)
+        retry_mode (str): legacy, standard or adaptive (client side rate limiting on throttling)
+        max_attempts (int): the max number of attempts of a request, first one included
+        tcp_keepalive (bool): keep the idle connections of the pool alive
+        region_name (Optional[str]): the region of the clients, None to use the AWS_REGION of the environment
+        endpoint_url (Optional[str]): the endpoint of every service (e.g. localstack), None for the AWS ones
+        endpoint_urls (Dict[str, str]): the endpoint of a single service (e.g. dynamodb local), it overrides
+            endpoint_url
+
+    Reference:
+        https://botocore.amazonaws.com/v1/documentation/api/latest/reference/config.html
+        https://boto3.amazonaws.com/v1/documentation/api/latest/guide/retries.html
+    """
+
+    name: str = DEFAULT_PROFILE
+    max_pool_connections: int = 50
+    connect_timeout: float = 2.0
+    read_timeout: float = 10.0
+    retry_mode: str = "adaptive"
+    max_attempts: int = 5
+    tcp_keepalive: bool = True
+    region_name: Optional[str] = None
+    endpoint_url: Optional[str] = None
+    endpoint_urls: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_env(cls, name: str = DEFAULT_PROFILE) -> ClientProfile:
+        """
+        Build the profile from the MICRO_AWS_* environment variables, the missing ones keep the defaults
+        (e.g. MICRO_AWS_MAX_POOL_CONNECTIONS, MICRO_AWS_READ_TIMEOUT, MICRO_AWS_ENDPOINT_URL_DYNAMODB)
+        """
+
+        def env(key: str) -> Optional[str]:
+            return os.getenv(f"{ENV_PREFIX}{key}") or None
+
+        defaults = cls(name=name)
+        endpoint_prefix = f"{ENV_PREFIX}ENDPOINT_URL_"
+        return cls(
+            name=name,
+            max_pool_connections=int(env("MAX_POOL_CONNECTIONS") or defaults.max_pool_connections),
+            connect_timeout=float(env("CONNECT_TIMEOUT") or defaults.connect_timeout),
+            read_timeout=float(env("READ_TIMEOUT") or defaults.read_timeout),
+            retry_mode=env("RETRY_MODE") or defaults.retry_mode,
+            max_attempts=int(env("MAX_ATTEMPTS") or defaults.max_attempts),
+            tcp_keepalive=(env("TCP_KEEPALIVE") or str(defaults.tcp_keepalive)).lower() == "true",
+            region_name=env("REGION_NAME"),
+            endpoint_url=env("ENDPOINT_URL"),
+            endpoint_urls={
+                key.removeprefix(endpoint_prefix).lower(): value
+                for key, value in os.environ.items()
+                if key.startswith(endpoint_prefix) and value
+            },
+        )
+
+    def config(self) -> Config:
+        from botocore.config import Config
+
+        return Config(
+            max_pool_connections=self.max_pool_connections,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            retries={"mode": self.retry_mode, "total_max_attempts": self.max_attempts},
+            tcp_keepalive=self.tcp_keepalive,
+        )
+
+    def service_endpoint_url(self, service_name: str) -> Optional[str]:
+        return self.endpoint_urls.get(service_name, self.endpoint_url)
+
+
+def observe_calls(client: Any, observer: CallObserver):
+    """
+    Report the latency and the outcome of every API call of the client (retries included) to the observer,
+    through the botocore events of the client
+
+    Remarks:
+        The observer runs in the thread of the call, it has to be cheap (e.g. a histogram) and must not raise.
+        Registering the same observer twice on a client has no effect.
+
+    Reference:
+        https://boto3.amazonaws.com/v1/documentation/api/latest/guide/events.html
+    """
+
+    def before_call(context: Dict[str, Any], **kwargs: Any):
+        context[_STARTED_AT] = time.perf_counter()
+
+    def report(event_name: str, context: Dict[str, Any], error: Optional[str]):
+        started_at = context.get(_STARTED_AT)
+        if started_at is None:
+            return
+        # event_name is <event>.<service>.<operation>
+        _, service, operation = event_name.split(".", 2)
+        observer(service, operation, time.perf_counter() - started_at, error)
+
+    def after_call(event_name: str, http_response: Any, parsed: Dict[str, Any], context: Dict[str, Any], **kwargs: Any):
+        error = None
+        if http_response.status_code >= 300:
+            error = parsed.get("Error", {}).get("Code") or str(http_response.status_code)
+        report(event_name, context, error)
+
+    def after_call_error(event_name: str, exception: Exception, context: Dict[str, Any], **kwargs: Any):
+        report(event_name, context, type(exception).__name__)
+
+    events = client.meta.events
+    unique_id = f"micro_aws_observer_{id(observer)}"
+    events.register("before-call", before_call, unique_id=f"{unique_id}_before")
+    events.register("after-call", after_call, unique_id=f"{unique_id}_after")
+    events.register("after-call-error", after_call_error, unique_id=f"{unique_id}_error")
+
+
+class ClientRegistry:
+    """
+    The boto3 clients of a process, built once from a ClientProfile and shared by all the threads
+
+    Remarks:
+        A registry owns its boto3 Session: the default session is not thread safe.
+        The clients are thread safe and shared, so that every thread uses the same connection pool
+        (see ClientProfile.max_pool_connections). The resources are not thread safe: every thread
+        gets its own resource. The resources of a service share a client of their own, apart from the
+        client returned by ClientRegistry.client: a resource registers handlers on the events of its
+        client (e.g. the serialization of the typed values of DynamoDB) that would change the raw client.
+        A resource is only changed by load, reload and the lazy loading of its attributes: once loaded, a resource
+        used for its actions alone can be shared by threads, e.g. DynamoDBTable loads its Table at creation, then
+        its actions only read the identifiers of the Table and send the requests with the thread safe client.
+
+    Reference:
+        https://boto3.amazonaws.com/v1/documentation/api/latest/guide/clients.html#multithreading-or-multiprocessing-with-clients
+        https://boto3.amazonaws.com/v1/documentation/api/latest/guide/resources.html#multithreading-or-multiprocessing-with-resources
+
+    Example:
+    >>> registry = get_registry()
+    >>> registry.warm("dynamodb", "describe_table", TableName="users")
+    >>> table = registry.resource("dynamodb").Table("users")
+    """
+
+    def __init__(self, profile: ClientProfile):
+        self.profile = profile
+        self._lock = threading.Lock()
+        self._session: Optional[Session] = None
+        self._clients: Dict[str, Any] = {}
+        self._resources = threading.local()
+        # service name -> (class of the resource, client shared by the resources of the threads)
+        self._resource_classes: Dict[str, Tuple[Any, Any]] = {}
+        self._observers: List[CallObserver] = []
+
+    def _get_session(self) -> Session:
+        if self._session is None:
+            import boto3
+
+            self._session = boto3.session.Session(region_name=self.profile.region_name)
+        return self._session
+
+    def client(self, service_name: str) -> Any:
+        """
+        Returns:
+            (Any): the boto3 client of the service, the same instance for every call
+        """
+        client = self._clients.get(service_name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(service_name)
+                if client is None:
+                    client = self._get_session().client(
+                        service_name,
+                        config=self.profile.config(),
+                        endpoint_url=self.profile.service_endpoint_url(service_name),
+                    )
+                    for observer in self._observers:
+                        observe_calls(client, observer)
+                    self._clients[service_name] = client
+        return client
+
+    def add_call_observer(self, observer: CallObserver):
+        """
+        Report every API call of the clients of the registry, current and future ones, to the observer
+        (see observe_calls)
+        """
+        with self._lock:
+            self._observers.append(observer)
+            for client in self._clients.values():
+                observe_calls(client, observer)
+            for _, client in self._resource_classes.values():
+                observe_calls(client, observer)
+
+    def resource(self, service_name: str) -> Any:
+        """
+        Returns:
+            (Any): the boto3 resource of the service for the current thread, on the client shared by the
+                resources of the service
+        """
+        resources: Dict[str, Any] = self._resources.__dict__.setdefault("resources", {})
+        resource = resources.get(service_name)
+        if resource is None:
+            with self._lock:
+                shared = self._resource_classes.get(service_name)
+                if shared is None:
+                    # the class of the resource and its client are built once, the client is kept for the resources
+                    resource = self._get_session().resource(
+                        service_name,
+                        config=self.profile.config(),
+                        endpoint_url=self.profile.service_endpoint_url(service_name),
+                    )
+                    for observer in self._observers:
+                        observe_calls(resource.meta.client, observer)
+                    self._resource_classes[service_name] = (type(resource), resource.meta.client)
+                else:
+                    resource_class, client = shared
+                    resource = resource_class(client=client)
+            resources[service_name] = resource
+        return resource
+
+    def warm(self, service_name: str, operation: Optional[str] = None, **kwargs: Any):
+        """
+        Build the client during the init phase, optionally sending a request to open a connection
+        of the pool (DNS resolution, TCP and TLS handshakes)
+
+        Args:
+            service_name (str): the name of the service (e.g. s3, dynamodb)
+            operation (Optional[str]): the name of a cheap client method (e.g. head_bucket), None to
+                only build the client. Optional, defaulted to None.
+            **kwargs (Any): the params of the operation
+        """
+        client = self.client(service_name)
+        if not operation:
+            return
+        try:
+            getattr(client, operation)(**kwargs)
+        except Exception as exc:
+            # the connection is open even if the request is rejected (e.g. access denied)
+            LOGGER.debug("Warm up of service=%s operation=%s failed: %s", service_name, operation, exc)
+
+
+_registries: Dict[str, ClientRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(profile: Optional[ClientProfile] = None) -> ClientRegistry:
+    """
+    Args:
+        profile (Optional[ClientProfile]): the profile of the clients, None to read the default one from
+            the environment (see ClientProfile.from_env). Optional, defaulted to None.
+
+    Returns:
+        (ClientRegistry): the registry of the profile, the same instance for every call with the same profile name
+    """
+    name = profile.name if profile else DEFAULT_PROFILE
+    with _registries_lock:
+        registry = _registries.get(name)
+        if registry is None:
+            registry = _registries[name] = ClientRegistry(profile or ClientProfile.from_env(name))
+        elif profile and profile != registry.profile:
+            raise ValueError(f"Profile={name} already registered with different settings")
+    return registry
@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import time
+import queue
+import logging
+import threading
+from typing import Any, Dict, List, Generic, TypeVar, Callable, Hashable, Optional, Sequence
+from itertools import islice
+from dataclasses import field, dataclass
+
+LOGGER = logging.getLogger()
+
+T = TypeVar("T")
+
+# boto3 default max_pool_connections, more threads would queue on the connection pool
+DEFAULT_CONCURRENCY = 10
+
+
+class DispatchTimeoutError(TimeoutError):
+    """The record took longer than the timeout of the dispatcher, its outcome is unknown"""
+
+
+class SkippedRecordError(Exception):
+    """The record was not processed because a previous record with the same key failed"""
+
+
+@dataclass
+class DispatchResult:
+    """
+    Outcome of the records dispatched, keyed by the index of the record
+
+    Attributes:
+        results (Dict[int, Any]): the value returned by the processing of the successful records
+        failures (Dict[int, Exception]): the exception of the failed records
+    """
+
+    results: Dict[int, Any] = field(default_factory=dict)
+    failures: Dict[int, Exception] = field(default_factory=dict)
+
+
+class _Lane:
+    """The indexes of the records with the same key, processed one after the other"""
+
+    def __init__(self, indexes: List[int]):
+        self.indexes = indexes
+        self.position = 0
+        self.started_at: Optional[float] = None
+        self.closed = False
+        self.timed_out = False
+
+
+class _Dispatch(Generic[T]):
+    """
+    A single dispatch: the lanes are pulled from a queue by worker threads, a worker whose lane timed out
+    is abandoned and replaced, so that the concurrency is preserved
+    """
+
+    def __init__(
+        self, dispatcher: KeyedDispatcher, items: Sequence[T], process: Callable[[T], Any], lanes: List[_Lane]
+    ):
+        self._dispatcher = dispatcher
+        self._items = items
+        self._process = process
+        self._lanes = lanes
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._condition = threading.Condition()
+        self._open_lanes = len(lanes)
+        self._workers = 0
+        self.result = DispatchResult()
+
+    def _close(self, lane: _Lane, exc: Optional[Exception] = None):
+        """Mark the lane as done, the records left are failed with exc"""
+        if exc:
+            for index in islice(lane.indexes, lane.position, None):
+                self.result.failures[index] = exc
+        lane.closed = True
+        self._open_lanes -= 1
+        self._condition.notify_all()
+
+    def _advance(self, lane: _Lane):
+        """Move the lane past its current record, in the critical section that stores the outcome of the record"""
+        lane.position += 1
+        lane.started_at = None
+        if lane.position >= len(lane.indexes):
+            self._close(lane)
+
+    def _run_record(self, lane: _Lane, index: int) -> bool:
+        """
+        Returns:
+            (bool): True if the following records of the lane can be processed
+        """
+        try:
+            value = self._process(self._items[index])
+        except Exception as exc:
+            with self._condition:
+                if lane.closed:
+                    return False
+                self.result.failures[index] = exc
+                self._advance(lane)
+                if self._dispatcher.stop_key_on_failure and not lane.closed:
+                    self._close(lane, SkippedRecordError(f"Previous record with the same key failed: {exc!r}"))
+                return not lane.closed
+        with self._condition:
+            if lane.closed:
+                return False
+            self.result.results[index] = value
+            self._advance(lane)
+            return not lane.closed
+
+    def _run_lane(self, lane: _Lane) -> bool:
+        """
+        Returns:
+            (bool): False if the lane was abandoned because of a timeout, its thread has been replaced
+        """
+        for index in lane.indexes:
+            with self._condition:
+                if lane.closed:
+                    break
+                lane.started_at = time.monotonic()
+            if not self._run_record(lane, index):
+                break
+        with self._condition:
+            if not lane.closed:
+                self._close(lane)
+        return not lane.timed_out
+
+    def _work(self):
+        while True:
+            try:
+                lane = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if not self._run_lane(lane):
+                return
+
+    def _start_worker(self):
+        self._workers += 1
+        threading.Thread(
+            target=self._work,
+            name=f"{self._dispatcher.thread_name_prefix}_{self._workers}",
+            daemon=True,
+        ).start()
+
+    def _expire_lanes(self, timeout: float) -> Optional[float]:
+        """
+        Abandon the lanes whose current record is running over the timeout
+
+        Returns:
+            (Optional[float]): the seconds until the next possible timeout, None without running lanes
+        """
+        now = time.monotonic()
+        next_timeout: Optional[float] = None
+        for lane in self._lanes:
+            # started_at is None between two records, position is past the end after the last one
+            if lane.closed or lane.started_at is None or lane.position >= len(lane.indexes):
+                continue
+            left = lane.started_at + timeout - now
+            if left > 0:
+                next_timeout = left if next_timeout is None else min(next_timeout, left)
+                continue
+            index = lane.indexes[lane.position]
+            LOGGER.warning("Record=%s timed out after %ss", index, timeout)
+            self.result.failures[index] = DispatchTimeoutError(f"Record timed out after {timeout}s")
+            lane.position += 1
+            lane.timed_out = True
+            self._close(lane, SkippedRecordError("Previous record with the same key timed out"))
+            # the thread of the lane is stuck on the record: replace it
+            self._start_worker()
+        return next_timeout
+
+    def run(self) -> DispatchResult:
+        for lane in self._lanes:
+            self._queue.put(lane)
+        with self._condition:
+            for _ in range(min(self._dispatcher.concurrency, len(self._lanes))):
+                self._start_worker()
+            while self._open_lanes:
+                poll = None
+                if self._dispatcher.timeout is not None:
+                    poll = self._expire_lanes(self._dispatcher.timeout) or self._dispatcher.timeout
+                self._condition.wait(timeout=poll)
+        return self.result
+
+
+class KeyedDispatcher:
+    """
+    Process records concurrently on a bounded thread pool, the records with the same key are processed
+    in order while the records with different keys run in parallel
+
+    Remarks:
+        The records are I/O bound (e.g. boto3 calls), so the throughput of an invocation scales with the
+        concurrency instead of being capped by the latency of a single request.
+        A timed out record can not be interrupted: it is reported as failed and its thread is abandoned
+        (daemon thread, replaced by a new one), the following records with the same key are skipped.
+
+    Example:
+    >>> dispatcher = KeyedDispatcher(concurrency=10, timeout=5)
+    >>> result = dispatcher.dispatch(records, process=handle_record, key=lambda record: record["user_id"])
+    >>> for index, exc in result.failures.items():
+    >>>     ...
+    """
+
+    def __init__(
+        self,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        timeout: Optional[float] = None,
+        stop_key_on_failure: bool = True,
+        thread_name_prefix: str = "dispatcher",
+    ):
+        """
+        Args:
+            concurrency (int): the max number of records processed in parallel. Optional, defaulted to 10.
+            timeout (Optional[float]): the max seconds to process a single record, None to wait
+                indefinitely. Optional, defaulted to None.
+            stop_key_on_failure (bool): skip the records following a failed one with the same key, so that
+                they are not processed out of order when the failed one is retried. Optional, defaulted to True.
+            thread_name_prefix (str): the prefix of the name of the threads. Optional, defaulted to dispatcher.
+
+        Raises:
+            ValueError: the concurrency is lower than 1 or the timeout is not positive
+        """
+        if concurrency < 1:
+            raise ValueError(f"Invalid concurrency={concurrency}, expected at least 1")
+        if timeout is not None and timeout <= 0:
+            raise ValueError(f"Invalid timeout={timeout}, expected a positive number of seconds")
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.stop_key_on_failure = stop_key_on_failure
+        self.thread_name_prefix = thread_name_prefix
+
+    def dispatch(
+        self,
+        items: Sequence[T],
+        process: Callable[[T], Any],
+        key: Optional[Callable[[T], Hashable]] = None,
+    ) -> DispatchResult:
+        """
+        Args:
+            items (Sequence[T]): the records to process
+            process (Callable[[T], Any]): the function that processes a single record, a record fails
+                when it raises an exception
+            key (Optional[Callable[[T], Hashable]]): the ordering key of a record (e.g. user_id, MessageGroupId),
+                None if the records have no ordering constraint. Optional, defaulted to None.
+
+        Returns:
+            (DispatchResult): the results and the failures of the records, keyed by their index in items
+        """
+        if not items:
+            return DispatchResult()
+        lanes: Dict[Hashable, List[int]] = {}
+        for index, item in enumerate(items):
+            lanes.setdefault(index if key is None else key(item), []).append(index)
+        return _Dispatch(self, items, process, [_Lane(indexes) for indexes in lanes.values()]).run()
@@ -1,28 +1,42 @@
 from __future__ import annotations
 
+import time
 import random
 import string
 import logging
-from typing import Any, Dict, List, Tuple, Union, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple, Union, Iterator, Optional
+from functools import partial
+from itertools import chain
 from dataclasses import dataclass
-
-from boto3.resources.base import ServiceResource
-from boto3.dynamodb.conditions import (
-    Attr,
-    Equals,
-    Between,
-    LessThan,
-    BeginsWith,
-    GreaterThan,
-    ConditionBase,
-    LessThanEquals,
-    GreaterThanEquals,
-)
-
-from micro_core.utils import decode, encode
+from concurrent.futures import ThreadPoolExecutor
+
+from micro_core.utils import decode, encode, chunked
+from micro_core.concurrency import fan_in
+
+# boto3 is imported by the caller when the resources are created, not at import time (see the Lambda cold start)
+if TYPE_CHECKING:
+    from boto3.resources.base import ServiceResource
+    from boto3.dynamodb.conditions import (
+        Equals,
+        Between,
+        LessThan,
+        BeginsWith,
+        GreaterThan,
+        ConditionBase,
+        LessThanEquals,
+        GreaterThanEquals,
+    )
 
 LOGGER = logging.getLogger()
 
+# https://docs.aws.amazon.com/amazondynamodb/latest/APIReference/API_BatchGetItem.html
+MAX_BATCH_GET_KEYS = 100
+# https://docs.aws.amazon.com/amazondynamodb/latest/APIReference/API_BatchWriteItem.html
+MAX_BATCH_WRITE_ITEMS = 25
+MAX_BATCH_ATTEMPTS = 5
+# items requested by every Scan page of iter_items, a page is also capped at 1 MB by DynamoDB
+DEFAULT_SCAN_PAGE_SIZE = 1000
+
 
 @dataclass(frozen=True)
 class DynamoDBTableKeySchema:
@@ -193,6 +207,78 @@ class DynamoDBTable:
         response = self._table.get_item(Key=key)
         return response.get("Item", {})
 
+    def batch_get_items(
+        self,
+        hash_key_values: List[str],
+        range_key_values: Optional[List[str]] = None,
+        concurrency: int = 1,
+        consistent_read: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Get the items specified by the keys, with one BatchGetItem request every 100 keys
+
+        Remarks:
+            The unprocessed keys returned by DynamoDB (e.g. throttling) are requested again with
+            an exponential backoff. The items are not returned in the order of the keys and
+            the keys that do not exist in the table are simply missing from the result.
+
+        Reference:
+        https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/dynamodb/service-resource/batch_get_item.html
+
+        Args:
+            hash_key_values (List[str]): the values of the hash key for the items we want to retrieve,
+                duplicates are removed
+            range_key_values (Optional[List[str]]): the values of the range key, in the same order of the
+                hash key values, needed only if range key defined
+            concurrency (int): the max number of BatchGetItem requests sent in parallel. Optional, defaulted to 1.
+            consistent_read (bool): use strongly consistent reads. Optional, defaulted to False.
+
+        Returns:
+            (List[Dict[str, Any]]): the items found
+
+        Raises:
+            Exception: some keys are still unprocessed after the max number of attempts
+        """
+        range_values: List[Optional[str]] = (
+            list(range_key_values) if range_key_values else [None] * len(hash_key_values)
+        )
+        keys = {
+            tuple(key.items()): key
+            for key in (
+                self._create_key_arg(hash_value, range_value)
+                for hash_value, range_value in zip(hash_key_values, range_values)
+            )
+        }
+        batches = list(chunked(keys.values(), MAX_BATCH_GET_KEYS))
+        LOGGER.debug(
+            "Batch get %s items from DynamoDB table %s in %s requests", len(keys), self.table_name, len(batches)
+        )
+        batch_get = partial(self._batch_get, consistent_read=consistent_read)
+        if concurrency == 1 or len(batches) <= 1:
+            responses = [batch_get(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(
+                max_workers=min(concurrency, len(batches)), thread_name_prefix="dynamodb-batch-get"
+            ) as executor:
+                responses = list(executor.map(batch_get, batches))
+        return [item for items in responses for item in items]
+
+    def _batch_get(self, keys: List[Dict[str, str]], consistent_read: bool = False) -> List[Dict[str, Any]]:
+        items: List[Dict[str, Any]] = []
+        request_items: Dict[str, Any] = {self.table_name: {"Keys": keys, "ConsistentRead": consistent_read}}
+        for attempt in range(MAX_BATCH_ATTEMPTS):
+            if attempt:
+                time.sleep(random.uniform(0, 0.05 * 2**attempt))
+            response = self._table.meta.client.batch_get_item(RequestItems=request_items)
+            items.extend(response.get("Responses", {}).get(self.table_name, []))
+            request_items = response.get("UnprocessedKeys", {})
+            if not request_items:
+                return items
+        raise Exception(
+            f"Table={self.table_name} has {len(request_items[self.table_name]['Keys'])} "
+            f"unprocessed keys after {MAX_BATCH_ATTEMPTS} attempts"
+        )
+
     def get_items(
         self,
         next_token: Optional[str] = None,
@@ -246,7 +332,64 @@ class DynamoDBTable:
             )
         return DynamoDBTableIterator(items=response.get("Items"))
 
+    def iter_items(
+        self,
+        attributes: Optional[List[str]] = None,
+        segments: int = 1,
+        page_size: int = DEFAULT_SCAN_PAGE_SIZE,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Scan the whole table, requesting the next page only when the previous one is consumed
+
+        Remarks:
+            With more than one segment the table is split in segments scanned in parallel (parallel scan),
+            the pages are not sorted and at most 2 * segments pages are buffered in memory: the scan of the
+            segments is paused until the pages are consumed. Closing the iterator stops the scan.
+
+        Reference:
+        https://docs.aws.amazon.com/amazondynamodb/latest/developerguide/Scan.html#Scan.ParallelScan
+
+        Args:
+            attributes (Optional[List[str]]): the attributes of the items to read (projection expression),
+                None for all the attributes. Optional, defaulted to None.
+            segments (int): the number of segments scanned in parallel. Optional, defaulted to 1.
+            page_size (int): the number of items requested in a single page. Optional, defaulted to 1000.
+
+        Returns:
+            (Iterator[Dict[str, Any]]): the items of the table
+
+        Raises:
+            ValueError: the number of segments is lower than 1
+        """
+        if segments < 1:
+            raise ValueError(f"Invalid segments={segments}, expected at least 1")
+        LOGGER.debug("Scan DynamoDB table %s with attributes=%s,segments=%s", self.table_name, attributes, segments)
+        scan_args: Dict[str, Any] = {"Limit": page_size}
+        if attributes:
+            # placeholders for every attribute: many common names are reserved words (e.g. name)
+            names = {f"#a{index}": attribute for index, attribute in enumerate(attributes)}
+            scan_args["ProjectionExpression"] = ",".join(names)
+            scan_args["ExpressionAttributeNames"] = names
+        if segments == 1:
+            return chain.from_iterable(self._iter_scan_pages(scan_args))
+        return fan_in(
+            producers=[
+                partial(self._iter_scan_pages, {**scan_args, "Segment": segment, "TotalSegments": segments})
+                for segment in range(segments)
+            ],
+            concurrency=segments,
+        )
+
+    def _iter_scan_pages(self, scan_args: Dict[str, Any]) -> Iterator[List[Dict[str, Any]]]:
+        response = self._table.scan(**scan_args)
+        yield response.get("Items", [])
+        while "LastEvaluatedKey" in response:
+            response = self._table.scan(**scan_args, ExclusiveStartKey=response["LastEvaluatedKey"])
+            yield response.get("Items", [])
+
     def _condition_expression_on_key(self, exists: bool = False) -> ConditionBase:
+        from boto3.dynamodb.conditions import Attr
+
         return Attr(self._key_schema.hash_key).exists() if exists else Attr(self._key_schema.hash_key).not_exists()
 
     def add_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
@@ -273,6 +416,56 @@ class DynamoDBTable:
             raise Exception(f"Table={self.table_name} already contains {item}") from c_error
         return item
 
+    def batch_put_items(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Put the items in the table with BatchWriteItem requests of 25 items, overwriting the existing ones
+
+        Remarks:
+            Unlike add_item there is no condition on the key: BatchWriteItem does not support conditions.
+            The items with the same key are written once, the last one wins.
+            The unprocessed items returned by DynamoDB (e.g. throttling) are sent again with an exponential
+            backoff, like the unprocessed keys of batch_get_items, and returned after the max number of attempts.
+
+        Reference:
+        https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/dynamodb/client/batch_write_item.html
+
+        Args:
+            items (List[Dict[str, Any]]): the items to put into the table
+
+        Returns:
+            (List[Dict[str, Any]]): the items still unprocessed after the max number of attempts, empty if all
+                the items were written
+        """
+        key_attributes = self._key_attributes()
+        unique_items = {tuple(item[key] for key in key_attributes): item for item in items}
+        LOGGER.debug("Batch put %s items in DynamoDB table %s", len(unique_items), self.table_name)
+        unprocessed: List[Dict[str, Any]] = []
+        for batch in chunked(unique_items.values(), MAX_BATCH_WRITE_ITEMS):
+            unprocessed.extend(self._batch_put(batch))
+        return unprocessed
+
+    def _batch_put(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        request_items: Dict[str, Any] = {self.table_name: [{"PutRequest": {"Item": item}} for item in items]}
+        for attempt in range(MAX_BATCH_ATTEMPTS):
+            if attempt:
+                time.sleep(random.uniform(0, 0.05 * 2**attempt))
+            response = self._table.meta.client.batch_write_item(RequestItems=request_items)
+            request_items = response.get("UnprocessedItems", {})
+            if not request_items:
+                return []
+        LOGGER.warning(
+            "Table=%s has %s unprocessed items after %s attempts",
+            self.table_name,
+            len(request_items[self.table_name]),
+            MAX_BATCH_ATTEMPTS,
+        )
+        return [request["PutRequest"]["Item"] for request in request_items[self.table_name]]
+
+    def _key_attributes(self) -> List[str]:
+        if self._key_schema.range_key:
+            return [self._key_schema.hash_key, self._key_schema.range_key]
+        return [self._key_schema.hash_key]
+
     def _create_update_expressions(self, item: Dict[str, Any]) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
         """
         Creates the dynamodb update expression and expression attribute values
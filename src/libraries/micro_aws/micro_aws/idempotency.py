@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import time
+import logging
+from abc import ABC, abstractmethod
+from typing import Set, Iterable, Optional
+
+from micro_core.cache import LRUCache
+from micro_aws.dynamodb_table import DynamoDBTable
+
+LOGGER = logging.getLogger()
+
+DEFAULT_IDEMPOTENCY_TTL = 60 * 60
+DEFAULT_IDEMPOTENCY_MAX_ENTRIES = 100_000
+# name of the DynamoDB TTL attribute, epoch seconds
+EXPIRATION_ATTRIBUTE = "expiration"
+
+
+class IdempotencyStore(ABC):
+    """
+    Store of the keys (e.g. SQS messageId) of the work already done, each key is remembered for a time to live
+    """
+
+    @abstractmethod
+    def get_processed(self, keys: Iterable[str]) -> Set[str]:
+        """
+        Returns:
+            (Set[str]): the keys already processed, among the ones requested
+        """
+
+    @abstractmethod
+    def save_processed(self, keys: Iterable[str]):
+        """
+        Remember the keys as processed for the time to live of the store
+        """
+
+
+class DynamoDBIdempotencyStore(IdempotencyStore):
+    """
+    Idempotency store shared by all the containers, backed by a DynamoDB table
+
+    Remarks:
+        The table needs a string hash key and should enable the DynamoDB TTL on the expiration attribute.
+        The expired items are ignored even if DynamoDB did not delete them yet.
+
+    Reference:
+        https://docs.aws.amazon.com/amazondynamodb/latest/developerguide/TTL.html
+    """
+
+    def __init__(self, table: DynamoDBTable, ttl: int = DEFAULT_IDEMPOTENCY_TTL):
+        """
+        Args:
+            table (DynamoDBTable): the table where the keys are stored
+            ttl (int): the seconds a key is remembered. Optional, defaulted to 1 hour.
+        """
+        self._table = table
+        self._ttl = ttl
+
+    def get_processed(self, keys: Iterable[str]) -> Set[str]:
+        keys = list(keys)
+        if not keys:
+            return set()
+        now = int(time.time())
+        hash_key = self._table.key_schema.hash_key
+        return {
+            item[hash_key]
+            for item in self._table.batch_get_items(hash_key_values=keys, consistent_read=True)
+            if int(item.get(EXPIRATION_ATTRIBUTE, 0)) > now
+        }
+
+    def save_processed(self, keys: Iterable[str]):
+        expiration = int(time.time()) + self._ttl
+        hash_key = self._table.key_schema.hash_key
+        unprocessed = self._table.batch_put_items(
+            items=[{hash_key: key, EXPIRATION_ATTRIBUTE: expiration} for key in keys]
+        )
+        if unprocessed:
+            # not remembered: those messages are processed again if redelivered
+            LOGGER.warning("Processed keys not saved: %s", [item[hash_key] for item in unprocessed])
+
+
+class InMemoryIdempotencyStore(IdempotencyStore):
+    """
+    Idempotency store local to the container, optionally in front of a shared store
+
+    Remarks:
+        The keys are kept in a bounded LRU cache, the shared store is queried only for the keys
+        not found in memory.
+    """
+
+    def __init__(
+        self,
+        ttl: int = DEFAULT_IDEMPOTENCY_TTL,
+        max_entries: int = DEFAULT_IDEMPOTENCY_MAX_ENTRIES,
+        shared_store: Optional[IdempotencyStore] = None,
+    ):
+        """
+        Args:
+            ttl (int): the seconds a key is remembered. Optional, defaulted to 1 hour.
+            max_entries (int): the max number of keys kept in memory. Optional, defaulted to 100000.
+            shared_store (Optional[IdempotencyStore]): the store shared by all the containers
+                (e.g. DynamoDBIdempotencyStore). Optional, defaulted to None.
+        """
+        self._keys: LRUCache[str, bool] = LRUCache(max_entries=max_entries, ttl=ttl)
+        self._shared_store = shared_store
+
+    def get_processed(self, keys: Iterable[str]) -> Set[str]:
+        keys = list(keys)
+        processed = {key for key in keys if self._keys.get(key)}
+        if self._shared_store:
+            missing = [key for key in keys if key not in processed]
+            if missing:
+                shared_processed = self._shared_store.get_processed(missing)
+                for key in shared_processed:
+                    self._keys.put(key, True)
+                processed |= shared_processed
+        return processed
+
+    def save_processed(self, keys: Iterable[str]):
+        keys = list(keys)
+        for key in keys:
+            self._keys.put(key, True)
+        if self._shared_store and keys:
+            self._shared_store.save_processed(keys)
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import sys
+import json
+import time
+import threading
+from abc import ABC, abstractmethod
+from typing import IO, Any, Dict, List, Union, Iterator, Optional, ContextManager
+from contextlib import nullcontext, contextmanager
+from dataclasses import field, dataclass
+
+from micro_core.metrics import Histogram
+
+# CloudWatch accepts up to 100 values for every metric of an EMF document
+# https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/CloudWatch_Embedded_Metric_Format_Specification.html
+MAX_EMF_VALUES = 100
+
+# the Lambda runtime imports the handler module during the init phase, micro_aws is imported with it
+_INIT_STARTED_AT = time.perf_counter()
+_cold_start = True
+_cold_start_lock = threading.Lock()
+
+
+@dataclass
+class InvocationMetrics:
+    """
+    Metrics of a single Lambda invocation, the durations are in milliseconds
+
+    Attributes:
+        cold_start (bool): True for the first invocation of the container
+        init_duration (Optional[float]): the time between the import of micro_aws and the first invocation,
+            only for the cold starts
+        duration (float): the duration of the invocation
+        phases (Dict[str, float]): the total time spent in every phase, the phases run in parallel are summed up
+        histograms (Dict[str, Histogram]): the distribution of the values observed (e.g. latency of every record)
+    """
+
+    cold_start: bool
+    init_duration: Optional[float] = None
+    duration: float = 0.0
+    phases: Dict[str, float] = field(default_factory=dict)
+    histograms: Dict[str, Histogram] = field(default_factory=dict)
+
+
+class Instrumentation:
+    """
+    Collector of the metrics of the current invocation, it is thread safe
+
+    Example:
+    >>> with self.instrumentation.phase("dynamodb"):
+    >>>     items = table.batch_get_items(...)
+    >>> self.instrumentation.observe("record", elapsed_ms)
+    """
+
+    def __init__(self, cold_start: bool = False, init_duration: Optional[float] = None):
+        self._metrics = InvocationMetrics(cold_start=cold_start, init_duration=init_duration)
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def _phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._metrics.phases[name] = self._metrics.phases.get(name, 0.0) + elapsed
+
+    def phase(self, name: str) -> ContextManager[None]:
+        """
+        Args:
+            name (str): the name of the phase (e.g. parse, dynamodb, s3)
+
+        Returns:
+            (ContextManager[None]): the timer of the phase, the time spent in the block is added to the phase
+        """
+        return self._phase(name)
+
+    def observe(self, name: str, value: float, count: int = 1):
+        """
+        Args:
+            name (str): the name of the histogram (e.g. record)
+            value (float): the value observed, milliseconds for the latencies
+            count (int): the number of times the value was observed. Optional, defaulted to 1.
+        """
+        with self._lock:
+            histogram = self._metrics.histograms.get(name)
+            if histogram is None:
+                histogram = self._metrics.histograms[name] = Histogram()
+        histogram.record(value, count)
+
+    def finish(self) -> InvocationMetrics:
+        """
+        Returns:
+            (InvocationMetrics): the metrics of the invocation, with the duration up to now
+        """
+        self._metrics.duration = (time.perf_counter() - self._start) * 1000
+        return self._metrics
+
+
+class NullInstrumentation(Instrumentation):
+    """Instrumentation used when the metrics are disabled, every method is a no-op"""
+
+    _NULL_CONTEXT: ContextManager[None] = nullcontext()
+
+    def __init__(self):
+        pass
+
+    def phase(self, name: str) -> ContextManager[None]:
+        return self._NULL_CONTEXT
+
+    def observe(self, name: str, value: float, count: int = 1):
+        pass
+
+    def finish(self) -> InvocationMetrics:
+        return InvocationMetrics(cold_start=False)
+
+
+NULL_INSTRUMENTATION = NullInstrumentation()
+
+
+class MetricsSink(ABC):
+    """Destination of the metrics collected at the end of every invocation"""
+
+    @abstractmethod
+    def emit(self, metrics: InvocationMetrics):
+        pass
+
+
+class InMemorySink(MetricsSink):
+    """Keeps the metrics of every invocation, meant for the tests"""
+
+    def __init__(self) -> None:
+        self.invocations: List[InvocationMetrics] = []
+
+    def emit(self, metrics: InvocationMetrics):
+        self.invocations.append(metrics)
+
+
+class EmfSink(MetricsSink):
+    """
+    Writes the metrics as a single CloudWatch Embedded Metric Format line, CloudWatch extracts
+    the metrics from the Lambda logs without any API call
+
+    Reference:
+        https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/CloudWatch_Embedded_Metric_Format_Specification.html
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        dimensions: Optional[Dict[str, str]] = None,
+        stream: Optional[IO[str]] = None,
+    ):
+        """
+        Args:
+            namespace (str): the CloudWatch namespace of the metrics
+            dimensions (Optional[Dict[str, str]]): the dimensions of every metric (e.g. Service).
+                Optional, defaulted to None.
+            stream (Optional[IO[str]]): where the lines are written. Optional, defaulted to sys.stdout.
+        """
+        self._namespace = namespace
+        self._dimensions = dimensions or {}
+        self._stream = stream
+
+    @staticmethod
+    def _histogram_values(histogram: Histogram) -> List[float]:
+        if histogram.count <= MAX_EMF_VALUES:
+            return [round(value, 3) for value, count in histogram.buckets() for _ in range(count)]
+        # too many values: the distribution is summarized by its percentiles
+        return [round(histogram.percentile(rank) or 0.0, 3) for rank in range(1, MAX_EMF_VALUES + 1)]
+
+    def to_document(self, metrics: InvocationMetrics) -> Dict[str, Any]:
+        values: Dict[str, Union[float, List[float]]] = {
+            "ColdStart": int(metrics.cold_start),
+            "Duration": round(metrics.duration, 3),
+        }
+        if metrics.init_duration is not None:
+            values["InitDuration"] = round(metrics.init_duration, 3)
+        for name, duration in metrics.phases.items():
+            values[f"Phase.{name}"] = round(duration, 3)
+        for name, histogram in metrics.histograms.items():
+            values[f"Latency.{name}"] = self._histogram_values(histogram)
+        units = {name: "Count" if name == "ColdStart" else "Milliseconds" for name in values}
+        return {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": self._namespace,
+                        "Dimensions": [list(self._dimensions)],
+                        "Metrics": [{"Name": name, "Unit": unit} for name, unit in units.items()],
+                    }
+                ],
+            },
+            **self._dimensions,
+            **values,
+        }
+
+    def emit(self, metrics: InvocationMetrics):
+        stream = self._stream or sys.stdout
+        stream.write(json.dumps(self.to_document(metrics), separators=(",", ":")) + "\n")
+        stream.flush()
+
+
+def start_invocation() -> Instrumentation:
+    """
+    Returns:
+        (Instrumentation): the collector of the metrics of a new invocation, the first invocation
+            of the container is marked as cold start with the duration of the init phase
+    """
+    global _cold_start
+    with _cold_start_lock:
+        cold_start, _cold_start = _cold_start, False
+    init_duration = (time.perf_counter() - _INIT_STARTED_AT) * 1000 if cold_start else None
+    return Instrumentation(cold_start=cold_start, init_duration=init_duration)
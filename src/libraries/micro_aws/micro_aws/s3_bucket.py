@@ -1,9 +1,169 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Union, Optional
+import io
+import os
+import mmap
+import time
+import base64
+import hashlib
+import logging
+import threading
+import contextlib
+from typing import IO, TYPE_CHECKING, Any, Dict, List, Tuple, Union, Callable, Iterable, Iterator, Optional
+from functools import partial
+from itertools import chain
+from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor
 
-from botocore.response import StreamingBody
-from boto3.resources.base import ServiceResource
+from micro_core.cache import LRUCache
+from micro_core.utils import chunked
+from micro_core.concurrency import fan_in
+
+# botocore is imported by the caller when the resources are created, not at import time (see the Lambda cold start)
+if TYPE_CHECKING:
+    from botocore.response import StreamingBody
+    from boto3.resources.base import ServiceResource
+
+LOGGER = logging.getLogger()
+
+# https://docs.aws.amazon.com/AmazonS3/latest/userguide/qfacts.html
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RANGE_SIZE = 8 * 1024 * 1024
+DEFAULT_READ_SIZE = 64 * 1024
+# https://docs.aws.amazon.com/AmazonS3/latest/API/API_DeleteObjects.html
+MAX_DELETE_KEYS = 1000
+# https://docs.aws.amazon.com/AmazonS3/latest/API/API_ListObjectsV2.html
+MAX_LIST_KEYS = 1000
+DEFAULT_LIST_CONCURRENCY = 16
+# first character of an hex encoded identifier (e.g. uuid4), used to split the keyspace in shards
+HEX_SHARDS = "0123456789abcdef"
+# user-defined metadata (x-amz-meta-content-sha256) storing the hash of the object content
+CONTENT_SHA256_METADATA = "content-sha256"
+DEFAULT_HASH_CACHE_SIZE = 1024
+DEFAULT_READ_CACHE_BYTES = 32 * 1024 * 1024
+DEFAULT_READ_CACHE_OBJECT_BYTES = 1024 * 1024
+DEFAULT_READ_CACHE_TTL = 30.0
+
+
+class ChecksumMismatchError(Exception):
+    """The object was stored by S3 but its ETag does not match the uploaded content, the object is left as is"""
+
+
+@dataclass(frozen=True)
+class S3ObjectSummary:
+    key: str
+    size: int
+    etag: str
+
+
+@dataclass
+class S3ReadCacheStats:
+    hits: int = 0
+    revalidations: int = 0
+    misses: int = 0
+
+
+@dataclass(frozen=True)
+class _CachedObject:
+    etag: str
+    body: bytes
+
+
+class S3ReadCache:
+    """
+    Bounded in-process cache of object bodies used by S3Bucket.get_content
+
+    Remarks:
+        An entry younger than ttl is returned without any request (hit). An older entry is
+        revalidated with a conditional GET (If-None-Match on its ETag): an unchanged object
+        comes back as a 304 without body (revalidation), otherwise the body is downloaded again (miss).
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_READ_CACHE_BYTES,
+        max_object_bytes: int = DEFAULT_READ_CACHE_OBJECT_BYTES,
+        ttl: float = DEFAULT_READ_CACHE_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            max_bytes (int): the max total size of the cached bodies. Optional, defaulted to 32 MiB.
+            max_object_bytes (int): the max size of a single cached body, bigger objects are
+                always streamed from S3. Optional, defaulted to 1 MiB.
+            ttl (float): the seconds after which an entry is revalidated. Optional, defaulted to 30.
+            clock (Callable[[], float]): the source of the current time in seconds. Optional,
+                defaulted to time.monotonic.
+        """
+        self.max_object_bytes = min(max_object_bytes, max_bytes)
+        self.clock = clock
+        # bounded by size only: max_entries can not be reached before max_weight
+        self.objects: LRUCache[str, _CachedObject] = LRUCache(
+            max_entries=max_bytes + 1,
+            max_weight=max_bytes,
+            weigher=lambda cached: max(len(cached.body), 1),
+            ttl=ttl,
+            clock=clock,
+        )
+        self._stats = S3ReadCacheStats()
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> S3ReadCacheStats:
+        with self._lock:
+            return S3ReadCacheStats(**vars(self._stats))
+
+    def count(self, stat: str):
+        with self._lock:
+            setattr(self._stats, stat, getattr(self._stats, stat) + 1)
+
+
+@dataclass(frozen=True)
+class S3DeleteError:
+    key: str
+    code: str
+    message: str
+
+
+def _iter_parts(content: Union[bytes, str, Iterable[bytes], IO[bytes]], part_size: int) -> Iterator[bytes]:
+    """
+    Split the content in parts of part_size bytes, only the last part can be smaller
+
+    Args:
+        content (Union[bytes, str, Iterable[bytes], IO[bytes]]): the content to split, a file-like object
+            (anything with a read method) is read part_size bytes at a time
+        part_size (int): the size in bytes of every part
+
+    Returns:
+        (Iterator[bytes]): the parts of the content
+    """
+    chunks: Iterable[Union[bytes, str]]
+    if isinstance(content, (bytes, str)):
+        chunks = [content]
+    elif hasattr(content, "read"):
+        chunks = iter(lambda: content.read(part_size), b"")  # type: ignore
+    else:
+        chunks = content
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+        while len(buffer) >= part_size:
+            yield bytes(buffer[:part_size])
+            del buffer[:part_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+def _streaming_body(body: bytes) -> StreamingBody:
+    from botocore.response import StreamingBody
+
+    return StreamingBody(io.BytesIO(body), len(body))
+
+
+def _md5(data: bytes) -> bytes:
+    return hashlib.md5(data, usedforsecurity=False).digest()
 
 
 class S3Bucket:
@@ -12,13 +172,42 @@ class S3Bucket:
     (wrapper around boto3.session.Session.resource('s3'))
     """
 
-    def __init__(self, boto3_s3_bucket: Any):
+    def __init__(
+        self,
+        boto3_s3_bucket: Any,
+        hash_cache_size: int = DEFAULT_HASH_CACHE_SIZE,
+        read_cache: Optional[S3ReadCache] = None,
+    ):
+        """
+        Args:
+            boto3_s3_bucket (Any): the instance of a boto3.session.Session.resource('s3').Bucket(<bucket_name>)
+            hash_cache_size (int): the max number of content hashes kept in memory by upload_if_changed.
+                Optional, defaulted to 1024.
+            read_cache (Optional[S3ReadCache]): the cache of the bodies returned by get_content,
+                None to always download them. Optional, defaulted to None.
+        """
         self._bucket = boto3_s3_bucket
+        self._content_hashes: LRUCache[str, str] = LRUCache(max_entries=hash_cache_size)
+        self._read_cache = read_cache
 
     @classmethod
     def from_boto3_s3_resource(cls, boto3_s3_resource: ServiceResource, bucket_name: str) -> S3Bucket:
         return cls(boto3_s3_resource.Bucket(bucket_name))
 
+    @property
+    def _client(self) -> Any:
+        return self._bucket.meta.client
+
+    @property
+    def read_cache_stats(self) -> Optional[S3ReadCacheStats]:
+        return self._read_cache.stats if self._read_cache else None
+
+    def _invalidate(self, key: str):
+        """Forget what is known about the content of the key, called on every write or delete"""
+        self._content_hashes.pop(key)
+        if self._read_cache:
+            self._read_cache.objects.pop(key)
+
     def upload_content(self, key: str, body: Union[bytes, str], content_type: Optional[str] = None) -> Any:
         """
         Returns:
@@ -30,12 +219,439 @@ class S3Bucket:
         args = {"Key": key, "Body": body}
         if content_type:
             args["ContentType"] = content_type
+        self._invalidate(key)
         return self._bucket.put_object(**args)
 
+    def upload_if_changed(self, key: str, body: Union[bytes, str], content_type: Optional[str] = None) -> Any:
+        """
+        Upload the content only if it differs from the one already stored with the same key
+
+        Remarks:
+            The SHA-256 of the content is stored in the object metadata and kept in an in-process cache,
+            the cache is checked first and only on a miss the stored object is read with a HEAD request.
+            Objects uploaded by other means are compared by ETag, that is the MD5 of the content
+            for the objects uploaded with a single put (without SSE-KMS).
+
+        Reference:
+            https://docs.aws.amazon.com/AmazonS3/latest/userguide/UsingMetadata.html#UserMetadata
+
+        Args:
+            key (str): the key of the object
+            body (Union[bytes, str]): the content of the object
+            content_type (Optional[str]): the content type of the object
+
+        Returns:
+            (Optional[S3.Object]): the uploaded object, None if the upload was skipped because unchanged
+        """
+        data = body.encode("utf-8") if isinstance(body, str) else body
+        content_sha256 = hashlib.sha256(data).hexdigest()
+        if self._content_hashes.get(key) == content_sha256:
+            LOGGER.debug("Skip upload of key=%s, unchanged content (cached hash)", key)
+            return None
+
+        if self._stored_content_matches(key=key, data=data, content_sha256=content_sha256):
+            LOGGER.debug("Skip upload of key=%s, unchanged content", key)
+            self._content_hashes.put(key, content_sha256)
+            return None
+
+        args = {"Key": key, "Body": data, "Metadata": {CONTENT_SHA256_METADATA: content_sha256}}
+        if content_type:
+            args["ContentType"] = content_type
+        self._invalidate(key)
+        response = self._bucket.put_object(**args)
+        self._content_hashes.put(key, content_sha256)
+        return response
+
+    def _stored_content_matches(self, key: str, data: bytes, content_sha256: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self._client.head_object(Bucket=self._bucket.name, Key=key)
+        except ClientError as error:
+            if error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        stored_sha256 = head.get("Metadata", {}).get(CONTENT_SHA256_METADATA)
+        if stored_sha256:
+            return stored_sha256 == content_sha256
+        return head.get("ETag") == f'"{_md5(data).hex()}"'
+
+    def upload_stream(
+        self,
+        key: str,
+        content: Union[bytes, str, Iterable[bytes], IO[bytes]],
+        part_size: int = DEFAULT_PART_SIZE,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        content_type: Optional[str] = None,
+        verify_checksum: bool = False,
+    ) -> Any:
+        """
+        Upload the content with a multipart upload, the parts are uploaded in parallel
+
+        Remarks:
+            At most concurrency + 1 parts are kept in memory at the same time: the reading of the content
+            is paused until a part upload completes.
+            A content smaller than part_size is uploaded with a single put_object (see upload_content).
+            In case of failure the multipart upload is aborted, so no orphan part is left in the bucket. If the abort
+            fails too it is logged and the original error is raised: the parts left are removed by the lifecycle
+            rule of the bucket (AbortIncompleteMultipartUpload), if any.
+            The ETag of the whole object is checked once S3 has stored it: the object is not deleted on a mismatch
+            (e.g. the ETag of an object encrypted with SSE-KMS is not an MD5), the caller decides what to do.
+
+        Reference:
+            https://docs.aws.amazon.com/AmazonS3/latest/userguide/mpuoverview.html
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/client/upload_part.html
+
+        Args:
+            key (str): the key of the object to create
+            content (Union[bytes, str, Iterable[bytes], IO[bytes]]): the content to upload, an iterable of
+                chunks or a file-like object
+            part_size (int): the size in bytes of every part, at least 5 MiB. Optional, defaulted to 8 MiB.
+            concurrency (int): the max number of parts uploaded in parallel. Optional, defaulted to 4.
+            content_type (Optional[str]): the content type of the object
+            verify_checksum (bool): send the MD5 of every part, so that S3 rejects corrupted parts,
+                and check the ETag returned for every part and for the whole object. Optional, defaulted to False.
+
+        Returns:
+            (S3.Object):
+
+        Raises:
+            ValueError: the part_size is smaller than 5 MiB or the concurrency is not positive
+            Exception: the checksum returned by S3 for a part does not match it, the upload is aborted
+            ChecksumMismatchError: the ETag of the stored object does not match the uploaded content
+        """
+        self._invalidate(key)
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"part_size={part_size} must be at least {MIN_PART_SIZE} bytes")
+        if concurrency < 1:
+            raise ValueError(f"concurrency={concurrency} must be a positive number")
+
+        parts = _iter_parts(content, part_size)
+        first_part = next(parts, b"")
+        second_part = next(parts, None)
+        if second_part is None:
+            return self.upload_content(key=key, body=first_part, content_type=content_type)
+
+        args = {"Bucket": self._bucket.name, "Key": key}
+        create_args = dict(args)
+        if content_type:
+            create_args["ContentType"] = content_type
+        upload_id = self._client.create_multipart_upload(**create_args)["UploadId"]
+        LOGGER.debug("Started multipart upload of key=%s, upload_id=%s", key, upload_id)
+        try:
+            completed_parts = self._upload_parts(
+                args=dict(args, UploadId=upload_id),
+                parts=chain([first_part, second_part], parts),
+                concurrency=concurrency,
+                verify_checksum=verify_checksum,
+            )
+            response = self._client.complete_multipart_upload(
+                **args,
+                UploadId=upload_id,
+                MultipartUpload={
+                    "Parts": [{"ETag": part["ETag"], "PartNumber": part["PartNumber"]} for part in completed_parts]
+                },
+            )
+        except BaseException:
+            LOGGER.exception("Abort multipart upload of key=%s, upload_id=%s", key, upload_id)
+            try:
+                self._client.abort_multipart_upload(**args, UploadId=upload_id)
+            except Exception:
+                LOGGER.exception("Abort of multipart upload of key=%s, upload_id=%s failed", key, upload_id)
+            raise
+
+        if verify_checksum:
+            digests = b"".join(part["MD5"] for part in completed_parts)
+            expected_etag = f'"{hashlib.md5(digests, usedforsecurity=False).hexdigest()}-{len(completed_parts)}"'
+            if response["ETag"] != expected_etag:
+                raise ChecksumMismatchError(f"Object key={key} ETag={response['ETag']} does not match {expected_etag}")
+        return self._bucket.Object(key)
+
+    def _upload_parts(
+        self,
+        args: Dict[str, Any],
+        parts: Iterator[bytes],
+        concurrency: int,
+        verify_checksum: bool,
+    ) -> List[Dict[str, Any]]:
+        """
+        Upload the parts on a bounded thread pool, stopping at the first failure
+
+        Returns:
+            (List[Dict[str, Any]]): the ETag, PartNumber and MD5 of every uploaded part, ordered by PartNumber
+        """
+        slots = threading.BoundedSemaphore(concurrency)
+        failed = threading.Event()
+
+        def on_done(future: Future) -> None:
+            if future.exception():
+                failed.set()
+            slots.release()
+
+        futures: List[Future] = []
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="s3-upload") as executor:
+            for part_number, body in enumerate(parts, start=1):
+                slots.acquire()
+                if failed.is_set():
+                    slots.release()
+                    break
+                future = executor.submit(self._upload_part, args, part_number, body, verify_checksum)
+                future.add_done_callback(on_done)
+                futures.append(future)
+        return [future.result() for future in futures]
+
+    def _upload_part(
+        self,
+        args: Dict[str, Any],
+        part_number: int,
+        body: bytes,
+        verify_checksum: bool,
+    ) -> Dict[str, Any]:
+        md5 = _md5(body) if verify_checksum else b""
+        part_args = dict(args, PartNumber=part_number, Body=body)
+        if verify_checksum:
+            part_args["ContentMD5"] = base64.b64encode(md5).decode("ascii")
+        response = self._client.upload_part(**part_args)
+        if verify_checksum and response["ETag"] != f'"{md5.hex()}"':
+            raise Exception(f"Part={part_number} of key={args['Key']} ETag={response['ETag']} does not match")
+        return {"ETag": response["ETag"], "PartNumber": part_number, "MD5": md5}
+
     def get_content(self, key: str) -> StreamingBody:
-        return self._bucket.Object(key).get()["Body"]
+        """
+        Remarks:
+            When a read cache is configured the body could come from memory, see S3ReadCache
+
+        Reference:
+            https://docs.aws.amazon.com/AmazonS3/latest/API/API_GetObject.html#API_GetObject_RequestSyntax
+        """
+        from botocore.exceptions import ClientError
+
+        if not self._read_cache:
+            return self._bucket.Object(key).get()["Body"]
+
+        cache = self._read_cache
+        entry = cache.objects.get_entry(key)
+        args = {"Bucket": self._bucket.name, "Key": key}
+        if entry is not None:
+            if not entry.is_expired(cache.clock()):
+                cache.count("hits")
+                return _streaming_body(entry.value.body)
+            try:
+                response = self._client.get_object(**args, IfNoneMatch=entry.value.etag)
+            except ClientError as error:
+                if error.response.get("Error", {}).get("Code") != "304":
+                    raise
+                cache.count("revalidations")
+                cache.objects.touch(key)
+                return _streaming_body(entry.value.body)
+        else:
+            response = self._client.get_object(**args)
+
+        cache.count("misses")
+        if response["ContentLength"] > cache.max_object_bytes:
+            cache.objects.pop(key)
+            return response["Body"]
+        body = response["Body"].read()
+        cache.objects.put(key, _CachedObject(etag=response["ETag"], body=body))
+        return _streaming_body(body)
+
+    def iter_chunks(self, key: str, chunk_size: int = DEFAULT_READ_SIZE) -> Iterator[bytes]:
+        """
+        Stream the content of the object chunk by chunk, the memory used does not grow with the object size
+
+        Reference:
+            https://botocore.amazonaws.com/v1/documentation/api/latest/reference/response.html#botocore.response.StreamingBody.iter_chunks
+
+        Args:
+            key (str): the key of the object to read
+            chunk_size (int): the max size in bytes of every chunk. Optional, defaulted to 64 KiB.
+
+        Returns:
+            (Iterator[bytes]): the chunks of the object content
+        """
+        body = self.get_content(key)
+        try:
+            yield from body.iter_chunks(chunk_size=chunk_size)
+        finally:
+            body.close()
+
+    def download_to(
+        self,
+        key: str,
+        destination: Union[str, os.PathLike, bytearray, memoryview],
+        concurrency: int = DEFAULT_CONCURRENCY,
+        chunk_size: int = DEFAULT_RANGE_SIZE,
+    ) -> int:
+        """
+        Download the object with parallel ranged GETs, writing every range straight into its final position
+
+        Remarks:
+            When the destination is a path the file is pre-allocated and memory-mapped, so that
+            the object is never held in memory as a whole.
+            Every range is requested with If-Match on the ETag read at the beginning, the download
+            fails if the object is replaced in the meantime.
+            On failure the file is removed if the download created it, an existing file is left truncated.
+
+        Reference:
+            https://docs.aws.amazon.com/whitepapers/latest/s3-optimizing-performance-best-practices/use-byte-range-fetches.html
+
+        Args:
+            key (str): the key of the object to download
+            destination (Union[str, os.PathLike, bytearray, memoryview]): the path of the file to write or a
+                pre-allocated writable buffer at least as big as the object
+            concurrency (int): the max number of ranges downloaded in parallel. Optional, defaulted to 4.
+            chunk_size (int): the size in bytes of every range. Optional, defaulted to 8 MiB.
+
+        Returns:
+            (int): the number of bytes written
+
+        Raises:
+            ValueError: the destination buffer is smaller than the object
+        """
+        head = self._client.head_object(Bucket=self._bucket.name, Key=key)
+        size: int = head["ContentLength"]
+        etag: str = head["ETag"]
+
+        if isinstance(destination, (bytearray, memoryview)):
+            with memoryview(destination) as buffer, buffer.cast("B") as view:
+                if len(view) < size:
+                    raise ValueError(f"Destination buffer of {len(view)} bytes is smaller than key={key} {size} bytes")
+                self._download_ranges(key, etag, view, size, concurrency, chunk_size)
+            return size
+
+        created = not os.path.exists(destination)
+        try:
+            with open(destination, "w+b") as file:
+                file.truncate(size)
+                if size:
+                    with mmap.mmap(file.fileno(), size) as mapped:
+                        with memoryview(mapped) as view:
+                            self._download_ranges(key, etag, view, size, concurrency, chunk_size)
+                        mapped.flush()
+        except BaseException:
+            if created:
+                # the file may not exist (e.g. missing directory), the error of the download is raised
+                with contextlib.suppress(OSError):
+                    os.remove(destination)
+            raise
+        return size
+
+    def _download_ranges(
+        self,
+        key: str,
+        etag: str,
+        view: memoryview,
+        size: int,
+        concurrency: int,
+        chunk_size: int,
+    ):
+        ranges: List[Tuple[int, int]] = [(start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)]
+        if len(ranges) == 1 or concurrency == 1:
+            for start, end in ranges:
+                self._download_range(key, etag, view, start, end)
+            return
+        with ThreadPoolExecutor(
+            max_workers=min(concurrency, len(ranges)), thread_name_prefix="s3-download"
+        ) as executor:
+            futures = [executor.submit(self._download_range, key, etag, view, start, end) for start, end in ranges]
+            for future in futures:
+                future.result()
+
+    def _download_range(self, key: str, etag: str, view: memoryview, start: int, end: int):
+        response = self._client.get_object(
+            Bucket=self._bucket.name, Key=key, Range=f"bytes={start}-{end - 1}", IfMatch=etag
+        )
+        offset = start
+        for chunk in response["Body"].iter_chunks(chunk_size=DEFAULT_READ_SIZE):
+            chunk_end = offset + len(chunk)
+            view[offset:chunk_end] = chunk
+            offset = chunk_end
+        if offset != end:
+            raise Exception(f"Range bytes={start}-{end - 1} of key={key} returned {offset - start} bytes")
+
+    def iter_objects(
+        self,
+        prefix: str = "",
+        delimiter: Optional[str] = None,
+        start_after: Optional[str] = None,
+        page_size: int = MAX_LIST_KEYS,
+    ) -> Iterator[S3ObjectSummary]:
+        """
+        List the objects of the bucket, requesting the next page only when the previous one is consumed
+
+        Reference:
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/paginator/ListObjectsV2.html
+
+        Args:
+            prefix (str): list only the keys that begin with the prefix. Optional, defaulted to all the keys.
+            delimiter (Optional[str]): list only the keys that do not contain the delimiter after the prefix
+                (e.g. "/" to list only the direct children of the prefix), the common prefixes are skipped
+            start_after (Optional[str]): list only the keys that come after this key in lexicographical order
+            page_size (int): the number of keys requested in a single page. Optional, defaulted to 1000.
+
+        Returns:
+            (Iterator[S3ObjectSummary]): the key, size and etag of every object, sorted by key
+        """
+        for page in self._iter_pages(prefix=prefix, delimiter=delimiter, start_after=start_after, page_size=page_size):
+            yield from page
+
+    def iter_objects_parallel(
+        self,
+        prefix: str = "",
+        shards: Iterable[str] = HEX_SHARDS,
+        concurrency: int = DEFAULT_LIST_CONCURRENCY,
+        page_size: int = MAX_LIST_KEYS,
+    ) -> Iterator[S3ObjectSummary]:
+        """
+        List the objects of the bucket splitting the keyspace by prefix, the shards are listed concurrently
+
+        Remarks:
+            Only the keys that begin with prefix + shard are listed, so the shards have to cover
+            the whole keyspace (e.g. the default hex shards for keys like users/<uuid4>.json).
+            The objects are not sorted. At most 2 * concurrency pages are buffered in memory, the
+            listing of the shards is paused until the pages are consumed.
+
+        Args:
+            prefix (str): list only the keys that begin with the prefix. Optional, defaulted to all the keys.
+            shards (Iterable[str]): the suffixes appended to the prefix to split the keyspace.
+                Optional, defaulted to the 16 hex chars.
+            concurrency (int): the max number of shards listed in parallel. Optional, defaulted to 16.
+            page_size (int): the number of keys requested in a single page. Optional, defaulted to 1000.
+
+        Returns:
+            (Iterator[S3ObjectSummary]): the key, size and etag of every object
+        """
+        return fan_in(
+            producers=[
+                partial(self._iter_pages, prefix=prefix + shard, page_size=page_size) for shard in dict.fromkeys(shards)
+            ],
+            concurrency=concurrency,
+        )
+
+    def _iter_pages(
+        self,
+        prefix: str,
+        delimiter: Optional[str] = None,
+        start_after: Optional[str] = None,
+        page_size: int = MAX_LIST_KEYS,
+    ) -> Iterator[List[S3ObjectSummary]]:
+        args: Dict[str, Any] = {
+            "Bucket": self._bucket.name,
+            "Prefix": prefix,
+            "PaginationConfig": {"PageSize": page_size},
+        }
+        if delimiter:
+            args["Delimiter"] = delimiter
+        if start_after:
+            args["StartAfter"] = start_after
+        for page in self._client.get_paginator("list_objects_v2").paginate(**args):
+            yield [
+                S3ObjectSummary(key=item["Key"], size=item["Size"], etag=item["ETag"])
+                for item in page.get("Contents", [])
+            ]
 
     def delete_file(self, key: str) -> Dict[str, Union[str, List[Dict[str, Any]]]]:
+        self._invalidate(key)
         return self._bucket.delete_objects(
             Delete={
                 "Objects": [
@@ -43,3 +659,47 @@ class S3Bucket:
                 ]
             },
         )
+
+    def delete_files(self, keys: Iterable[str], concurrency: int = 1) -> List[S3DeleteError]:
+        """
+        Delete the objects with one DeleteObjects request every 1000 keys
+
+        Remarks:
+            The requests are sent in quiet mode, so the response contains only the keys that
+            could not be deleted. Deleting a key that does not exist is not an error.
+
+        Reference:
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/bucket/delete_objects.html
+
+        Args:
+            keys (Iterable[str]): the keys of the objects to delete, duplicates are removed
+            concurrency (int): the max number of DeleteObjects requests sent in parallel. Optional, defaulted to 1.
+
+        Returns:
+            (List[S3DeleteError]): the keys that could not be deleted, empty if all the objects were deleted
+        """
+        batches = list(chunked(dict.fromkeys(keys), MAX_DELETE_KEYS))
+        if concurrency == 1 or len(batches) <= 1:
+            responses = [self._delete_batch(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(
+                max_workers=min(concurrency, len(batches)), thread_name_prefix="s3-delete"
+            ) as executor:
+                responses = list(executor.map(self._delete_batch, batches))
+        return [error for errors in responses for error in errors]
+
+    def _delete_batch(self, keys: List[str]) -> List[S3DeleteError]:
+        for key in keys:
+            self._invalidate(key)
+        response = self._bucket.delete_objects(
+            Delete={
+                "Objects": [{"Key": key} for key in keys],
+                "Quiet": True,
+            },
+        )
+        errors = [
+            S3DeleteError(key=error["Key"], code=error.get("Code", ""), message=error.get("Message", ""))
+            for error in response.get("Errors", [])
+        ]
+        LOGGER.debug("Deleted %s objects from bucket %s, errors=%s", len(keys) - len(errors), self._bucket.name, errors)
+        return errors
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import logging
+from abc import abstractmethod
+from typing import Any, Dict, List
+from itertools import chain
+from dataclasses import field, dataclass
+
+from micro_aws.base_handler import BaseLambdaHandler
+
+LOGGER = logging.getLogger()
+
+
+class RetriableError(Exception):
+    """The record could be processed later (e.g. throttling, timeout), it has to be redelivered"""
+
+
+class PoisonMessageError(Exception):
+    """The record will never be processed (e.g. malformed body), redelivering it would only waste invocations"""
+
+
+class TimeBudgetExceededError(RetriableError):
+    """The record was not processed because the invocation was about to time out (see TimeBudget)"""
+
+
+@dataclass
+class SqsBatchResult:
+    """
+    Outcome of the processing of a batch of SQS records, keyed by messageId
+
+    Remarks:
+        The retriable failures and the poison messages are reported as batchItemFailures, so that SQS
+        redelivers them. The redrive policy of the queue (maxReceiveCount) moves the poison messages to the
+        dead-letter queue, where they can be inspected instead of being lost. They are kept apart to be
+        logged as poison and never remembered as processed (see IdempotencyStore).
+        Any exception that is not a PoisonMessageError is considered retriable.
+
+    Reference:
+        https://docs.aws.amazon.com/lambda/latest/dg/with-sqs.html#services-sqs-batchfailurereporting
+    """
+
+    retriable: Dict[str, Exception] = field(default_factory=dict)
+    poison: Dict[str, Exception] = field(default_factory=dict)
+
+    def fail(self, message_id: str, exc: Exception):
+        if isinstance(exc, PoisonMessageError):
+            LOGGER.error("Poison message=%s: %s", message_id, exc, extra={"type": "poison-message"})
+            self.poison[message_id] = exc
+        else:
+            LOGGER.error("Failed message=%s: %s", message_id, exc, exc_info=exc, extra={"type": "retriable-message"})
+            self.retriable[message_id] = exc
+
+    def fail_all(self, message_ids: List[str], exc: Exception):
+        for message_id in message_ids:
+            self.fail(message_id, exc)
+
+    def defer(self, message_ids: List[str]):
+        """
+        Report the records not processed for lack of time, so that they are redelivered
+
+        Args:
+            message_ids (List[str]): the messageId of the records not processed
+        """
+        if not message_ids:
+            return
+        LOGGER.warning("Time budget exceeded, deferred messages=%s", message_ids, extra={"type": "deferred-message"})
+        exc = TimeBudgetExceededError("Time budget exceeded")
+        for message_id in message_ids:
+            self.retriable[message_id] = exc
+
+    def to_response(self) -> Dict[str, List[Dict[str, str]]]:
+        message_ids = dict.fromkeys(chain(self.retriable, self.poison))
+        return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in message_ids]}
+
+
+class BaseSqsBatchHandler(BaseLambdaHandler):
+    """
+    Base class of the Lambda handlers that process SQS batches with partial batch responses
+
+    Remarks:
+        The event source mapping needs FunctionResponseTypes: ReportBatchItemFailures,
+        otherwise the response is ignored and the whole batch is considered successful.
+        The queue needs a RedrivePolicy towards a dead-letter queue, otherwise the poison messages
+        are redelivered until the end of their retention period.
+        The handlers can stop early with process_within_budget and defer the remaining records
+        (see SqsBatchResult.defer), instead of running into the Lambda timeout.
+
+    Example:
+    >>> class NewHandler(BaseSqsBatchHandler):
+    >>>     def process_records(self, records, result, context, **kwargs):
+    >>>         for record in records:
+    >>>             try:
+    >>>                 ...
+    >>>             except Exception as exc:
+    >>>                 result.fail(record["messageId"], exc)
+    """
+
+    def handle_request(
+        self,
+        event: Dict[str, Any],
+        context: Any,
+        **kwargs: Any,
+    ) -> Dict[str, List[Dict[str, str]]]:
+        """
+        Returns:
+            (Dict[str, List[Dict[str, str]]]): the partial batch response, with the messageId of every
+                record that failed, retriable or poison
+        """
+        result = SqsBatchResult()
+        records: List[Dict[str, Any]] = event.get("Records", [])
+        try:
+            self.process_records(records=records, result=result, context=context, **kwargs)
+        except Exception as exc:
+            # unexpected failure of the whole batch: the outcome of the records not failed yet is unknown
+            LOGGER.exception(exc)
+            result.fail_all(
+                [
+                    record["messageId"]
+                    for record in records
+                    if record["messageId"] not in result.poison and record["messageId"] not in result.retriable
+                ],
+                RetriableError(str(exc)),
+            )
+        return result.to_response()
+
+    @abstractmethod
+    def process_records(
+        self,
+        records: List[Dict[str, Any]],
+        result: SqsBatchResult,
+        context: Any,
+        **kwargs: Any,
+    ):
+        """
+        Process the records of the batch, calling result.fail for every record that failed
+
+        Args:
+            records (List[Dict[str, Any]]): the SQS records of the batch
+            result (SqsBatchResult): the outcome of the batch, a record without failures is successful
+            context (object): Object that provides methods, properties and information about the invocation,
+                function, and execution environment.
+            **kwargs (Any): the optional kwargs passed to handle_request
+        """
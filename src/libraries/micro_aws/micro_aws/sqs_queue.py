@@ -1,11 +1,26 @@
 from __future__ import annotations
 
 import json
-from typing import Any, Dict
-
-from boto3.resources.base import ServiceResource
+import logging
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple, Iterator, Optional
 
 from micro_core.utils import AwsEncoder
+from micro_core.compression import (
+    DEFAULT_COMPRESSION_LEVEL,
+    CONTENT_ENCODING_ATTRIBUTE,
+    DEFAULT_COMPRESSION_THRESHOLD,
+    compress_body,
+)
+
+if TYPE_CHECKING:
+    from boto3.resources.base import ServiceResource
+
+LOGGER = logging.getLogger()
+
+# https://docs.aws.amazon.com/AWSSimpleQueueService/latest/APIReference/API_SendMessageBatch.html
+MAX_BATCH_ENTRIES = 10
+# the sum of the sizes of the messages of a batch, bodies and attributes included
+MAX_BATCH_BYTES = 256 * 1024
 
 
 class SqsQueue:
@@ -14,21 +29,141 @@ class SqsQueue:
     (wrapper around boto3.session.Session.resource('sqs'))
     """
 
-    def __init__(self, boto3_sqs_queue: Any):
+    def __init__(
+        self,
+        boto3_sqs_queue: Any,
+        codec: Optional[str] = None,
+        compression_threshold: int = DEFAULT_COMPRESSION_THRESHOLD,
+        compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+    ):
+        """
+        Args:
+            boto3_sqs_queue (Any): the instance of a boto3.session.Session.resource('sqs').Queue(<queue_url>)
+            codec (Optional[str]): the codec used to compress the message bodies (see micro_core.compression),
+                None to send them as plain json. Optional, defaulted to None.
+            compression_threshold (int): minimum size in bytes of a message body to be compressed
+            compression_level (int): the compression level, from 1 (fastest) to 9 (smallest)
+        """
         self._queue = boto3_sqs_queue
+        self._codec = codec
+        self._compression_threshold = compression_threshold
+        self._compression_level = compression_level
 
     @classmethod
-    def from_boto3_sqs_resource(cls, boto3_sqs_resource: ServiceResource, queue_url: str) -> SqsQueue:
+    def from_boto3_sqs_resource(
+        cls,
+        boto3_sqs_resource: ServiceResource,
+        queue_url: str,
+        **kwargs: Any,
+    ) -> SqsQueue:
         """
         Args:
             boto3_sqs_resource (ServiceResource): the instance of a boto3.session.Session.resource('sqs')
             queue_url (str): the arn of the topic where publish the messages
+            **kwargs (Any): the optional compression settings, see SqsQueue.__init__
         """
-        return cls(boto3_sqs_resource.Queue(queue_url))
+        return cls(boto3_sqs_resource.Queue(queue_url), **kwargs)
+
+    def _encode_body(self, body: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Serialize the body as json and compress it when a codec is configured
+
+        Returns:
+            (Tuple):
+                message_body (str): the body to send
+                message_attributes (Dict[str, Any]): the attributes that describe the body encoding
+        """
+        message_body = json.dumps(body, cls=AwsEncoder)
+        if not self._codec:
+            return message_body, {}
+        message_body, codec = compress_body(
+            body=message_body,
+            codec=self._codec,
+            threshold=self._compression_threshold,
+            level=self._compression_level,
+        )
+        if not codec:
+            return message_body, {}
+        return message_body, {CONTENT_ENCODING_ATTRIBUTE: {"DataType": "String", "StringValue": codec}}
 
     def send_message(self, body: Dict[str, Any]) -> Dict[str, str]:
         """
         Reference:
         https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/sqs.html#SQS.Queue.send_message
         """
-        return self._queue.send_message(MessageBody=json.dumps(body, cls=AwsEncoder))
+        message_body, message_attributes = self._encode_body(body)
+        args: Dict[str, Any] = {"MessageBody": message_body}
+        if message_attributes:
+            args["MessageAttributes"] = message_attributes
+        return self._queue.send_message(**args)
+
+    def _batches(self, bodies: List[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Encode the bodies into entries, grouped in batches of at most MAX_BATCH_ENTRIES entries and MAX_BATCH_BYTES
+
+        Remarks:
+            A message bigger than MAX_BATCH_BYTES on its own is sent alone, SQS rejects it.
+        """
+        batch: List[Dict[str, Any]] = []
+        batch_size = 0
+        for index, body in enumerate(bodies):
+            message_body, message_attributes = self._encode_body(body)
+            entry: Dict[str, Any] = {"Id": str(index), "MessageBody": message_body}
+            if message_attributes:
+                entry["MessageAttributes"] = message_attributes
+            size = _message_size(message_body, message_attributes)
+            if batch and (len(batch) == MAX_BATCH_ENTRIES or batch_size + size > MAX_BATCH_BYTES):
+                yield batch
+                batch, batch_size = [], 0
+            batch.append(entry)
+            batch_size += size
+        if batch:
+            yield batch
+
+    def send_messages(self, bodies: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Send the messages in batches of 10 entries and 256 KiB at most (see _batches)
+
+        Remarks:
+            A batch that fails as a whole (e.g. connection error, throttling) does not stop the others:
+            all its entries are reported in Failed, with the error as Code and Message.
+
+        Reference:
+        https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/sqs.html#SQS.Queue.send_messages
+
+        Args:
+            bodies (List[Dict[str, Any]]): the list of message bodies to send
+
+        Returns:
+            (Dict[str, List[Dict[str, Any]]]): the merged Successful and Failed entries of all the batches,
+                the Id of every entry is the index of the body in the bodies param
+        """
+        result: Dict[str, List[Dict[str, Any]]] = {"Successful": [], "Failed": []}
+        for entries in self._batches(bodies):
+            try:
+                response = self._queue.send_messages(Entries=entries)
+            except Exception as exc:
+                LOGGER.error("Batch of %s messages not sent: %s", len(entries), exc)
+                response = {
+                    "Failed": [
+                        {"Id": entry["Id"], "SenderFault": False, "Code": type(exc).__name__, "Message": str(exc)}
+                        for entry in entries
+                    ]
+                }
+            result["Successful"].extend(response.get("Successful", []))
+            result["Failed"].extend(response.get("Failed", []))
+        return result
+
+
+def _message_size(message_body: str, message_attributes: Dict[str, Any]) -> int:
+    """
+    The size of a message as counted by SQS: the body plus the name, type and value of every attribute
+
+    Reference:
+        https://docs.aws.amazon.com/AWSSimpleQueueService/latest/SQSDeveloperGuide/sqs-message-metadata.html
+    """
+    size = len(message_body.encode("utf-8"))
+    for name, attribute in message_attributes.items():
+        size += len(name.encode("utf-8")) + len(attribute["DataType"].encode("utf-8"))
+        size += len(attribute.get("StringValue", "").encode("utf-8"))
+    return size
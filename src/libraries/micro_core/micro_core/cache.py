@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import time
+import threading
+from typing import Any, Generic, TypeVar, Callable, Hashable, Optional
+from collections import OrderedDict
+from dataclasses import dataclass
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+@dataclass
+class CacheEntry(Generic[V]):
+    value: V
+    weight: int
+    expires_at: Optional[float] = None
+
+    def is_expired(self, now: float) -> bool:
+        return self.expires_at is not None and now >= self.expires_at
+
+
+class LRUCache(Generic[K, V]):
+    """
+    Thread safe in-process cache with least recently used eviction, bounded by number of entries
+    and optionally by the total weight (e.g. size in bytes) of the values
+
+    Example:
+    >>> cache = LRUCache(max_entries=100, max_weight=1024 * 1024, weigher=len, ttl=60)
+    >>> cache.put("key", b"value")
+    >>> cache.get("key")
+    b'value'
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_weight: Optional[int] = None,
+        weigher: Optional[Callable[[V], int]] = None,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            max_entries (int): the max number of entries. Optional, defaulted to 1024.
+            max_weight (Optional[int]): the max total weight of the entries, None for no limit
+            weigher (Optional[Callable[[V], int]]): the function that computes the weight of a value,
+                every value weighs 1 if not specified
+            ttl (Optional[float]): the seconds after which an entry expires, None for no expiration
+            clock (Callable[[], float]): the source of the current time in seconds. Optional,
+                defaulted to time.monotonic.
+        """
+        self._max_entries = max_entries
+        self._max_weight = max_weight
+        self._weigher = weigher
+        self._ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[K, CacheEntry[V]] = OrderedDict()
+        self._weight = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Any) -> bool:
+        return self.get(key) is not None
+
+    @property
+    def weight(self) -> int:
+        return self._weight
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        """
+        Returns:
+            (Optional[V]): the value of the key, the default if the key is missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry.is_expired(self._clock()):
+                self._remove(key)
+                return default
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def get_entry(self, key: K) -> Optional[CacheEntry[V]]:
+        """
+        Get the entry of the key even if expired, e.g. to revalidate it against its source
+
+        Returns:
+            (Optional[CacheEntry[V]]): the entry of the key, None if missing
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: K, value: V, ttl: Optional[float] = None) -> bool:
+        """
+        Args:
+            key (K): the key of the entry
+            value (V): the value of the entry
+            ttl (Optional[float]): the seconds after which the entry expires, overrides the cache ttl
+
+        Returns:
+            (bool): False if the value weighs more than max_weight and it was not stored
+        """
+        weight = self._weigher(value) if self._weigher else 1
+        if self._max_weight is not None and weight > self._max_weight:
+            self.pop(key)
+            return False
+        ttl = ttl if ttl is not None else self._ttl
+        entry = CacheEntry(value=value, weight=weight, expires_at=self._clock() + ttl if ttl is not None else None)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._weight += weight
+            self._evict()
+        return True
+
+    def touch(self, key: K, ttl: Optional[float] = None) -> bool:
+        """
+        Restart the time to live of the entry, e.g. after it was revalidated against its source
+
+        Returns:
+            (bool): False if the key is missing
+        """
+        ttl = ttl if ttl is not None else self._ttl
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            entry.expires_at = self._clock() + ttl if ttl is not None else None
+            self._entries.move_to_end(key)
+            return True
+
+    def pop(self, key: K) -> Optional[V]:
+        with self._lock:
+            entry = self._remove(key)
+            return entry.value if entry else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._weight = 0
+
+    def _remove(self, key: K) -> Optional[CacheEntry[V]]:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._weight -= entry.weight
+        return entry
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self._max_entries or (self._max_weight is not None and self._weight > self._max_weight)
+        ):
+            _, entry = self._entries.popitem(last=False)
+            self._weight -= entry.weight
@@ -0,0 +1,125 @@
+import zlib
+import base64
+import binascii
+from typing import Any, Tuple, Mapping, Optional
+
+# Name of the message attribute used to mark the codec applied to the message body
+CONTENT_ENCODING_ATTRIBUTE = "content-encoding"
+
+IDENTITY = "identity"
+GZIP = "gzip"
+DEFLATE = "deflate"
+
+# zlib wbits value for each supported codec
+# https://docs.python.org/3/library/zlib.html#zlib.compressobj
+_WBITS = {
+    GZIP: 16 + zlib.MAX_WBITS,
+    DEFLATE: zlib.MAX_WBITS,
+}
+
+DEFAULT_COMPRESSION_THRESHOLD = 1024
+DEFAULT_COMPRESSION_LEVEL = 6
+
+
+def compress_body(
+    body: str,
+    codec: str = GZIP,
+    threshold: int = DEFAULT_COMPRESSION_THRESHOLD,
+    level: int = DEFAULT_COMPRESSION_LEVEL,
+) -> Tuple[str, Optional[str]]:
+    """
+    Compress a text body and encode it with base64, so that it can be sent as a text payload
+    (e.g. SQS message body)
+
+    Remarks:
+        The body is left untouched if its size is below the threshold or if the compressed
+        representation is not smaller than the original one.
+
+    Args:
+        body (str): the text payload to compress
+        codec (str): the codec to apply, one of gzip or deflate. Optional, defaulted to gzip.
+        threshold (int): minimum size in bytes of the utf-8 encoded body to apply the compression.
+            Optional, defaulted to 1024.
+        level (int): the compression level, from 1 (fastest) to 9 (smallest). Optional, defaulted to 6.
+
+    Returns:
+        (Tuple):
+            body (str): the compressed and base64 encoded body, or the original one
+            codec (Optional[str]): the codec applied to the body, None if the body was left untouched
+
+    Raises:
+        ValueError: the codec is not supported
+    """
+    if codec not in _WBITS:
+        raise ValueError(f"Unsupported codec={codec}, expected one of {sorted(_WBITS)}")
+    raw = body.encode("utf-8")
+    if len(raw) < threshold:
+        return body, None
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _WBITS[codec])
+    compressed = base64.b64encode(compressor.compress(raw) + compressor.flush())
+    if len(compressed) >= len(raw):
+        return body, None
+    return compressed.decode("ascii"), codec
+
+
+def decompress_body(body: str, codec: Optional[str] = None) -> str:
+    """
+    Reverse the compress_body function
+
+    Args:
+        body (str): the text payload to decompress
+        codec (Optional[str]): the codec applied to the body, None or identity if the body is not compressed
+
+    Returns:
+        (str): the original text payload
+
+    Raises:
+        ValueError: the codec is not supported or the body can not be decoded with the codec
+    """
+    if not codec or codec == IDENTITY:
+        return body
+    if codec not in _WBITS:
+        raise ValueError(f"Unsupported codec={codec}, expected one of {sorted(_WBITS)}")
+    try:
+        return zlib.decompress(base64.b64decode(body, validate=True), _WBITS[codec]).decode("utf-8")
+    except (binascii.Error, zlib.error) as error:
+        raise ValueError(f"Body can not be decoded with codec={codec}") from error
+
+
+def sqs_message_codec(message: Mapping[str, Any]) -> Optional[str]:
+    """
+    Read the codec from the message attributes of an SQS message
+
+    Remarks:
+        It supports both the shape of the records received by AWS Lambda
+        (messageAttributes -> stringValue) and the one returned by boto3 receive_message
+        (MessageAttributes -> StringValue)
+
+    Args:
+        message (Mapping[str, Any]): the SQS message (AWS Lambda record or boto3 message)
+
+    Returns:
+        (Optional[str]): the codec applied to the message body, None if not specified
+    """
+    attributes = message.get("messageAttributes") or message.get("MessageAttributes") or {}
+    attribute = attributes.get(CONTENT_ENCODING_ATTRIBUTE)
+    if not attribute:
+        return None
+    return attribute.get("stringValue") or attribute.get("StringValue")
+
+
+def decode_sqs_message_body(message: Mapping[str, Any]) -> str:
+    """
+    Get the original body of an SQS message, decompressing it if needed
+
+    Reference:
+        https://docs.aws.amazon.com/lambda/latest/dg/with-sqs.html
+
+    Args:
+        message (Mapping[str, Any]): the SQS message (AWS Lambda record or boto3 message)
+
+    Returns:
+        (str): the original message body
+    """
+    body: str = message["body"] if "body" in message else message.get("Body", "")
+    return decompress_body(body=body, codec=sqs_message_codec(message))
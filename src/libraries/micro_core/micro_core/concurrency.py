@@ -0,0 +1,69 @@
+import queue
+import threading
+from typing import Any, List, Generic, TypeVar, Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+T = TypeVar("T")
+
+
+class _FanIn(Generic[T]):
+    def __init__(self, producers: List[Callable[[], Iterator[List[T]]]], concurrency: int):
+        self._producers = producers
+        self._concurrency = concurrency
+        self._buffer: queue.Queue = queue.Queue(maxsize=2 * concurrency)
+        self._stop = threading.Event()
+        self._producer_done = object()
+
+    def _put(self, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self, producer: Callable[[], Iterator[List[T]]]):
+        try:
+            for items in producer():
+                if items and not self._put(items):
+                    return
+            self._put(self._producer_done)
+        except Exception as exc:
+            self._put(exc)
+
+    def __iter__(self) -> Iterator[T]:
+        executor = ThreadPoolExecutor(max_workers=self._concurrency, thread_name_prefix="fan-in")
+        try:
+            for producer in self._producers:
+                executor.submit(self._run, producer)
+            pending = len(self._producers)
+            while pending:
+                item = self._buffer.get()
+                if item is self._producer_done:
+                    pending -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield from item
+        finally:
+            self._stop.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def fan_in(producers: List[Callable[[], Iterator[List[T]]]], concurrency: int) -> Iterator[T]:
+    """
+    Run the producers on a bounded thread pool and yield the items of the lists (e.g. pages) they produce
+
+    Remarks:
+        At most 2 * concurrency lists are buffered, the producers are paused until the lists are consumed.
+        The first exception raised by a producer is re-raised, closing the iterator stops all the producers.
+
+    Args:
+        producers (List[Callable[[], Iterator[List[T]]]]): the functions that produce lists of items
+        concurrency (int): the max number of producers running in parallel
+
+    Returns:
+        (Iterator[T]): the items, in no particular order
+    """
+    return iter(_FanIn(producers=producers, concurrency=concurrency))
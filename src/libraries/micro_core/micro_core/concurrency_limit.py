@@ -0,0 +1,101 @@
+import math
+from typing import Optional
+
+
+class GradientLimit:
+    """
+    Adaptive concurrency limit driven by the latency of the requests, e.g. of a service calling DynamoDB
+
+    The limit follows the ratio (gradient) between the long term latency (an exponential moving average
+    over about long_window samples) and the latency of the last sample:
+        - latency stable: the limit grows by sqrt(limit) per sample, probing for more throughput
+        - latency growing beyond tolerance x the long term one: the limit shrinks with the ratio, down to half
+        - failed request (e.g. timeout, 5xx): the limit is multiplied by backoff (AIMD decrease)
+    Every new limit is smoothed, then bounded by min_limit and max_limit.
+
+    Remarks:
+        The limit does not grow while less than half of it is used: the samples show no evidence that
+        more concurrency would be served at the same latency.
+        Not thread safe: one limit per event loop, updated by its requests (see AdmissionControlMiddleware).
+
+    Reference:
+        https://github.com/Netflix/concurrency-limits (Gradient2Limit)
+
+    Example:
+    >>> limit = GradientLimit(initial_limit=20)
+    >>> if in_flight < limit.limit:
+    >>>     ...
+    >>>     limit.update(rtt=elapsed, in_flight=in_flight, dropped=status >= 500)
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 20,
+        min_limit: int = 4,
+        max_limit: int = 200,
+        tolerance: float = 1.5,
+        smoothing: float = 0.2,
+        backoff: float = 0.9,
+        long_window: int = 600,
+    ):
+        """
+        Args:
+            initial_limit (int): the limit before the first sample. Optional, defaulted to 20.
+            min_limit (int): the lowest limit. Optional, defaulted to 4.
+            max_limit (int): the highest limit. Optional, defaulted to 200.
+            tolerance (float): the ratio of the latency to the long term one tolerated before shrinking the limit.
+                Optional, defaulted to 1.5.
+            smoothing (float): the weight of a new limit against the current one, in ]0, 1]. Optional, defaulted
+                to 0.2.
+            backoff (float): the factor applied to the limit on a failed request, in ]0, 1[. Optional, defaulted
+                to 0.9.
+            long_window (int): the number of samples of the long term latency. Optional, defaulted to 600.
+
+        Raises:
+            ValueError: min_limit <= initial_limit <= max_limit is not satisfied, or the factors are out of range
+        """
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError(f"Invalid limits min={min_limit} initial={initial_limit} max={max_limit}")
+        if tolerance < 1 or not 0 < smoothing <= 1 or not 0 < backoff < 1 or long_window < 1:
+            raise ValueError("Invalid tolerance, smoothing, backoff or long_window")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.backoff = backoff
+        self._alpha = 2 / (long_window + 1)
+        self._limit = float(initial_limit)
+        self._long_rtt: Optional[float] = None
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def long_rtt(self) -> Optional[float]:
+        return self._long_rtt
+
+    def update(self, rtt: float, in_flight: int, dropped: bool = False) -> int:
+        """
+        Args:
+            rtt (float): the latency of the request in seconds
+            in_flight (int): the requests in flight when the request ended, itself included
+            dropped (bool): True if the request failed. Optional, defaulted to False.
+
+        Returns:
+            (int): the new limit
+        """
+        if dropped:
+            new_limit = self._limit * self.backoff
+        else:
+            if self._long_rtt is None:
+                self._long_rtt = rtt
+            else:
+                self._long_rtt += (rtt - self._long_rtt) * self._alpha
+            gradient = max(0.5, min(1.0, self.tolerance * self._long_rtt / rtt)) if rtt > 0 else 1.0
+            if gradient == 1.0 and in_flight < self._limit / 2:
+                return self.limit
+            new_limit = self._limit * gradient + math.sqrt(self._limit)
+        new_limit = self._limit * (1 - self.smoothing) + new_limit * self.smoothing
+        self._limit = max(float(self.min_limit), min(float(self.max_limit), new_limit))
+        return self.limit
@@ -0,0 +1,25 @@
+import logging
+from typing import Any, Dict
+from datetime import datetime
+
+from pythonjsonlogger import jsonlogger
+
+
+class JsonLogFormatter(jsonlogger.JsonFormatter):
+    def add_fields(self, log_record: Dict[str, Any], record: logging.LogRecord, message_dict: Dict[str, Any]):
+        super().add_fields(log_record, record, message_dict)
+
+        # Add timestamp field with default : now
+        if not log_record.get("timestamp"):
+            now = datetime.utcnow().isoformat()
+            log_record["timestamp"] = now
+
+        # Add level field
+        if log_record.get("level"):
+            log_record["level"] = log_record["level"].upper()
+        else:
+            log_record["level"] = record.levelname
+
+        # Add type field for internal logs
+        if not log_record.get("type"):
+            log_record["type"] = "internal"
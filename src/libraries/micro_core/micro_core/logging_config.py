@@ -2,12 +2,10 @@ import json
 import logging
 from json import JSONEncoder
 from uuid import UUID
-from typing import Any, Dict, Union, Optional
+from typing import Any, Union, Optional
 from datetime import datetime
 from logging.config import dictConfig
 
-from pythonjsonlogger import jsonlogger
-
 
 # Custom JSON encoder which enforce standard ISO 8601 format, UUID format
 class ModelJsonEncoder(JSONEncoder):
@@ -19,6 +17,15 @@ class ModelJsonEncoder(JSONEncoder):
         return json.JSONEncoder.default(self, o)
 
 
+def __getattr__(name: str) -> Any:
+    # pythonjsonlogger is imported only when the logging is configured (see the Lambda cold start)
+    if name == "JsonLogFormatter":
+        from micro_core.json_log_formatter import JsonLogFormatter
+
+        return JsonLogFormatter
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 class LogFilter(logging.Filter):
     def __init__(self, service: Optional[str] = None, instance: Optional[str] = None):
         self.service = service
@@ -30,26 +37,6 @@ class LogFilter(logging.Filter):
         return True
 
 
-class JsonLogFormatter(jsonlogger.JsonFormatter):
-    def add_fields(self, log_record: Dict[str, Any], record: logging.LogRecord, message_dict: Dict[str, Any]):
-        super().add_fields(log_record, record, message_dict)
-
-        # Add timestamp field with default : now
-        if not log_record.get("timestamp"):
-            now = datetime.utcnow().isoformat()
-            log_record["timestamp"] = now
-
-        # Add level field
-        if log_record.get("level"):
-            log_record["level"] = log_record["level"].upper()
-        else:
-            log_record["level"] = record.levelname
-
-        # Add type field for internal logs
-        if not log_record.get("type"):
-            log_record["type"] = "internal"
-
-
 # Configure Logging
 def configure_logging(
     level: Union[str, int] = logging.DEBUG,
@@ -61,7 +48,7 @@ def configure_logging(
             "version": 1,
             "formatters": {
                 "default": {
-                    "()": JsonLogFormatter,
+                    "()": "micro_core.json_log_formatter.JsonLogFormatter",
                     "format": "%(timestamp)s %(level)s %(service)s %(instance)s %(type)s %(message)s",
                     "json_encoder": ModelJsonEncoder,
                 }
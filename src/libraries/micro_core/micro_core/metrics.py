@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import math
+import threading
+from typing import Dict, List, Tuple, Optional
+
+# relative width of the histogram buckets: every value is stored with an error below 5%
+DEFAULT_BUCKET_GROWTH = 1.1
+
+
+class Histogram:
+    """
+    Thread safe histogram of positive values (e.g. latencies) with logarithmic buckets
+
+    Remarks:
+        The memory used depends on the range of the values, not on their number:
+        values from 1 microsecond to 1 hour fit in less than 300 buckets.
+        The values lower or equal to zero are counted in a dedicated bucket.
+
+    Example:
+    >>> histogram = Histogram()
+    >>> for value in [1.0, 2.0, 3.0, 100.0]:
+    >>>     histogram.record(value)
+    >>> histogram.percentile(50)
+    2.0...
+    """
+
+    def __init__(self, growth: float = DEFAULT_BUCKET_GROWTH):
+        """
+        Args:
+            growth (float): the ratio between the bounds of a bucket, greater than 1. Optional, defaulted to 1.1.
+
+        Raises:
+            ValueError: the growth is not greater than 1
+        """
+        if growth <= 1:
+            raise ValueError(f"Invalid growth={growth}, expected a value greater than 1")
+        self._log_growth = math.log(growth)
+        self._growth = growth
+        self._buckets: Dict[int, int] = {}
+        self._zeros = 0
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def record(self, value: float, count: int = 1):
+        """
+        Args:
+            value (float): the value observed
+            count (int): the number of times the value was observed. Optional, defaulted to 1.
+        """
+        with self._lock:
+            if value <= 0:
+                self._zeros += count
+            else:
+                index = math.ceil(math.log(value) / self._log_growth)
+                self._buckets[index] = self._buckets.get(index, 0) + count
+            self.count += count
+            self.sum += value * count
+            self.min = value if self.min is None else min(self.min, value)
+            self.max = value if self.max is None else max(self.max, value)
+
+    def _value(self, index: int) -> float:
+        # middle point of the bucket (growth^(index-1), growth^index]
+        return self._growth ** (index - 0.5)
+
+    def buckets(self) -> List[Tuple[float, int]]:
+        """
+        Returns:
+            (List[Tuple[float, int]]): the (representative value, count) pairs of the non empty buckets,
+                sorted by value
+        """
+        with self._lock:
+            buckets = [(0.0, self._zeros)] if self._zeros else []
+            buckets.extend((self._value(index), self._buckets[index]) for index in sorted(self._buckets))
+        return buckets
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """
+        Args:
+            percentile (float): the percentile to compute, from 0 to 100
+
+        Returns:
+            (Optional[float]): the approximated value of the percentile, clamped between min and max,
+                None if the histogram is empty
+        """
+        if not self.count or self.min is None or self.max is None:
+            return None
+        rank = max(1, math.ceil(self.count * percentile / 100))
+        seen = 0
+        value = self.max
+        for value, count in self.buckets():
+            seen += count
+            if seen >= rank:
+                break
+        return min(max(value, self.min), self.max)
@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import os
+import json
+import time
+import bisect
+import threading
+from typing import Any, Dict, List, Tuple, Iterator, Optional, Sequence
+
+# seconds, the base unit of the Prometheus latencies
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# text exposition format, see https://prometheus.io/docs/instrumenting/exposition_formats/
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: Dict[Labels, Any] = {}
+
+    def _check(self, labels: Labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"Metric={self.name} expects the labels {self.labelnames}, got {labels}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            series = [[list(labels), value] for labels, value in self._series.items()]
+        return {"type": self.type, "help": self.documentation, "labelnames": list(self.labelnames), "series": series}
+
+
+class Counter(_Metric):
+    """Monotonic counter, e.g. the number of requests"""
+
+    type = "counter"
+
+    def inc(self, labels: Labels = (), amount: float = 1.0):
+        with self._lock:
+            value = self._series.get(labels)
+            if value is None:
+                self._check(labels)
+                value = 0.0
+            self._series[labels] = value + amount
+
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down, e.g. the requests in flight
+
+    Remarks:
+        The merge of the gauges of several processes (see MetricsRegistry.render) uses the mode:
+        sum (e.g. requests in flight of every worker) or max (e.g. event loop lag).
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), mode: str = "sum"):
+        if mode not in ("sum", "max"):
+            raise ValueError(f"Invalid mode={mode}, expected sum or max")
+        super().__init__(name, documentation, labelnames)
+        self.mode = mode
+
+    def inc(self, labels: Labels = (), amount: float = 1.0):
+        with self._lock:
+            value = self._series.get(labels)
+            if value is None:
+                self._check(labels)
+                value = 0.0
+            self._series[labels] = value + amount
+
+    def dec(self, labels: Labels = (), amount: float = 1.0):
+        self.inc(labels, -amount)
+
+    def set(self, value: float, labels: Labels = ()):
+        with self._lock:
+            if labels not in self._series:
+                self._check(labels)
+            self._series[labels] = value
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**super().snapshot(), "mode": self.mode}
+
+
+class Histogram(_Metric):
+    """
+    Cumulative histogram with fixed buckets, mergeable between processes
+
+    Remarks:
+        observe costs a binary search and a few additions under the lock of the metric.
+        See micro_core.metrics.Histogram for percentiles with a bounded relative error.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, labels: Labels = ()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # counts by bucket (the last one is +Inf), then sum and count
+            series = self._series.get(labels)
+            if series is None:
+                self._check(labels)
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**super().snapshot(), "buckets": list(self.buckets)}
+
+
+class MetricsRegistry:
+    """
+    In-process registry of metrics rendered in the Prometheus text exposition format
+
+    Remarks:
+        Every process (e.g. uvicorn worker) has its own registry. With a directory, every process writes
+        the snapshot of its registry there (write_snapshot, e.g. periodically) and render merges the
+        snapshots of all the processes: counters and histograms are summed, gauges are summed or maxed
+        (see Gauge), the gauges of the snapshots older than stale_after are dropped (dead processes).
+
+    Example:
+    >>> registry = MetricsRegistry()
+    >>> requests = registry.register(Counter("http_requests_total", "Requests", ["method"]))
+    >>> requests.inc(("GET",))
+    >>> registry.render()
+    """
+
+    def __init__(self, directory: Optional[str] = None, stale_after: float = 60.0):
+        """
+        Args:
+            directory (Optional[str]): the directory shared by the processes, None for a single process.
+                Optional, defaulted to None.
+            stale_after (float): the seconds after which the gauges of a snapshot not updated are dropped.
+                Optional, defaulted to 60.
+        """
+        self.directory = directory
+        self.stale_after = stale_after
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Any) -> Any:
+        """
+        Returns:
+            (Any): the metric registered
+
+        Raises:
+            ValueError: a metric with the same name is already registered
+        """
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric={metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def _snapshot_path(self, pid: int) -> str:
+        return os.path.join(self.directory or "", f"metrics-{pid}.json")
+
+    def write_snapshot(self):
+        """Write the snapshot of the process in the directory, atomically"""
+        if not self.directory:
+            return
+        path = self._snapshot_path(os.getpid())
+        with open(f"{path}.tmp", "w") as file:
+            json.dump(self.snapshot(), file, separators=(",", ":"))
+        os.replace(f"{path}.tmp", path)
+
+    def _snapshots(self) -> Iterator[Tuple[Dict[str, Dict[str, Any]], bool]]:
+        """
+        Returns:
+            (Iterator[Tuple]): the snapshots of all the processes, with True if the snapshot is fresh
+        """
+        if not self.directory:
+            yield self.snapshot(), True
+            return
+        self.write_snapshot()
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not (name.startswith("metrics-") and name.endswith(".json")):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path) as file:
+                    snapshot = json.load(file)
+                fresh = now - os.path.getmtime(path) <= self.stale_after
+            except (OSError, ValueError):
+                continue  # removed or replaced while reading
+            yield snapshot, fresh
+
+    @staticmethod
+    def _merge(merged: Dict[str, Dict[str, Any]], snapshot: Dict[str, Dict[str, Any]], fresh: bool):
+        for name, metric in snapshot.items():
+            if metric["type"] == "gauge" and not fresh:
+                continue
+            target = merged.setdefault(name, {**metric, "series": {}})
+            for labels, value in metric["series"]:
+                key = tuple(labels)
+                current = target["series"].get(key)
+                if current is None:
+                    target["series"][key] = value
+                elif metric["type"] == "histogram":
+                    target["series"][key] = [left + right for left, right in zip(current, value)]
+                elif metric["type"] == "gauge" and metric.get("mode") == "max":
+                    target["series"][key] = max(current, value)
+                else:
+                    target["series"][key] = current + value
+
+    def render(self) -> str:
+        """
+        Returns:
+            (str): the metrics of the process, or of all the processes with a directory, in the text format
+        """
+        merged: Dict[str, Dict[str, Any]] = {}
+        for snapshot, fresh in self._snapshots():
+            self._merge(merged, snapshot, fresh)
+        lines: List[str] = []
+        for name, metric in sorted(merged.items()):
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            for labels, value in sorted(metric["series"].items()):
+                pairs = [
+                    f'{label_name}="{_escape(label_value)}"'
+                    for label_name, label_value in zip(metric["labelnames"], labels)
+                ]
+                if metric["type"] == "histogram":
+                    lines.extend(_histogram_lines(name, pairs, metric["buckets"], value))
+                else:
+                    lines.append(f"{name}{_braces(pairs)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _braces(pairs: List[str]) -> str:
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _histogram_lines(name: str, pairs: List[str], buckets: List[float], series: List[float]) -> Iterator[str]:
+    cumulative = 0.0
+    for bound, count in zip(list(buckets) + [float("inf")], series):
+        cumulative += count
+        le = 'le="' + _format_value(bound) + '"'
+        yield f"{name}_bucket{_braces(pairs + [le])} {int(cumulative)}"
+    yield f"{name}_sum{_braces(pairs)} {_format_value(series[-2])}"
+    yield f"{name}_count{_braces(pairs)} {int(series[-1])}"
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, Dict, Generic, TypeVar, Callable, Hashable, Optional, Awaitable
+from dataclasses import dataclass
+
+T = TypeVar("T")
+
+# called on every call with its key and True if the call was coalesced, e.g. to export the stats as metrics
+FlightObserver = Callable[[Hashable, bool], None]
+
+
+@dataclass(frozen=True)
+class SingleFlightStats:
+    """
+    Attributes:
+        calls (int): the number of calls
+        executions (int): the number of calls that ran the function, one for every group of concurrent calls
+        coalesced (int): the number of calls that shared the result of an execution already in flight
+    """
+
+    calls: int = 0
+    executions: int = 0
+    coalesced: int = 0
+
+
+class _Counters:
+    def __init__(self) -> None:
+        self.executions = 0
+        self.coalesced = 0
+
+    def stats(self) -> SingleFlightStats:
+        return SingleFlightStats(
+            calls=self.executions + self.coalesced,
+            executions=self.executions,
+            coalesced=self.coalesced,
+        )
+
+
+class _Call(Generic[T]):
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Optional[T] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesces the concurrent calls with the same key from different threads: the first call runs
+    the function, the calls arriving while it is in flight wait for it and get the same result
+
+    Remarks:
+        The result is shared by all the callers of the group, it must not be mutated.
+        An exception is raised to every caller of the group. Nothing is cached: the next call after
+        the end of an execution runs the function again (see micro_core.cache for caching).
+
+    Example:
+    >>> single_flight = SingleFlight()
+    >>> item = single_flight.do(("user", user_id), lambda: table.get_item(hash_key_value=user_id))
+    """
+
+    def __init__(self, observer: Optional[FlightObserver] = None) -> None:
+        """
+        Args:
+            observer (Optional[FlightObserver]): called on every call, it must be cheap and must not raise.
+                Optional, defaulted to None.
+        """
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._counters = _Counters()
+        self._observer = observer
+
+    def do(self, key: Hashable, function: Callable[[], T]) -> T:
+        """
+        Args:
+            key (Hashable): the key of the call, the calls with equal keys are coalesced
+            function (Callable[[], T]): the function run by the first call of the group
+
+        Returns:
+            (T): the value returned by the function
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if call is None:
+                call = self._calls[key] = _Call()
+                self._counters.executions += 1
+            else:
+                self._counters.coalesced += 1
+        if self._observer is not None:
+            self._observer(key, not leader)
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value  # type: ignore[return-value]
+        try:
+            call.value = function()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+    def stats(self) -> SingleFlightStats:
+        with self._lock:
+            return self._counters.stats()
+
+
+class AsyncSingleFlight:
+    """
+    Coalesces the concurrent calls with the same key from the tasks of an event loop: the first call
+    starts the coroutine, the calls arriving while it is in flight await the same task
+
+    Remarks:
+        The coroutine runs in its own task: cancelling a caller (e.g. client disconnected) does not cancel
+        the execution shared by the other callers.
+        The result is shared by all the callers of the group, it must not be mutated.
+
+    Example:
+    >>> single_flight = AsyncSingleFlight()
+    >>> item = await single_flight.do(("user", user_id), partial(executor.run, table.get_item, hash_key_value=user_id))
+    """
+
+    def __init__(self, observer: Optional[FlightObserver] = None) -> None:
+        """
+        Args:
+            observer (Optional[FlightObserver]): called on every call, it must be cheap and must not raise.
+                Optional, defaulted to None.
+        """
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._counters = _Counters()
+        self._observer = observer
+
+    async def do(self, key: Hashable, function: Callable[[], Awaitable[T]]) -> T:
+        """
+        Args:
+            key (Hashable): the key of the call, the calls with equal keys are coalesced
+            function (Callable[[], Awaitable[T]]): the coroutine function run by the first call of the group
+
+        Returns:
+            (T): the value returned by the coroutine
+        """
+        task = self._calls.get(key)
+        coalesced = task is not None and task.get_loop() is asyncio.get_running_loop()
+        if task is None or not coalesced:
+            self._counters.executions += 1
+            task = self._calls[key] = asyncio.ensure_future(function())
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self._counters.coalesced += 1
+        if self._observer is not None:
+            self._observer(key, coalesced)
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Future[Any]):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # retrieved by the callers, avoids the "exception was never retrieved" warning without callers
+            task.exception()
+
+    def stats(self) -> SingleFlightStats:
+        return self._counters.stats()
@@ -1,9 +1,12 @@
 import json
 import base64
 from uuid import UUID
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Union, TypeVar, Iterable, Iterator
 from decimal import Decimal
 from datetime import datetime
+from itertools import islice
+
+T = TypeVar("T")
 
 
 def encode(data: Dict[Any, Any]) -> str:
@@ -94,3 +97,19 @@ def delete_keys(
         else:
             [item.pop(key) for key in keys]
     return items if is_list else items[0]
+
+
+def chunked(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """
+    Split the items in consecutive lists of size elements, only the last list can be shorter
+
+    Args:
+        items (Iterable[T]): the items to split
+        size (int): the max number of elements of every list
+
+    Returns:
+        (Iterator[List[T]]): the lists of items
+    """
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
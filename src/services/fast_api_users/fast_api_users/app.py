@@ -1,17 +1,24 @@
 import os
+import asyncio
 from uuid import uuid4
 
-import uvicorn
 from mangum import Mangum
 from fastapi import FastAPI, HTTPException, status
+from fastapi.responses import Response
+from fast_api_users.metrics import METRICS
 from fast_api_users.routers import users_router
 from fast_api_users.models.message_model import Message, MessageWithUUID
 from fast_api_users.handlers.exception_handler import exception_handler
-from fast_api_users.middlewares.logging_middleware import LoggingMiddleware
+from fast_api_users.middlewares.metrics_middleware import MetricsMiddleware
 from fast_api_users.handlers.http_exception_handler import http_exception_handler
-from fast_api_users.middlewares.correlation_id_middleware import CorrelationIdMiddleware
+from fast_api_users.middlewares.admission_middleware import AdmissionControlMiddleware
+from fast_api_users.middlewares.compression_middleware import CompressionMiddleware
+from fast_api_users.middlewares.request_context_middleware import RequestContextMiddleware
 
+from micro_aws.clients import get_registry
+from micro_core.prometheus import CONTENT_TYPE
 from micro_core.logging_config import configure_logging
+from micro_core.concurrency_limit import GradientLimit
 
 app = FastAPI(
     title="fast-api-users",
@@ -46,9 +53,44 @@ app.add_exception_handler(HTTPException, http_exception_handler)
 #   Middlewares configuration                                                 #
 ###############################################################################
 
-# Tip : middleware order : CorrelationIdMiddleware > LoggingMiddleware -> reverse order
-app.add_middleware(LoggingMiddleware)
-app.add_middleware(CorrelationIdMiddleware)
+# the last middleware added is the outermost one
+# content-encoding negotiation, the streaming responses are compressed chunk by chunk
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024")))
+# adaptive concurrency limit of the worker: the excess requests get a 503 right away, the writes first
+app.add_middleware(
+    AdmissionControlMiddleware,
+    limit=GradientLimit(
+        initial_limit=int(os.getenv("ADMISSION_INITIAL_LIMIT", "20")),
+        max_limit=int(os.getenv("ADMISSION_MAX_LIMIT", "200")),
+    ),
+    metrics=METRICS,
+)
+# latency by route template and status, requests in flight
+app.add_middleware(MetricsMiddleware, metrics=METRICS)
+# correlation id, request/response logs and x-correlation-id header (pure ASGI: the bodies are not buffered)
+app.add_middleware(RequestContextMiddleware)
+
+###############################################################################
+#   Metrics configuration                                                     #
+###############################################################################
+
+# latency and errors of the DynamoDB and SQS calls
+get_registry().add_call_observer(METRICS.observe_aws_call)
+
+
+@app.on_event("startup")
+async def start_event_loop_monitor():
+    # not under Lambda: the event loop is frozen between the invocations
+    if not os.getenv("AWS_EXECUTION_ENV"):
+        app.state.event_loop_monitor = asyncio.create_task(METRICS.monitor_event_loop())
+
+
+@app.on_event("shutdown")
+async def stop_event_loop_monitor():
+    monitor = getattr(app.state, "event_loop_monitor", None)
+    if monitor is not None:
+        monitor.cancel()
+
 
 ###############################################################################
 #   Routers configuration                                                     #
@@ -60,6 +102,13 @@ def health():
     return Message(message="healthy")
 
 
+@app.get("/users/metrics", include_in_schema=False)
+def metrics():
+    # sync endpoint: the snapshots of the other workers are read in the threadpool
+    # the content type in the headers, the media_type of starlette would add a second charset
+    return Response(METRICS.registry.render(), headers={"Content-Type": CONTENT_TYPE})
+
+
 app.include_router(users_router.router)
 
 ###############################################################################
@@ -73,4 +122,7 @@ handler = Mangum(app)
 ###############################################################################
 
 if __name__ == "__main__":
+    # only for the local runs: uvicorn is not imported by the Lambda
+    import uvicorn
+
     uvicorn.run(app, host="0.0.0.0", port=5000)
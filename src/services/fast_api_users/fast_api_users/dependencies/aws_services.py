@@ -1,17 +1,20 @@
 import logging
 from functools import lru_cache
 
-import boto3
 from boto3.resources.base import ServiceResource
 
+from micro_aws.clients import get_registry
+
 LOGGER = logging.getLogger()
 
 
+# a single resource per process, shared by the threads of the executor: the table and the queue built on it
+# (see dependencies.users) load it once, then only call its actions (see the remarks of ClientRegistry)
 @lru_cache
 def boto3_dynamodb_resource() -> ServiceResource:
-    return boto3.resource("dynamodb")
+    return get_registry().resource("dynamodb")
 
 
 @lru_cache
 def boto3_sqs_resource() -> ServiceResource:
-    return boto3.resource("sqs")
+    return get_registry().resource("sqs")
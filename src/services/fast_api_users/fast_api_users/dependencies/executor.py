@@ -0,0 +1,72 @@
+import os
+import asyncio
+import contextvars
+from typing import Any, TypeVar, Callable, Optional
+from functools import partial, lru_cache
+from concurrent.futures import ThreadPoolExecutor
+
+from micro_aws.clients import get_registry
+
+T = TypeVar("T")
+
+
+class BlockingExecutor:
+    """
+    Runs the blocking calls (e.g. boto3) of the async routes on a dedicated thread pool,
+    so that a slow AWS response does not freeze the event loop and every other request in flight
+
+    Remarks:
+        The pool is sized on the connection pool of the boto3 clients (see ClientProfile.max_pool_connections):
+        more threads would wait for a connection, less threads would leave connections unused.
+        It is not shared with the default thread pool of the event loop (used by starlette for the sync
+        routes and dependencies), so that the AWS calls do not starve them.
+        The DynamoDBTable and SqsQueue load their resource once at creation, then their actions only use
+        the boto3 client of the resource, which is thread safe.
+
+    Example:
+    >>> item = await executor.run(users_table.get_item, hash_key_value=user_id)
+    """
+
+    def __init__(self, max_workers: int, thread_name_prefix: str = "aws"):
+        """
+        Args:
+            max_workers (int): the max number of blocking calls run in parallel
+            thread_name_prefix (str): the prefix of the name of the threads. Optional, defaulted to aws.
+
+        Raises:
+            ValueError: max_workers is lower than 1
+        """
+        if max_workers < 1:
+            raise ValueError(f"Invalid max_workers={max_workers}, expected at least 1")
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+
+    async def run(self, function: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Args:
+            function (Callable[..., T]): the blocking function
+            *args (Any): the positional arguments of the function
+            **kwargs (Any): the keyword arguments of the function
+
+        Returns:
+            (T): the value returned by the function, its exceptions are raised as is
+        """
+        loop = asyncio.get_running_loop()
+        # the context variables of the request (e.g. the logging context) are visible to the function
+        context = contextvars.copy_context()
+        call: Callable[[], T] = partial(function, *args, **kwargs)
+        return await loop.run_in_executor(self._executor, context.run, call)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+@lru_cache
+def aws_executor_max_workers() -> Optional[int]:
+    max_workers = os.getenv("AWS_EXECUTOR_MAX_WORKERS")
+    return int(max_workers) if max_workers else None
+
+
+@lru_cache
+def aws_executor() -> BlockingExecutor:
+    return BlockingExecutor(max_workers=aws_executor_max_workers() or get_registry().profile.max_pool_connections)
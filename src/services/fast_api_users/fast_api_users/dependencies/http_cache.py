@@ -0,0 +1,123 @@
+import os
+import json
+import hashlib
+from typing import Any, Dict, Optional
+from functools import lru_cache
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from micro_core.cache import LRUCache
+from micro_core.utils import AwsEncoder
+
+# the clients can keep the representation but have to revalidate it (If-None-Match) before every use
+DEFAULT_CACHE_CONTROL = "private, no-cache"
+
+
+@dataclass(frozen=True)
+class VersionedItem:
+    """
+    The body of a response with its strong ETag (quoted, e.g. "3f2a...")
+    """
+
+    body: Dict[str, Any]
+    etag: str
+
+
+def compute_etag(body: Dict[str, Any], version: Optional[Any] = None) -> str:
+    """
+    Args:
+        body (Dict[str, Any]): the representation sent to the client
+        version (Optional[Any]): the version attribute of the item, None to hash the content of the body
+
+    Returns:
+        (str): the strong ETag of the representation, quoted
+    """
+    if version is not None:
+        return f'"v{version}"'
+    content = json.dumps(body, cls=AwsEncoder, sort_keys=True, separators=(",", ":"))
+    return f'"{hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Args:
+        if_none_match (Optional[str]): the value of the If-None-Match header of the request
+        etag (str): the current ETag of the representation
+
+    Returns:
+        (bool): True if the client holds the current representation (304 Not Modified)
+
+    Reference:
+        https://www.rfc-editor.org/rfc/rfc9110#name-if-none-match (weak comparison)
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(","))
+
+
+class CacheGenerations:
+    """
+    The generation of the keys of an item cache, bumped when an item is deleted: a read that started before
+    the delete must not put the item it read back in the cache, after the delete evicted it
+
+    Remarks:
+        The generations of the max_entries keys bumped last are kept, the generation of the keys forgotten is
+        the highest one forgotten: a read of a key forgotten while it was in flight is not cached either.
+        Not thread safe: used from the event loop.
+
+    Example:
+    >>> generation = generations.get(user_id)
+    >>> item = await read(user_id)
+    >>> if generations.get(user_id) == generation:
+    >>>     item_cache.put(user_id, item)
+    """
+
+    def __init__(self, max_entries: int = 10_000):
+        self._generations: OrderedDict[str, int] = OrderedDict()
+        self._max_entries = max_entries
+        self._last = 0
+        self._forgotten = 0
+
+    def get(self, key: str) -> int:
+        return self._generations.get(key, self._forgotten)
+
+    def bump(self, key: str):
+        self._last += 1
+        self._generations[key] = self._last
+        self._generations.move_to_end(key)
+        if len(self._generations) > self._max_entries:
+            _, generation = self._generations.popitem(last=False)
+            self._forgotten = max(self._forgotten, generation)
+
+
+@lru_cache
+def users_cache_control() -> str:
+    # e.g. "private, max-age=30" to let the clients skip the revalidation for 30 seconds
+    return os.getenv("USERS_CACHE_CONTROL") or DEFAULT_CACHE_CONTROL
+
+
+@lru_cache
+def users_version_attribute() -> str:
+    return os.getenv("USERS_VERSION_ATTRIBUTE") or "version"
+
+
+@lru_cache
+def users_item_cache() -> Optional[LRUCache[str, VersionedItem]]:
+    """
+    Returns:
+        (Optional[LRUCache[str, VersionedItem]]): the in-process cache of the users, None if USERS_ITEM_CACHE_TTL
+            is not set. A cached user is served without reading DynamoDB until its ttl expires, so it can be
+            stale for up to the ttl when it is updated or deleted by another container.
+    """
+    ttl = os.getenv("USERS_ITEM_CACHE_TTL")
+    if not ttl:
+        return None
+    return LRUCache(max_entries=int(os.getenv("USERS_ITEM_CACHE_MAX_ENTRIES") or 10_000), ttl=float(ttl))
+
+
+@lru_cache
+def users_cache_generations() -> CacheGenerations:
+    # bumped by the deletes, see CacheGenerations
+    return CacheGenerations()
@@ -1,12 +1,15 @@
 import os
+from typing import Optional
 from functools import lru_cache
 
 from fastapi import Depends
 from boto3.resources.base import ServiceResource
+from fast_api_users.metrics import METRICS
 from fast_api_users.dependencies.aws_services import boto3_sqs_resource, boto3_dynamodb_resource
 
 from micro_aws.sqs_queue import SqsQueue
 from micro_aws.dynamodb_table import DynamoDBTable
+from micro_core.single_flight import AsyncSingleFlight
 
 
 @lru_cache
@@ -19,6 +22,12 @@ def micro_sqs_queue_url() -> str:
     return os.getenv("QUEUE_URL", "invalid")
 
 
+@lru_cache
+def micro_sqs_queue_codec() -> Optional[str]:
+    # e.g. gzip, see micro_core.compression
+    return os.getenv("QUEUE_CODEC") or None
+
+
 @lru_cache
 def users_table(
     boto3_dynamodb_resource: ServiceResource = Depends(boto3_dynamodb_resource),
@@ -34,8 +43,16 @@ def users_table(
 def micro_sqs_queue(
     boto3_sqs_resource: ServiceResource = Depends(boto3_sqs_resource),
     micro_sqs_queue_url: str = Depends(micro_sqs_queue_url),
+    micro_sqs_queue_codec: Optional[str] = Depends(micro_sqs_queue_codec),
 ) -> SqsQueue:
     return SqsQueue.from_boto3_sqs_resource(
         boto3_sqs_resource=boto3_sqs_resource,
         queue_url=micro_sqs_queue_url,
+        codec=micro_sqs_queue_codec,
     )
+
+
+@lru_cache
+def users_single_flight() -> AsyncSingleFlight:
+    # the concurrent reads of the same user or page share a single DynamoDB call, counted in the metrics
+    return AsyncSingleFlight(observer=METRICS.observe_single_flight)
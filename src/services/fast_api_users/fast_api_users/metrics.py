@@ -0,0 +1,99 @@
+import os
+import asyncio
+import logging
+from typing import Hashable, Optional
+
+from micro_core.prometheus import Gauge, Counter, Histogram, MetricsRegistry
+
+LOGGER = logging.getLogger()
+
+# buckets of the event loop lag, in seconds: a healthy loop stays below a few milliseconds
+EVENT_LOOP_LAG_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class ServiceMetrics:
+    """
+    The metrics of the service, exposed at /users/metrics in the Prometheus text format
+
+    Remarks:
+        Every update is an addition under the lock of the metric, cheap enough for the hot path.
+        With several uvicorn workers, set METRICS_MULTIPROC_DIR to a directory shared by the workers:
+        every worker writes its snapshot there and the endpoint merges them (see MetricsRegistry).
+    """
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+        self.requests = registry.register(
+            Histogram(
+                "http_request_duration_seconds",
+                "Duration of the HTTP requests by method, route template and status",
+                ["method", "route", "status"],
+            )
+        )
+        self.in_flight = registry.register(Gauge("http_requests_in_flight", "HTTP requests being served"))
+        self.aws_calls = registry.register(
+            Histogram(
+                "aws_call_duration_seconds", "Duration of the AWS API calls, retries included", ["service", "operation"]
+            )
+        )
+        self.aws_errors = registry.register(
+            Counter("aws_call_errors_total", "AWS API calls failed", ["service", "operation", "error"])
+        )
+        self.single_flight_calls = registry.register(
+            Counter("single_flight_calls_total", "Reads of the users through the single flight", ["operation"])
+        )
+        self.single_flight_executions = registry.register(
+            Counter("single_flight_executions_total", "Reads of the users sent to DynamoDB", ["operation"])
+        )
+        self.single_flight_coalesced = registry.register(
+            Counter("single_flight_coalesced_total", "Reads of the users that joined a read in flight", ["operation"])
+        )
+        self.admission_limit = registry.register(
+            Gauge("admission_concurrency_limit", "Adaptive concurrency limit of the admission control")
+        )
+        self.requests_shed = registry.register(
+            Counter("admission_requests_shed_total", "Requests rejected by the admission control", ["priority"])
+        )
+        self.event_loop_lag = registry.register(
+            Histogram(
+                "event_loop_lag_seconds",
+                "Delay of the event loop in running a ready callback",
+                buckets=EVENT_LOOP_LAG_BUCKETS,
+            )
+        )
+
+    def observe_aws_call(self, service: str, operation: str, seconds: float, error: Optional[str]):
+        """Observer of the micro_aws clients, see micro_aws.clients.observe_calls"""
+        self.aws_calls.observe(seconds, (service, operation))
+        if error:
+            self.aws_errors.inc((service, operation, error))
+
+    def observe_single_flight(self, key: Hashable, coalesced: bool):
+        """Observer of the single flight of the users, see micro_core.single_flight.FlightObserver"""
+        # the keys are (operation, argument), e.g. ("get_item", user_id): labelled by operation only
+        labels = (str(key[0] if isinstance(key, tuple) else key),)
+        self.single_flight_calls.inc(labels)
+        if coalesced:
+            self.single_flight_coalesced.inc(labels)
+        else:
+            self.single_flight_executions.inc(labels)
+
+    async def monitor_event_loop(self, interval: float = 0.5):
+        """
+        Measure the lag of the event loop every interval seconds: how late the loop wakes up the sleeping task,
+        e.g. because a blocking call or a CPU bound task holds it. The snapshot of the worker is written at the
+        same pace when the metrics are shared between workers.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(interval)
+            self.event_loop_lag.observe(max(0.0, loop.time() - start - interval))
+            if self.registry.directory:
+                try:
+                    await loop.run_in_executor(None, self.registry.write_snapshot)
+                except OSError as exc:
+                    LOGGER.warning("Metrics snapshot not written: %s", exc)
+
+
+METRICS = ServiceMetrics(MetricsRegistry(directory=os.getenv("METRICS_MULTIPROC_DIR") or None))
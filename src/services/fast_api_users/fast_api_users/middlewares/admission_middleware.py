@@ -0,0 +1,116 @@
+import time
+from typing import Dict, Tuple
+
+from starlette.types import Send, Scope, ASGIApp, Message, Receive
+from fastapi.responses import JSONResponse
+from fast_api_users.metrics import ServiceMetrics
+
+from micro_core.concurrency_limit import GradientLimit
+
+CRITICAL = "critical"
+READ = "read"
+WRITE = "write"
+
+# always admitted: cheap, and needed to tell an overloaded worker from a dead one
+CRITICAL_PATHS = ("/users/health", "/users/metrics")
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# share of the concurrency limit open to every priority: the writes are shed first
+DEFAULT_SHARES: Dict[str, float] = {READ: 1.0, WRITE: 0.8}
+
+
+class AdmissionControlMiddleware:
+    """
+    Pure ASGI middleware that bounds the requests in flight by an adaptive concurrency limit (see
+    micro_core.concurrency_limit.GradientLimit) and rejects the excess requests right away with a 503 and
+    a Retry-After header, instead of queueing them until every request times out
+
+    Remarks:
+        The priority of a request is critical (CRITICAL_PATHS, never rejected nor counted), read (GET, HEAD,
+        OPTIONS) or write. A priority is admitted while the requests in flight are below its share of the
+        limit (see DEFAULT_SHARES), so the writes are rejected before the reads.
+        The latency sample of a request is its time to the start of the response: the streaming responses
+        (e.g. the NDJSON export) are sampled when they start streaming, the 5xx responses and the errors
+        shrink the limit.
+        The limit and the rejections by priority are exported in the metrics of the service.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limit: GradientLimit,
+        metrics: ServiceMetrics,
+        shares: Dict[str, float] = DEFAULT_SHARES,
+        retry_after: int = 1,
+        critical_paths: Tuple[str, ...] = CRITICAL_PATHS,
+    ):
+        """
+        Args:
+            app (ASGIApp): the application
+            limit (GradientLimit): the concurrency limit of the worker
+            metrics (ServiceMetrics): the metrics of the service
+            shares (Dict[str, float]): the share of the limit of the read and write priorities. Optional,
+                defaulted to DEFAULT_SHARES.
+            retry_after (int): the seconds of the Retry-After header of the rejections. Optional, defaulted to 1.
+            critical_paths (Tuple[str, ...]): the paths always admitted. Optional, defaulted to CRITICAL_PATHS.
+        """
+        self.app = app
+        self.limit = limit
+        self.metrics = metrics
+        self.shares = shares
+        self.retry_after = retry_after
+        self.critical_paths = critical_paths
+        self.in_flight = 0
+        self.metrics.admission_limit.set(limit.limit)
+
+    def priority(self, scope: Scope) -> str:
+        if scope["path"].rstrip("/") in self.critical_paths:
+            return CRITICAL
+        return READ if str(scope["method"]).upper() in READ_METHODS else WRITE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        priority = self.priority(scope)
+        if priority == CRITICAL:
+            await self.app(scope, receive, send)
+            return
+        if self.in_flight >= self.limit.limit * self.shares[priority]:
+            self.metrics.requests_shed.inc((priority,))
+            await self._reject(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        sampled = False
+
+        def sample(dropped: bool):
+            nonlocal sampled
+            if not sampled:
+                sampled = True
+                limit = self.limit.update(time.perf_counter() - start, self.in_flight, dropped)
+                self.metrics.admission_limit.set(limit)
+
+        async def send_with_sample(message: Message):
+            if message["type"] == "http.response.start":
+                sample(dropped=message["status"] >= 500)
+            await send(message)
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send_with_sample)
+        except Exception:
+            sample(dropped=True)
+            raise
+        finally:
+            self.in_flight -= 1
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send):
+        # the correlation id is set by the RequestContextMiddleware, outermost
+        correlation_id = scope.get("state", {}).get("correlation_id", "")
+        response = JSONResponse(
+            status_code=503,
+            content={"uuid": correlation_id, "message": "Service overloaded, retry later"},
+            headers={"Retry-After": str(self.retry_after)},
+        )
+        await response(scope, receive, send)
@@ -0,0 +1,206 @@
+import zlib
+from typing import Dict, List, Optional
+
+from starlette.types import Send, Scope, ASGIApp, Message, Receive
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional codec
+    brotli = None  # type: ignore[assignment]
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional codec
+    zstandard = None  # type: ignore[assignment]
+
+GZIP = "gzip"
+BROTLI = "br"
+ZSTD = "zstd"
+
+# below this size the compression saves less bytes than the headers and the CPU it costs
+DEFAULT_MINIMUM_SIZE = 1024
+# the levels with the best bytes saved per CPU time on the JSON pages, see benchmarks/fast_api_compression.py
+# (gzip 1 costs ~30% less CPU than 6 on a 100 users page for a ~8% larger output)
+DEFAULT_LEVELS: Dict[str, int] = {GZIP: 1, BROTLI: 4, ZSTD: 3}
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "application/problem+json",
+)
+
+
+class _Compressor:
+    """Streaming compressor of a response body: every chunk is flushed so that it can be sent right away"""
+
+    def __init__(self, codec: str, level: int):
+        self._codec = codec
+        if codec == BROTLI:
+            self._brotli = brotli.Compressor(quality=level)
+        elif codec == ZSTD:
+            self._zstd = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            self._zlib = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, last: bool) -> bytes:
+        if self._codec == BROTLI:
+            return self._brotli.process(data) + (self._brotli.finish() if last else self._brotli.flush())
+        if self._codec == ZSTD:
+            flush_mode = zstandard.COMPRESSOBJ_FLUSH_FINISH if last else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+            return self._zstd.compress(data) + self._zstd.flush(flush_mode)
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+def available_codecs() -> List[str]:
+    """
+    Returns:
+        (List[str]): the codecs installed, by order of preference (smallest output first)
+    """
+    return [codec for codec, module in [(ZSTD, zstandard), (BROTLI, brotli), (GZIP, zlib)] if module is not None]
+
+
+def negotiate(accept_encoding: Optional[str], codecs: List[str]) -> Optional[str]:
+    """
+    Args:
+        accept_encoding (Optional[str]): the Accept-Encoding header of the request
+        codecs (List[str]): the codecs of the server, by order of preference
+
+    Returns:
+        (Optional[str]): the codec with the highest quality value for the client, the preference of the server
+            breaks the ties, None if the client accepts none of them
+
+    Reference:
+        https://www.rfc-editor.org/rfc/rfc9110#name-accept-encoding
+    """
+    if not accept_encoding:
+        return None
+    qualities: Dict[str, float] = {}
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+    wildcard = qualities.get("*", 0.0)
+    candidates = [(qualities.get(codec, wildcard), -rank, codec) for rank, codec in enumerate(codecs)]
+    quality, _, codec = max(candidates, default=(0.0, 0, ""))
+    return codec if quality > 0 else None
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware that compresses the responses with the best codec accepted by the client
+    (zstd and br when their package is installed, gzip otherwise)
+
+    Remarks:
+        A complete body is compressed only if it is larger than minimum_size. A streaming body
+        (e.g. the NDJSON export) is compressed chunk by chunk, every chunk is flushed and sent as soon as
+        it is produced: the body is never buffered.
+        The responses already encoded, the non compressible content types and the responses without body
+        (e.g. 304) are sent as they are. A strong ETag becomes weak, as the bytes of the representation change.
+        Under Lambda, Mangum sends the compressed bodies base64 encoded, still smaller than the original ones.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = DEFAULT_MINIMUM_SIZE,
+        levels: Optional[Dict[str, int]] = None,
+        codecs: Optional[List[str]] = None,
+    ):
+        """
+        Args:
+            app (ASGIApp): the application
+            minimum_size (int): the min size in bytes of a complete body to compress. Optional, defaulted to 1024.
+            levels (Optional[Dict[str, int]]): the compression level of every codec. Optional, defaulted to
+                DEFAULT_LEVELS.
+            codecs (Optional[List[str]]): the codecs enabled, by order of preference. Optional, defaulted to
+                the available ones.
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {**DEFAULT_LEVELS, **(levels or {})}
+        self.codecs = [codec for codec in codecs or available_codecs() if codec in available_codecs()]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codec = negotiate(Headers(scope=scope).get("accept-encoding"), self.codecs)
+        if codec is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressedSend(send, codec, self.levels[codec], self.minimum_size))
+
+
+class _CompressedSend:
+    """The send callable of a single response, it holds the start message until the first body chunk"""
+
+    def __init__(self, send: Send, codec: str, level: int, minimum_size: int):
+        self._send = send
+        self._codec = codec
+        self._level = level
+        self._minimum_size = minimum_size
+        self._start: Optional[Message] = None
+        self._compressor: Optional[_Compressor] = None
+        self._passthrough = False
+
+    @staticmethod
+    def _compressible(start: Message) -> bool:
+        headers = Headers(raw=start.get("headers", []))
+        if start["status"] < 200 or start["status"] in (204, 304) or "content-encoding" in headers:
+            return False
+        return headers.get("content-type", "").lower().startswith(COMPRESSIBLE_TYPES)
+
+    def _encoded_headers(self, start: Message, content_length: Optional[int]) -> Message:
+        start.setdefault("headers", [])
+        headers = MutableHeaders(scope=start)
+        headers["Content-Encoding"] = self._codec
+        headers.add_vary_header("Accept-Encoding")
+        if content_length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(content_length)
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        return start
+
+    async def __call__(self, message: Message):
+        if message["type"] == "http.response.start":
+            self._start = message
+            self._passthrough = not self._compressible(message)
+            if self._passthrough:
+                await self._send(message)
+            return
+        if message["type"] != "http.response.body" or self._passthrough:
+            await self._send(message)
+            return
+        await self._send_body(message)
+
+    async def _send_body(self, message: Message):
+        body: bytes = message.get("body", b"")
+        more_body: bool = message.get("more_body", False)
+        if self._start is not None:
+            start, self._start = self._start, None
+            if not more_body and len(body) < self._minimum_size:
+                self._passthrough = True
+                await self._send(start)
+                await self._send(message)
+                return
+            self._compressor = _Compressor(self._codec, self._level)
+            compressed = self._compressor.compress(body, last=not more_body)
+            await self._send(self._encoded_headers(start, None if more_body else len(compressed)))
+            await self._send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+            return
+        if self._compressor is not None:
+            compressed = self._compressor.compress(body, last=not more_body)
+            await self._send({"type": "http.response.body", "body": compressed, "more_body": more_body})
@@ -0,0 +1,46 @@
+import time
+
+from starlette.types import Send, Scope, ASGIApp, Message, Receive
+from fast_api_users.metrics import ServiceMetrics
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware that observes the duration of every request (up to the end of the body)
+    by method, route template and status, and the requests in flight
+
+    Remarks:
+        The route template (e.g. /users/{user_id}) is set in the scope by the router, so the cardinality of
+        the labels is bounded by the routes of the app; the requests matching none of them are labelled
+        as unmatched.
+    """
+
+    def __init__(self, app: ASGIApp, metrics: ServiceMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        self.metrics.in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.metrics.in_flight.dec()
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            self.metrics.requests.observe(
+                time.perf_counter() - start, (str(scope["method"]).upper(), route, str(status_code))
+            )
@@ -0,0 +1,76 @@
+import time
+import uuid
+import logging
+
+from starlette.types import Send, Scope, ASGIApp, Message, Receive
+from starlette.datastructures import URL, Headers, MutableHeaders
+
+CORRELATION_ID_HEADER = "x-correlation-id"
+
+
+class RequestContextMiddleware:
+    """
+    Pure ASGI middleware that sets the correlation id of the request (request.state.correlation_id),
+    logs the request and the response, and adds the correlation id header to the response
+
+    Remarks:
+        It replaces the CorrelationIdMiddleware and LoggingMiddleware (BaseHTTPMiddleware): it only wraps
+        the send callable, so the body of the responses is neither buffered nor copied to a memory stream
+        and the streaming responses are sent as they are produced.
+        The response log has the duration of the request in milliseconds, up to the end of the body.
+
+    Reference:
+        https://www.starlette.io/middleware/#pure-asgi-middleware
+    """
+
+    def __init__(self, app: ASGIApp, header_name: str = CORRELATION_ID_HEADER):
+        self.app = app
+        self.header_name = header_name
+        self.logger = logging.getLogger()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        # Add or reuse correlation id
+        correlation_id = Headers(scope=scope).get(self.header_name) or str(uuid.uuid4())
+        scope.setdefault("state", {})["correlation_id"] = correlation_id
+
+        # Log the request
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(
+                "Request",
+                extra={
+                    "uuid": correlation_id,
+                    "type": "api-request",
+                    "method": str(scope["method"]).upper(),
+                    "url": str(URL(scope=scope)),
+                },
+            )
+
+        status_code = 500
+
+        async def send_with_correlation_id(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Add correlation id header to response
+                message.setdefault("headers", [])
+                MutableHeaders(scope=message)[self.header_name] = correlation_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_correlation_id)
+        finally:
+            # Log the response, a 500 if the app raised before sending it
+            self.logger.info(
+                "Response sent",
+                extra={
+                    "uuid": correlation_id,
+                    "type": "api-response",
+                    "code": status_code,
+                    "duration": round((time.perf_counter() - start) * 1000, 3),
+                },
+            )
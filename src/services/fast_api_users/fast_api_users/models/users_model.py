@@ -1,6 +1,9 @@
 from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import Field, BaseModel
+
+# max number of users created by a single POST /users/batch
+MAX_BATCH_USERS = 1000
 
 
 class BaseIterator(BaseModel):
@@ -28,3 +31,18 @@ class UserIterator(BaseIterator):
 class CreateUser(BaseModel):
     name: str
     surname: str
+
+
+class CreateUsersBatch(BaseModel):
+    users: List[CreateUser] = Field(min_items=1, max_items=MAX_BATCH_USERS)
+
+
+class CreateUserResult(BaseModel):
+    index: int
+    created: bool
+    user: Optional[User] = None
+    error: Optional[str] = None
+
+
+class CreateUsersBatchResult(BaseModel):
+    results: List[CreateUserResult]
@@ -1,57 +1,175 @@
+import json
 import uuid
+import asyncio
 import logging
 from http import HTTPStatus
-from typing import Union, Optional
+from typing import Any, Dict, List, Union, Iterator, Optional, AsyncIterator
+from functools import partial
 
-from fastapi import Query, Depends, APIRouter, status
-from fastapi.responses import JSONResponse
-from fast_api_users.dependencies.users import users_table, micro_sqs_queue
-from fast_api_users.models.users_model import User, CreateUser, UserIterator, UserIDsIterator
+from fastapi import Query, Header, Depends, Response, APIRouter, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from fast_api_users.dependencies.users import users_table, micro_sqs_queue, users_single_flight
+from fast_api_users.models.users_model import (
+    User,
+    CreateUser,
+    UserIterator,
+    UserIDsIterator,
+    CreateUserResult,
+    CreateUsersBatch,
+    CreateUsersBatchResult,
+)
 from fast_api_users.models.message_model import Message
+from fast_api_users.models.serialization import ModelProjection, FastJSONResponse
+from fast_api_users.dependencies.executor import BlockingExecutor, aws_executor
+from fast_api_users.dependencies.http_cache import (
+    VersionedItem,
+    CacheGenerations,
+    compute_etag,
+    etag_matches,
+    users_item_cache,
+    users_cache_control,
+    users_cache_generations,
+    users_version_attribute,
+)
 
-from micro_core.utils import pick_keys
+from micro_core.cache import LRUCache
+from micro_core.utils import AwsEncoder, chunked, pick_keys
 from micro_aws.sqs_queue import SqsQueue
-from micro_aws.dynamodb_table import DynamoDBTable
+from micro_aws.dynamodb_table import MAX_BATCH_WRITE_ITEMS, DynamoDBTable
+from micro_core.single_flight import AsyncSingleFlight
 
 LOGGER = logging.getLogger()
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+USER_PROJECTION = ModelProjection(User)
+
+# bodies sent by every send_messages call of a batch, the calls run in parallel on the executor
+BATCH_EVENTS_PER_CALL = 100
+# users rendered in a single chunk of the export stream
+EXPORT_CHUNK_USERS = 500
+MAX_EXPORT_SEGMENTS = 16
+
 
 @router.get("/", response_model=Union[UserIterator, UserIDsIterator])
 async def get_users(
     next_token: Optional[str] = Query(default=None),
     only_ids: Optional[bool] = Query(default=None),
     users_table: DynamoDBTable = Depends(users_table),
+    executor: BlockingExecutor = Depends(aws_executor),
+    single_flight: AsyncSingleFlight = Depends(users_single_flight),
 ):
-    iterator = users_table.get_items(next_token=next_token)
+    iterator = await single_flight.do(
+        ("get_items", next_token),
+        partial(executor.run, users_table.get_items, next_token=next_token),
+    )
+    # the items are rendered as they are, without building and validating the models of the response_model
     if only_ids:
-        return UserIDsIterator(user_ids=[item["user_id"] for item in iterator.items], next_token=iterator.next_token)
+        return FastJSONResponse(
+            {"user_ids": [item["user_id"] for item in iterator.items], "next_token": iterator.next_token}
+        )
     # workaround to do not use the projection expression in dynamodb
-    return UserIterator(
-        users=pick_keys(
-            dicts=iterator.items,
-            keys=User.__fields__.keys(),
-        ),
-        next_token=iterator.next_token,
-    )
+    return FastJSONResponse({"users": USER_PROJECTION.project_all(iterator.items), "next_token": iterator.next_token})
+
+
+def _render_ndjson(chunks: Iterator[List[Dict[str, Any]]]) -> Optional[bytes]:
+    """
+    Returns:
+        (Optional[bytes]): the next users as JSON lines, None at the end of the scan
+    """
+    chunk = next(chunks, None)
+    if chunk is None:
+        return None
+    return "".join(json.dumps(item, cls=AwsEncoder, separators=(",", ":")) + "\n" for item in chunk).encode("utf-8")
 
 
-@router.get("/{user_id}", response_model=User)
+async def _export_stream(items: Iterator[Dict[str, Any]], executor: BlockingExecutor) -> AsyncIterator[bytes]:
+    """
+    The next chunk is scanned and rendered on the executor only when the previous one has been sent
+    (backpressure of the client), so the memory used does not depend on the size of the table
+    """
+    chunks = chunked(items, EXPORT_CHUNK_USERS)
+    try:
+        while (data := await executor.run(_render_ndjson, chunks)) is not None:
+            yield data
+    finally:
+        # stops the scan of the segments when the client disconnects
+        close = getattr(items, "close", None)
+        if close:
+            await executor.run(close)
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={HTTPStatus.OK.value: {"content": {"application/x-ndjson": {}}, "description": "One user per line"}},
+)
+async def export_users(
+    fields: Optional[List[str]] = Query(default=None),
+    segments: int = Query(default=1, ge=1, le=MAX_EXPORT_SEGMENTS),
+    users_table: DynamoDBTable = Depends(users_table),
+    executor: BlockingExecutor = Depends(aws_executor),
+):
+    """
+    Stream all the users as newline delimited JSON, read with a (parallel) scan of the table
+
+    - fields: the fields of the users to export, all the User fields by default
+    - segments: the number of segments of the table scanned in parallel, the users are not sorted
+    - the stream is compressed chunk by chunk if the client accepts it (see CompressionMiddleware)
+    """
+    attributes = list(dict.fromkeys(fields)) if fields else list(User.__fields__)
+    unknown = [attribute for attribute in attributes if attribute not in User.__fields__]
+    if unknown:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"message": f"unknown fields: {unknown}, expected some of {list(User.__fields__)}"},
+        )
+    items = users_table.iter_items(attributes=attributes, segments=segments)
+    return StreamingResponse(_export_stream(items, executor), media_type="application/x-ndjson")
+
+
+@router.get(
+    "/{user_id}", response_model=User, responses={status.HTTP_304_NOT_MODIFIED: {"description": "Not Modified"}}
+)
 async def get_user(
     user_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(default=None),
     users_table: DynamoDBTable = Depends(users_table),
+    executor: BlockingExecutor = Depends(aws_executor),
+    cache_control: str = Depends(users_cache_control),
+    version_attribute: str = Depends(users_version_attribute),
+    item_cache: Optional[LRUCache[str, VersionedItem]] = Depends(users_item_cache),
+    single_flight: AsyncSingleFlight = Depends(users_single_flight),
+    generations: CacheGenerations = Depends(users_cache_generations),
 ):
-    user_item = users_table.get_item(hash_key_value=user_id)
-    if user_item:
-        return pick_keys(
+    user = item_cache.get(user_id) if item_cache is not None else None
+    if user is None:
+
+        async def read_user():
+            # the generation is taken by the read itself: a request joining the flight after a delete
+            # gets the generation from before the delete
+            return generations.get(user_id), await executor.run(users_table.get_item, hash_key_value=user_id)
+
+        generation, user_item = await single_flight.do(("get_item", user_id), read_user)
+        if not user_item:
+            return JSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"message": f"user with user_id: {user_id} not found"},
+            )
+        body = pick_keys(
             dicts=user_item,
             keys=User.__fields__.keys(),
         )
-    return JSONResponse(
-        status_code=status.HTTP_404_NOT_FOUND,
-        content={"message": f"user with user_id: {user_id} not found"},
-    )
+        user = VersionedItem(body=body, etag=compute_etag(body, version=user_item.get(version_attribute)))
+        # a delete during the read evicted the user: the item read may be gone, it is not cached
+        if item_cache is not None and generations.get(user_id) == generation:
+            item_cache.put(user_id, user)
+    headers = {"ETag": user.etag, "Cache-Control": cache_control}
+    if etag_matches(if_none_match, user.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return user.body
 
 
 @router.post(
@@ -63,13 +181,14 @@ async def create_user(
     user: CreateUser,
     users_table: DynamoDBTable = Depends(users_table),
     micro_sqs_queue: SqsQueue = Depends(micro_sqs_queue),
+    executor: BlockingExecutor = Depends(aws_executor),
 ):
     user_id = str(uuid.uuid4())
     item = dict(user)
     item.update({"user_id": user_id})
-    response = users_table.add_item(item=item)
+    response = await executor.run(users_table.add_item, item=item)
     LOGGER.info("users_table.add_item(item=%s) -> response:%s", item, response)
-    response = micro_sqs_queue.send_message(body={"action": "create-user", "user_id": user_id})
+    response = await executor.run(micro_sqs_queue.send_message, body={"action": "create-user", "user_id": user_id})
     LOGGER.info(
         'micro_sqs_queue.send_message(body={"action": "create-user", "user_id": %s}) -> response:%s',
         user_id,
@@ -78,12 +197,115 @@ async def create_user(
     return User(**item)
 
 
+async def _put_users(
+    items: List[Dict[str, Any]], users_table: DynamoDBTable, executor: BlockingExecutor
+) -> Dict[int, str]:
+    """
+    Returns:
+        (Dict[int, str]): the error of the items not written, by index
+    """
+    chunks = list(chunked(range(len(items)), MAX_BATCH_WRITE_ITEMS))
+    outcomes = await asyncio.gather(
+        *(executor.run(users_table.batch_put_items, [items[index] for index in chunk]) for chunk in chunks),
+        return_exceptions=True,
+    )
+    errors: Dict[int, str] = {}
+    for chunk, outcome in zip(chunks, outcomes):
+        if isinstance(outcome, BaseException):
+            LOGGER.error("users_table.batch_put_items of %s users failed: %s", len(chunk), outcome)
+            errors.update((index, f"user not created: {outcome}") for index in chunk)
+            continue
+        # still unprocessed after the retries of batch_put_items (e.g. throttling)
+        unprocessed = {item["user_id"] for item in outcome}
+        errors.update(
+            (index, "user not created: unprocessed by DynamoDB")
+            for index in chunk
+            if items[index]["user_id"] in unprocessed
+        )
+    return errors
+
+
+async def _send_create_events(
+    user_ids: Dict[int, str], micro_sqs_queue: SqsQueue, executor: BlockingExecutor
+) -> Dict[int, str]:
+    """
+    Returns:
+        (Dict[int, str]): the error of the users whose create-user event was not sent, by index
+    """
+    chunks = list(chunked(user_ids, BATCH_EVENTS_PER_CALL))
+    outcomes = await asyncio.gather(
+        *(
+            executor.run(
+                micro_sqs_queue.send_messages,
+                [{"action": "create-user", "user_id": user_ids[index]} for index in chunk],
+            )
+            for chunk in chunks
+        ),
+        return_exceptions=True,
+    )
+    errors: Dict[int, str] = {}
+    for chunk, outcome in zip(chunks, outcomes):
+        if isinstance(outcome, BaseException):
+            LOGGER.error("micro_sqs_queue.send_messages of %s events failed: %s", len(chunk), outcome)
+            errors.update((index, f"create-user event not sent: {outcome}") for index in chunk)
+            continue
+        for failed in outcome["Failed"]:
+            errors[chunk[int(failed["Id"])]] = f"create-user event not sent: {failed.get('Message')}"
+    return errors
+
+
+@router.post(
+    "/batch",
+    status_code=HTTPStatus.CREATED,
+    response_model=CreateUsersBatchResult,
+    responses={HTTPStatus.MULTI_STATUS.value: {"description": "Some users failed", "model": CreateUsersBatchResult}},
+)
+async def create_users(
+    batch: CreateUsersBatch,
+    response: Response,
+    users_table: DynamoDBTable = Depends(users_table),
+    micro_sqs_queue: SqsQueue = Depends(micro_sqs_queue),
+    executor: BlockingExecutor = Depends(aws_executor),
+):
+    """
+    Create up to MAX_BATCH_USERS users with BatchWriteItem requests and send their create-user events with
+    SendMessageBatch requests, the result of every user is returned in the order of the payload:
+    - created False: the user was not written, it can be sent again
+    - created True with an error: the user was written but its create-user event was not sent
+    The status is 207 Multi-Status if any user has an error.
+    """
+    items = [{**dict(user), "user_id": str(uuid.uuid4())} for user in batch.users]
+    put_errors = await _put_users(items, users_table, executor)
+    user_ids = {index: item["user_id"] for index, item in enumerate(items) if index not in put_errors}
+    event_errors = await _send_create_events(user_ids, micro_sqs_queue, executor)
+    LOGGER.info("Created %s/%s users, %s create-user events not sent", len(user_ids), len(items), len(event_errors))
+    if put_errors or event_errors:
+        response.status_code = HTTPStatus.MULTI_STATUS
+    return CreateUsersBatchResult(
+        results=[
+            CreateUserResult(
+                index=index,
+                created=index in user_ids,
+                user=User(**item) if index in user_ids else None,
+                error=put_errors.get(index) or event_errors.get(index),
+            )
+            for index, item in enumerate(items)
+        ]
+    )
+
+
 @router.delete("/{user_id}", response_model=Message)
 async def delete_user(
     user_id: str,
     users_table: DynamoDBTable = Depends(users_table),
     micro_sqs_queue: SqsQueue = Depends(micro_sqs_queue),
+    executor: BlockingExecutor = Depends(aws_executor),
+    item_cache: Optional[LRUCache[str, VersionedItem]] = Depends(users_item_cache),
+    generations: CacheGenerations = Depends(users_cache_generations),
 ):
-    users_table.delete_item(hash_key_value=user_id)
-    micro_sqs_queue.send_message(body={"action": "delete-user", "user_id": user_id})
+    await executor.run(users_table.delete_item, hash_key_value=user_id)
+    if item_cache is not None:
+        generations.bump(user_id)
+        item_cache.pop(user_id)
+    await executor.run(micro_sqs_queue.send_message, body={"action": "delete-user", "user_id": user_id})
     return Message(message=f"Delete user: {user_id} deleted")
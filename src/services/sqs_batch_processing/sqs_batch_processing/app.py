@@ -1,16 +1,74 @@
+import os
+import json
+from typing import Any, Dict, List, Tuple
+
 from aws_lambda_powertools import Logger, Tracer
 from aws_lambda_powertools.utilities.batch import EventType, BatchProcessor, process_partial_response
 from aws_lambda_powertools.utilities.typing import LambdaContext
 from aws_lambda_powertools.utilities.data_classes.sqs_event import SQSRecord
 
-processor = BatchProcessor(event_type=EventType.SQS)
+from micro_aws.dispatcher import DEFAULT_CONCURRENCY, KeyedDispatcher
+from micro_core.compression import decode_sqs_message_body
+
+
+class _FailedRecordError(Exception):
+    def __init__(self, entry: Tuple):
+        super().__init__(entry[1])
+        self.entry = entry
+
+
+class ConcurrentBatchProcessor(BatchProcessor):
+    """
+    BatchProcessor that processes the records concurrently (see KeyedDispatcher), the records of the
+    same FIFO message group are processed in order and a failure skips the following ones of the group
+    """
+
+    def __init__(self, event_type: EventType, dispatcher: KeyedDispatcher, **kwargs: Any):
+        super().__init__(event_type=event_type, **kwargs)
+        self._dispatcher = dispatcher
+
+    @staticmethod
+    def _ordering_key(record: Dict[str, Any]) -> str:
+        # standard queues have no ordering, every record has its own key
+        return record.get("attributes", {}).get("MessageGroupId") or record["messageId"]
+
+    def _process_ordered_record(self, record: Dict[str, Any]) -> Tuple:
+        entry = self._process_record(record)
+        if entry[0] == "fail":
+            raise _FailedRecordError(entry)
+        return entry
+
+    def _failure_entry(self, record: Dict[str, Any], exc: Exception) -> Tuple:
+        if isinstance(exc, _FailedRecordError):
+            return exc.entry
+        # timed out or skipped by the dispatcher, the record handler did not report it
+        data = self._to_batch_type(record=record, event_type=self.event_type)
+        return self.failure_handler(record=data, exception=(type(exc), exc, exc.__traceback__))
+
+    def process(self) -> List[Tuple]:
+        records = list(self.records)
+        result = self._dispatcher.dispatch(items=records, process=self._process_ordered_record, key=self._ordering_key)
+        return [
+            result.results[index] if index in result.results else self._failure_entry(record, result.failures[index])
+            for index, record in enumerate(records)
+        ]
+
+
+processor = ConcurrentBatchProcessor(
+    event_type=EventType.SQS,
+    dispatcher=KeyedDispatcher(
+        concurrency=int(os.getenv("CONCURRENCY", DEFAULT_CONCURRENCY)),
+        timeout=float(os.environ["RECORD_TIMEOUT"]) if os.getenv("RECORD_TIMEOUT") else None,
+    ),
+)
 tracer = Tracer()
 logger = Logger()
 
 
 @tracer.capture_method
 def record_handler(record: SQSRecord):
-    payload: str = record.json_body  # if json string data, otherwise record.body for str
+    # the body could have been compressed by the producer (see micro_aws.sqs_queue.SqsQueue)
+    payload = json.loads(decode_sqs_message_body(record))
     logger.info(payload)
 
 
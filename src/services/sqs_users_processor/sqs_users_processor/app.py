@@ -1,89 +1,343 @@
 import os
 import json
+import time
+import hashlib
 import logging
 from uuid import uuid4
-from typing import Any, Dict, Callable
-
-import boto3
+from typing import Any, Set, Dict, List, Tuple, Union, Callable, Optional
+from operator import itemgetter
+from functools import partial
+from collections import defaultdict
 
 from micro_core.utils import AwsEncoder
+from micro_aws.clients import get_registry
 from micro_aws.s3_bucket import S3Bucket
-from micro_aws.base_handler import BaseLambdaHandler
-from micro_aws.dynamodb_table import DynamoDBTable
-from micro_core.logging_config import configure_logging
-
-configure_logging(
-    service="sqs-users-processor",
-    instance=str(uuid4()),
-    level=os.getenv("LOG_LEVEL", "DEBUG"),
+from micro_aws.sqs_batch import RetriableError, SqsBatchResult, PoisonMessageError, BaseSqsBatchHandler
+from micro_aws.dispatcher import KeyedDispatcher
+from micro_aws.idempotency import (
+    DEFAULT_IDEMPOTENCY_TTL,
+    IdempotencyStore,
+    DynamoDBIdempotencyStore,
+    InMemoryIdempotencyStore,
 )
+from micro_core.compression import decode_sqs_message_body
+from micro_aws.dynamodb_table import MAX_BATCH_GET_KEYS, DynamoDBTable
+from micro_aws.instrumentation import EmfSink
+from micro_core.logging_config import configure_logging
 
 LOGGER = logging.getLogger()
 
+# bounded by the max_pool_connections of the clients (see micro_aws.clients.ClientProfile),
+# more threads would queue on the connection pool
+DEFAULT_CONCURRENCY = 10
+# users processed between two checks of the time budget: a single BatchGetItem and a single bulk delete
+# per chunk, independently of the concurrency
+BUDGET_CHUNK_SIZE = MAX_BATCH_GET_KEYS
 
-class SQSUsersProcessor(BaseLambdaHandler):
+
+class SQSUsersProcessor(BaseSqsBatchHandler):
     def __init__(
         self,
         users_table: DynamoDBTable,
         micro_s3_bucket: S3Bucket,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        idempotency_store: Optional[IdempotencyStore] = None,
+        record_timeout: Optional[float] = None,
     ):
+        """
+        Args:
+            users_table (DynamoDBTable): the table of the users
+            micro_s3_bucket (S3Bucket): the bucket where the users are exported as json
+            concurrency (int): the max number of requests sent in parallel to S3. Optional, defaulted to 10.
+            idempotency_store (Optional[IdempotencyStore]): the store of the messages already processed,
+                None to process every message received. Optional, defaulted to None.
+            record_timeout (Optional[float]): the max seconds to export a single user, None to wait
+                indefinitely. Optional, defaulted to None.
+        """
         self._users_table = users_table
         self._micro_s3_bucket = micro_s3_bucket
+        self._concurrency = concurrency
+        self._idempotency_store = idempotency_store
+        self._dispatcher = KeyedDispatcher(
+            concurrency=concurrency,
+            timeout=record_timeout,
+            thread_name_prefix="create-user",
+        )
 
     @property
-    def action_mapping(self) -> Dict[str, Callable[[str], None]]:
+    def action_mapping(self) -> Dict[str, Callable[[List[str]], Dict[str, Exception]]]:
         return {
             "create-user": self._create_user_task,
             "delete-user": self._delete_user_task,
         }
 
-    def handle_request(
+    def process_records(
         self,
-        event: Dict[str, Any],
+        records: List[Dict[str, Any]],
+        result: SqsBatchResult,
         context: Any,
         **kwargs: Any,
     ):
         """
         Entry point for the invocation of the lambda function.
 
+        Remarks:
+            The messages already processed (see IdempotencyStore) are skipped and the remaining ones are
+            coalesced, so that every user is processed once with the net effect of its messages (see _coalesce).
+            The user ids of the batch are then grouped by action, so that every action can handle
+            all its users at once: the users to create are read with BatchGetItem and uploaded
+            concurrently, the users to delete are removed with a single bulk delete.
+            Every action returns the users that failed, the failures are reported on all the
+            messages of those users (see BaseSqsBatchHandler).
+            The users are processed in chunks of BUDGET_CHUNK_SIZE while the time budget of the invocation allows it,
+            the messages of the users left are reported as failures to be redelivered (see TimeBudget).
+
         Reference:
             https://docs.aws.amazon.com/lambda/latest/dg/with-sqs.html
             https://docs.aws.amazon.com/lambda/latest/dg/python-context.html
 
         Args:
-            event (Dict[str, Any]): Map of the entire sqs event
+            records (List[Dict[str, Any]]): the records of the sqs event
+            result (SqsBatchResult): the outcome of the batch
             context (object): Object that provides methods, properties and information about the invocation,
                 function, and execution environment.
         """
-        LOGGER.debug("Start function=%s, received event=%s", context.invoked_function_arn, event)
-        for record in event.get("Records", []):
-            message_body = json.loads(record.get("body"))
-            user_id: str = message_body.get("user_id")
+        with self.instrumentation.phase("logging"):
+            LOGGER.debug("Start function=%s, received records=%s", context.invoked_function_arn, records)
+        if self._idempotency_store:
+            with self.instrumentation.phase("idempotency"):
+                processed = self._idempotency_store.get_processed(record["messageId"] for record in records)
+            if processed:
+                with self.instrumentation.phase("logging"):
+                    LOGGER.info(f"Skip already processed messages: {sorted(processed)}")
+                records = [record for record in records if record["messageId"] not in processed]
+
+        with self.instrumentation.phase("parse"):
+            message_ids_by_action = self._coalesce(records=records, result=result)
+        message_ids_by_user_id = {
+            user_id: message_ids
+            for message_ids_by_user in message_ids_by_action.values()
+            for user_id, message_ids in message_ids_by_user.items()
+        }
+        # the users are processed in chunks, as long as the time budget allows it
+        unprocessed = self.process_within_budget(
+            items=[(action, user_id) for action, user_ids in message_ids_by_action.items() for user_id in user_ids],
+            process=lambda chunk: self._dispatch(chunk, message_ids_by_user_id, result),
+            context=context,
+            chunk_size=BUDGET_CHUNK_SIZE,
+        )
+        result.defer([message_id for _, user_id in unprocessed for message_id in message_ids_by_user_id[user_id]])
+
+        if self._idempotency_store:
+            with self.instrumentation.phase("idempotency"):
+                self._idempotency_store.save_processed(
+                    message_id
+                    for message_ids in message_ids_by_user_id.values()
+                    for message_id in message_ids
+                    if message_id not in result.retriable and message_id not in result.poison
+                )
+
+    def _dispatch(
+        self,
+        actions: List[Tuple[str, str]],
+        message_ids_by_user_id: Dict[str, List[str]],
+        result: SqsBatchResult,
+    ):
+        """
+        Run the actions on the users, reporting the failures on all the messages of the users
+
+        Args:
+            actions (List[Tuple[str, str]]): the action and user_id pairs to run
+            message_ids_by_user_id (Dict[str, List[str]]): the messages of every user
+            result (SqsBatchResult): the outcome of the batch
+        """
+        user_ids_by_action: Dict[str, List[str]] = defaultdict(list)
+        for action, user_id in actions:
+            user_ids_by_action[action].append(user_id)
+        for action, user_ids in user_ids_by_action.items():
             try:
-                action = message_body["action"]
-                callable_action = self.action_mapping[action]
-                callable_action(user_id)
+                failures = self.action_mapping[action](user_ids)
             except Exception as exc:
-                LOGGER.exception(exc)
-
-    def _create_user_task(self, user_id: str):
-        user_item = self._users_table.get_item(hash_key_value=user_id)
-        object = self._micro_s3_bucket.upload_content(
-            key=f"users/{user_id}.json",
-            body=json.dumps(obj=user_item, cls=AwsEncoder),
-            content_type="application/json",
+                failures = {user_id: exc for user_id in user_ids}
+            for user_id, failure in failures.items():
+                result.fail_all(message_ids_by_user_id[user_id], failure)
+
+    def _coalesce(self, records: List[Dict[str, Any]], result: SqsBatchResult) -> Dict[str, Dict[str, List[str]]]:
+        """
+        Reduce the messages of the batch to a single action per user
+
+        Remarks:
+            The messages with the same messageId (duplicate deliveries) are counted once. The messages with the
+            same body as a previous one (producer re-sends, with a new messageId) are not parsed nor replayed:
+            they share the outcome of the first one and keep its place in the sequence of the user.
+            The net effect of a sequence of actions on the same user is its last action, e.g.
+            create -> delete is a delete and delete -> create is a create: the create action
+            exports the current state of the user and the delete action removes it.
+            All the messages of a user share the outcome of its net action.
+
+        Args:
+            records (List[Dict[str, Any]]): the records of the sqs event, in the order they were received
+            result (SqsBatchResult): the outcome of the batch, where the poison messages are reported
+
+        Returns:
+            (Dict[str, Dict[str, List[str]]]): action -> user_id -> message ids
+        """
+        last_action_by_user_id: Dict[str, str] = {}
+        message_ids_by_user_id: Dict[str, List[str]] = defaultdict(list)
+        seen_message_ids: Set[str] = set()
+        # body hash -> user_id of the first message with that body, or the reason why it is a poison message
+        first_by_body_hash: Dict[str, Union[str, PoisonMessageError]] = {}
+        for record in records:
+            message_id = record["messageId"]
+            if message_id in seen_message_ids:
+                continue
+            seen_message_ids.add(message_id)
+            body_hash = hashlib.sha256(record["body"].encode("utf-8")).hexdigest()
+            first = first_by_body_hash.get(body_hash)
+            if first is None:
+                try:
+                    action, user_id = self._parse_record(record)
+                except PoisonMessageError as exc:
+                    first = exc
+                else:
+                    last_action_by_user_id[user_id] = action
+                    first = user_id
+                first_by_body_hash[body_hash] = first
+            if isinstance(first, PoisonMessageError):
+                result.fail(message_id, first)
+            else:
+                message_ids_by_user_id[first].append(message_id)
+
+        message_ids_by_action: Dict[str, Dict[str, List[str]]] = defaultdict(dict)
+        for user_id, action in last_action_by_user_id.items():
+            message_ids_by_action[action][user_id] = message_ids_by_user_id[user_id]
+        LOGGER.debug(
+            "Coalesced %s messages into %s users: %s",
+            len(seen_message_ids),
+            len(last_action_by_user_id),
+            {action: len(user_ids) for action, user_ids in message_ids_by_action.items()},
         )
-        LOGGER.info(f"Upload object: {object}")
+        return message_ids_by_action
+
+    def _parse_record(self, record: Dict[str, Any]) -> Tuple[str, str]:
+        """
+        Returns:
+            (Tuple):
+                action (str): the action requested by the message
+                user_id (str): the user the action applies to
+
+        Raises:
+            PoisonMessageError: the message can not be processed
+        """
+        try:
+            message_body = json.loads(decode_sqs_message_body(record))
+            action = message_body["action"]
+            user_id = message_body["user_id"]
+        except (ValueError, KeyError, TypeError) as exc:
+            raise PoisonMessageError(f"Invalid body of message={record.get('messageId')}: {exc!r}") from exc
+        if action not in self.action_mapping:
+            raise PoisonMessageError(f"Unsupported action={action} in message={record.get('messageId')}")
+        return action, user_id
+
+    def _create_user_task(self, user_ids: List[str]) -> Dict[str, Exception]:
+        """
+        Export the users as json, the users are read with BatchGetItem and uploaded concurrently
+        (see KeyedDispatcher)
+
+        Remarks:
+            The latency of every user (record histogram) is the BatchGetItem it waited for plus its own upload.
+
+        Returns:
+            (Dict[str, Exception]): the users that could not be exported
+        """
+        # consistent read: a user created right before the message was sent has to be found
+        start = time.perf_counter()
+        with self.instrumentation.phase("dynamodb"):
+            user_items = {
+                item["user_id"]: item
+                for item in self._users_table.batch_get_items(
+                    hash_key_values=user_ids, concurrency=self._concurrency, consistent_read=True
+                )
+            }
+        # the user has been deleted in the meantime, nothing to export
+        failures: Dict[str, Exception] = {
+            user_id: PoisonMessageError(f"User not found: {user_id}")
+            for user_id in user_ids
+            if user_id not in user_items
+        }
+        if not user_items:
+            return failures
+        read_ms = (time.perf_counter() - start) * 1000
+        items = list(user_items.values())
+        with self.instrumentation.phase("s3"):
+            dispatch_result = self._dispatcher.dispatch(
+                items=items, process=partial(self._upload_user, read_ms=read_ms), key=itemgetter("user_id")
+            )
+        for index, exc in dispatch_result.failures.items():
+            failures[items[index]["user_id"]] = exc
+        return failures
 
-    def _delete_user_task(self, user_id: str):
-        response = self._micro_s3_bucket.delete_file(key=f"users/{user_id}.json")
-        LOGGER.info(f"Delete object: {response}")
+    def _upload_user(self, user_item: Dict[str, Any], read_ms: float = 0.0):
+        user_id = user_item["user_id"]
+        start = time.perf_counter()
+        try:
+            # sort_keys: the same item has always the same representation, see upload_if_changed
+            object = self._micro_s3_bucket.upload_if_changed(
+                key=f"users/{user_id}.json",
+                body=json.dumps(obj=user_item, cls=AwsEncoder, sort_keys=True),
+                content_type="application/json",
+            )
+        finally:
+            # timed in the thread of the upload: the uploads of the users run in parallel
+            self.instrumentation.observe("record", read_ms + (time.perf_counter() - start) * 1000)
+        with self.instrumentation.phase("logging"):
+            LOGGER.info(f"Upload object: {object}" if object else f"Skip unchanged object for user: {user_id}")
 
+    def _delete_user_task(self, user_ids: List[str]) -> Dict[str, Exception]:
+        """
+        Remarks:
+            The latency of every user (record histogram) is the bulk delete it waited for.
 
-def create_lambda_handler(bucket_name: str, table_name: str) -> SQSUsersProcessor:
-    boto3_s3_resource = boto3.resource("s3")
-    boto3_dynamodb_resource = boto3.resource("dynamodb")
-    return SQSUsersProcessor(
+        Returns:
+            (Dict[str, Exception]): the users whose object could not be deleted
+        """
+        start = time.perf_counter()
+        with self.instrumentation.phase("s3"):
+            errors = self._micro_s3_bucket.delete_files(keys=[f"users/{user_id}.json" for user_id in user_ids])
+        self.instrumentation.observe("record", (time.perf_counter() - start) * 1000, count=len(user_ids))
+        with self.instrumentation.phase("logging"):
+            LOGGER.info(f"Delete objects: {len(user_ids)}, errors: {errors}")
+        return {
+            error.key.removeprefix("users/").removesuffix(".json"): RetriableError(f"{error.code}: {error.message}")
+            for error in errors
+        }
+
+
+def create_lambda_handler(
+    bucket_name: str,
+    table_name: str,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    idempotency_table_name: Optional[str] = None,
+    idempotency_ttl: int = DEFAULT_IDEMPOTENCY_TTL,
+    metrics_namespace: Optional[str] = None,
+    record_timeout: Optional[float] = None,
+) -> SQSUsersProcessor:
+    registry = get_registry()
+    # init phase: build the clients and open a connection before the first invocation
+    registry.warm("s3", "head_bucket", Bucket=bucket_name)
+    registry.warm("dynamodb")
+    boto3_s3_resource = registry.resource("s3")
+    boto3_dynamodb_resource = registry.resource("dynamodb")
+    shared_store = None
+    if idempotency_table_name:
+        shared_store = DynamoDBIdempotencyStore(
+            table=DynamoDBTable.from_boto3_dynamodb_resource(
+                boto3_dynamodb_resource=boto3_dynamodb_resource,
+                table_name=idempotency_table_name,
+            ),
+            ttl=idempotency_ttl,
+        )
+    processor = SQSUsersProcessor(
         users_table=DynamoDBTable.from_boto3_dynamodb_resource(
             boto3_dynamodb_resource=boto3_dynamodb_resource,
             table_name=table_name,
@@ -92,11 +346,38 @@ def create_lambda_handler(bucket_name: str, table_name: str) -> SQSUsersProcesso
             boto3_s3_resource=boto3_s3_resource,
             bucket_name=bucket_name,
         ),
+        concurrency=concurrency,
+        idempotency_store=InMemoryIdempotencyStore(ttl=idempotency_ttl, shared_store=shared_store),
+        record_timeout=record_timeout,
     )
+    if metrics_namespace:
+        processor.metrics_sink = EmfSink(namespace=metrics_namespace, dimensions={"Service": "sqs-users-processor"})
+    return processor
 
 
-if os.getenv("AWS_EXECUTION_ENV"):
-    handler = create_lambda_handler(
+def init() -> SQSUsersProcessor:
+    """
+    Init phase of the Lambda: the module import only loads the code, the logging and the
+    AWS resources (boto3) are set up here, once per container
+
+    Reference:
+        https://docs.aws.amazon.com/lambda/latest/dg/lambda-runtime-environment.html#runtimes-lifecycle-ib
+    """
+    configure_logging(
+        service="sqs-users-processor",
+        instance=str(uuid4()),
+        level=os.getenv("LOG_LEVEL", "DEBUG"),
+    )
+    return create_lambda_handler(
         bucket_name=os.getenv("BUCKET_NAME", "invalid"),
         table_name=os.getenv("TABLE_NAME", "invalid"),
+        concurrency=int(os.getenv("CONCURRENCY", DEFAULT_CONCURRENCY)),
+        idempotency_table_name=os.getenv("IDEMPOTENCY_TABLE_NAME"),
+        idempotency_ttl=int(os.getenv("IDEMPOTENCY_TTL", DEFAULT_IDEMPOTENCY_TTL)),
+        metrics_namespace=os.getenv("METRICS_NAMESPACE"),
+        record_timeout=float(os.environ["RECORD_TIMEOUT"]) if os.getenv("RECORD_TIMEOUT") else None,
     )
+
+
+if os.getenv("AWS_EXECUTION_ENV"):
+    handler = init()
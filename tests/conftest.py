@@ -3,13 +3,14 @@ from typing import Any, TypeVar, Generator
 
 import boto3
 import pytest
-from moto import mock_sqs, mock_dynamodb
+from moto import mock_s3, mock_sqs, mock_dynamodb
 from aws_xray_sdk import global_sdk_config
 from fast_api_users.app import app
 from boto3.resources.base import ServiceResource
 from starlette.testclient import TestClient
 from fast_api_users.dependencies import users, aws_services
 
+from micro_aws.s3_bucket import S3Bucket
 from micro_aws.sqs_queue import SqsQueue
 from micro_aws.dynamodb_table import DynamoDBTable
 
@@ -92,6 +93,34 @@ def micro_sqs_queue(micro_aws_boto3_sqs_queue: Any) -> SqsQueue:
     return SqsQueue(micro_aws_boto3_sqs_queue)
 
 
+@pytest.fixture(scope="session")
+def boto3_s3_resource(aws_credentials: None, region_name: str) -> YieldFixture[ServiceResource]:
+    with mock_s3():
+        yield boto3.resource("s3", region_name)
+
+
+@pytest.fixture(scope="session")
+def micro_aws_bucket_name() -> str:
+    return "micro-aws-bucket"
+
+
+@pytest.fixture(scope="session")
+def micro_aws_boto3_s3_bucket(
+    boto3_s3_resource: ServiceResource,
+    micro_aws_bucket_name: str,
+    region_name: str,
+) -> Any:
+    return boto3_s3_resource.create_bucket(
+        Bucket=micro_aws_bucket_name,
+        CreateBucketConfiguration={"LocationConstraint": region_name},
+    )
+
+
+@pytest.fixture(scope="session")
+def micro_s3_bucket(micro_aws_boto3_s3_bucket: Any) -> S3Bucket:
+    return S3Bucket(micro_aws_boto3_s3_bucket)
+
+
 @pytest.fixture(scope="module")
 def test_app() -> YieldFixture[TestClient]:
     client = TestClient(app)
@@ -125,3 +154,11 @@ class LambdaContext:
 
     def get_remaining_time_in_millis(self) -> int:
         return 1000
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
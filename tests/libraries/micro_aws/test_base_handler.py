@@ -0,0 +1,60 @@
+from typing import Any, Dict, List
+
+import pytest
+
+from micro_aws.base_handler import TimeBudget, LatencyEstimator, BaseLambdaHandler
+
+from tests.conftest import FakeClock, LambdaContext
+
+
+class SlowHandler(BaseLambdaHandler):
+    """Every record takes 0.2 seconds"""
+
+    safety_margin = 0.1
+
+    def __init__(self, clock: FakeClock):
+        self._clock = clock
+        self.processed: List[int] = []
+
+    def handle_request(self, event: Dict[str, Any], context: Any, **kwargs: Any) -> List[int]:
+        return self.process_within_budget(
+            items=event["records"], process=self._process, context=context, clock=self._clock
+        )
+
+    def _process(self, records: List[int]):
+        self._clock.now += 0.2 * len(records)
+        self.processed.extend(records)
+
+
+def test_latency_estimator():
+    estimator = LatencyEstimator(smoothing=0.5)
+    assert estimator.value is None
+    estimator.update(elapsed=1.0, count=2)
+    assert estimator.value == 0.5
+    estimator.update(elapsed=1.5)
+    assert estimator.value == 1.0
+    with pytest.raises(ValueError):
+        LatencyEstimator(smoothing=0)
+
+
+def test_time_budget():
+    clock = FakeClock()
+    estimator = LatencyEstimator()
+    # LambdaContext: 1 second left
+    budget = TimeBudget(context=LambdaContext(), estimator=estimator, safety_margin=0.5, clock=clock)
+    with budget.measure(count=2):
+        clock.now = 0.2
+    assert budget.remaining() == pytest.approx(0.3)
+    assert budget.can_start(count=2)
+    assert not budget.can_start(count=4)
+
+
+def test_process_within_budget():
+    clock = FakeClock()
+    handler = SlowHandler(clock)
+
+    # 1 second left, 0.1 safety margin: the first record has no estimate, then 0.2 seconds per record
+    unprocessed = handler(event={"records": list(range(10))}, context=LambdaContext())
+
+    assert handler.processed == [0, 1, 2, 3]
+    assert unprocessed == [4, 5, 6, 7, 8, 9]
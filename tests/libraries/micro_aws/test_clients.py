@@ -0,0 +1,112 @@
+from typing import Any, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from micro_aws.clients import ClientProfile, ClientRegistry, get_registry
+
+
+@pytest.fixture
+def registry(boto3_dynamodb_resource: Any, region_name: str) -> ClientRegistry:
+    return ClientRegistry(ClientProfile(name="test", region_name=region_name, max_pool_connections=20))
+
+
+def test_shared_client(registry: ClientRegistry, users_table_name: str, users_boto3_table: Any):
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        clients: List[Any] = list(executor.map(lambda _: registry.client("dynamodb"), range(8)))
+        resources: List[Any] = list(executor.map(lambda _: registry.resource("dynamodb"), range(4)))
+
+    client = registry.client("dynamodb")
+    assert all(other is client for other in clients)
+    assert client.meta.config.max_pool_connections == 20
+    assert client.meta.config.retries == {"mode": "adaptive", "total_max_attempts": 5}
+    # a resource per thread, on top of a client shared by the resources, apart from the raw client
+    assert registry.resource("dynamodb") is registry.resource("dynamodb")
+    assert all(resource.meta.client is registry.resource("dynamodb").meta.client for resource in resources)
+    assert registry.resource("dynamodb").meta.client is not client
+    assert registry.resource("dynamodb").Table(users_table_name).table_name == users_table_name
+
+    # the connection errors of the warm up are ignored
+    registry.warm("dynamodb", "describe_table", TableName="not-existing-table")
+
+
+def test_client_profile_from_env(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("MICRO_AWS_MAX_POOL_CONNECTIONS", "64")
+    monkeypatch.setenv("MICRO_AWS_RETRY_MODE", "standard")
+    monkeypatch.setenv("MICRO_AWS_REGION_NAME", "eu-west-1")
+    monkeypatch.setenv("MICRO_AWS_ENDPOINT_URL", "http://localhost:4566")
+    monkeypatch.setenv("MICRO_AWS_ENDPOINT_URL_DYNAMODB", "http://localhost:8000")
+
+    profile = ClientProfile.from_env()
+
+    assert profile.max_pool_connections == 64
+    assert profile.retry_mode == "standard"
+    assert profile.read_timeout == ClientProfile().read_timeout
+    assert profile.service_endpoint_url("dynamodb") == "http://localhost:8000"
+    assert profile.service_endpoint_url("sqs") == "http://localhost:4566"
+    registry = ClientRegistry(profile)
+    assert registry.client("sqs").meta.endpoint_url == "http://localhost:4566"
+
+
+def test_get_registry():
+    profile = ClientProfile(name="test-get-registry")
+    assert get_registry(profile) is get_registry(profile)
+    with pytest.raises(ValueError):
+        get_registry(ClientProfile(name="test-get-registry", max_pool_connections=1))
+
+
+def test_call_observer(
+    registry: ClientRegistry, users_table_name: str, users_boto3_table: Any, boto3_sqs_resource: Any
+):
+    calls: List[tuple] = []
+
+    def observer(service: str, operation: str, seconds: float, error: Optional[str]):
+        calls.append((service, operation, seconds, error))
+
+    registry.client("dynamodb").describe_table(TableName=users_table_name)
+    # applied to the existing clients and to the future ones, once
+    registry.add_call_observer(observer)
+    registry.add_call_observer(observer)
+    registry.client("dynamodb").describe_table(TableName=users_table_name)
+    with pytest.raises(Exception):
+        registry.resource("dynamodb").Table("not-existing-table").load()
+    registry.client("sqs").list_queues()
+
+    assert [(service, operation, error) for service, operation, _, error in calls] == [
+        ("dynamodb", "DescribeTable", None),
+        ("dynamodb", "DescribeTable", "ResourceNotFoundException"),
+        ("sqs", "ListQueues", None),
+    ]
+    assert all(seconds >= 0 for _, _, seconds, _ in calls)
+
+
+def test_resource_per_thread_without_extra_client(registry: ClientRegistry, monkeypatch: pytest.MonkeyPatch):
+    first = registry.resource("dynamodb")
+    session = registry._get_session()
+    clients: List[str] = []
+    session_client = session.client
+
+    def client(service_name: str, **kwargs: Any) -> Any:
+        clients.append(service_name)
+        return session_client(service_name, **kwargs)
+
+    monkeypatch.setattr(session, "client", client)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        resources: List[Any] = list(executor.map(lambda _: registry.resource("dynamodb"), range(4)))
+
+    assert all(resource is not first and type(resource) is type(first) for resource in resources)
+    assert all(resource.meta.client is first.meta.client for resource in resources)
+    assert clients == []
+
+
+def test_client_untouched_by_resources(registry: ClientRegistry, users_table_name: str, users_boto3_table: Any):
+    client = registry.client("dynamodb")
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        executor.submit(lambda: registry.resource("dynamodb").Table(users_table_name).load()).result()
+
+    # the raw client still sends and returns the typed values of DynamoDB
+    client.put_item(TableName=users_table_name, Item={"user_id": {"S": "raw-client"}, "name": {"S": "raw"}})
+    response = client.get_item(TableName=users_table_name, Key={"user_id": {"S": "raw-client"}})
+    assert response["Item"] == {"user_id": {"S": "raw-client"}, "name": {"S": "raw"}}
+    client.delete_item(TableName=users_table_name, Key={"user_id": {"S": "raw-client"}})
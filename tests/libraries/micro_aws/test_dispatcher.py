@@ -0,0 +1,89 @@
+import time
+import threading
+from typing import List, Tuple
+
+import pytest
+
+from micro_aws.dispatcher import KeyedDispatcher, SkippedRecordError, DispatchTimeoutError
+
+
+def test_dispatch_per_key_ordering():
+    processed: List[Tuple[str, int]] = []
+    lock = threading.Lock()
+
+    def process(item: Tuple[str, int]) -> int:
+        # the first records are the slowest: without ordering they would complete last
+        time.sleep(0.01 * (5 - item[1]))
+        with lock:
+            processed.append(item)
+        return item[1]
+
+    items = [(key, sequence) for sequence in range(5) for key in "abc"]
+    result = KeyedDispatcher(concurrency=3).dispatch(items, process=process, key=lambda item: item[0])
+
+    assert not result.failures
+    assert result.results == {index: item[1] for index, item in enumerate(items)}
+    for key in "abc":
+        assert [sequence for item_key, sequence in processed if item_key == key] == list(range(5))
+
+
+def test_dispatch_concurrency():
+    start = time.monotonic()
+    result = KeyedDispatcher(concurrency=10).dispatch(list(range(10)), process=lambda _: time.sleep(0.1))
+
+    assert len(result.results) == 10
+    assert time.monotonic() - start < 0.5
+
+
+def test_dispatch_failures():
+    def process(item: Tuple[str, int]):
+        if item == ("a", 1):
+            raise Exception("failure")
+
+    items = [("a", 0), ("a", 1), ("a", 2), ("b", 0)]
+    result = KeyedDispatcher(concurrency=2).dispatch(items, process=process, key=lambda item: item[0])
+
+    assert set(result.results) == {0, 3}
+    assert str(result.failures[1]) == "failure"
+    assert isinstance(result.failures[2], SkippedRecordError)
+
+    result = KeyedDispatcher(stop_key_on_failure=False).dispatch(items, process=process, key=lambda item: item[0])
+    assert set(result.results) == {0, 2, 3}
+
+
+def test_dispatch_timeout():
+    release = threading.Event()
+
+    def process(item: Tuple[str, int]):
+        if item == ("a", 0):
+            release.wait(5)
+
+    items = [("a", 0), ("a", 1), ("b", 0), ("c", 0)]
+    try:
+        # a single worker: the stuck one is replaced to process the other keys
+        result = KeyedDispatcher(concurrency=1, timeout=0.1).dispatch(items, process=process, key=lambda item: item[0])
+    finally:
+        release.set()
+
+    assert isinstance(result.failures[0], DispatchTimeoutError)
+    assert isinstance(result.failures[1], SkippedRecordError)
+    assert set(result.results) == {2, 3}
+
+
+def test_dispatch_timeout_fast_records():
+    # the lane moves from record to record while the monitor checks it: no record is timed out before it starts
+    items = [("a", sequence) for sequence in range(200)]
+    result = KeyedDispatcher(timeout=0.01).dispatch(
+        items, process=lambda _: time.sleep(0.001), key=lambda item: item[0]
+    )
+
+    assert not result.failures
+    assert len(result.results) == 200
+
+
+def test_dispatcher_validation():
+    with pytest.raises(ValueError):
+        KeyedDispatcher(concurrency=0)
+    with pytest.raises(ValueError):
+        KeyedDispatcher(timeout=0)
+    assert not KeyedDispatcher().dispatch([], process=print).results
@@ -6,7 +6,7 @@ from datetime import datetime
 
 import pytest
 
-from micro_aws.dynamodb_table import DynamoDBTable, DynamoDBTableIndex, DynamoDBTableKeySchema
+from micro_aws.dynamodb_table import MAX_BATCH_ATTEMPTS, DynamoDBTable, DynamoDBTableIndex, DynamoDBTableKeySchema
 
 
 def random_friendly_name(length: int = 10) -> str:
@@ -50,3 +50,68 @@ class TestDynamoDBTable:
         item = self._dynamodb_table.get_item(hash_key_value=fake_item["user_id"])
         assert isinstance(item, dict)
         assert fake_item == item
+
+    def test_batch_get_items(self):
+        # Given more items than a single BatchGetItem request can return
+        fake_items = [create_faker_user_item() for _ in range(150)]
+        with self._boto3_dynamodb_table.batch_writer() as batch:
+            for fake_item in fake_items:
+                batch.put_item(Item=fake_item)
+        # When they are requested with duplicates and a missing key
+        user_ids = [fake_item["user_id"] for fake_item in fake_items]
+        items = self._dynamodb_table.batch_get_items(
+            hash_key_values=user_ids + user_ids[:10] + [str(uuid.uuid4())],
+            concurrency=2,
+        )
+        # Then every existing item is returned once
+        assert sorted(items, key=lambda item: item["user_id"]) == sorted(fake_items, key=lambda item: item["user_id"])
+
+    def test_batch_put_items(self):
+        fake_items = [create_faker_user_item() for _ in range(30)]
+        # the items with the same key are written once, the last one wins
+        updated = dict(fake_items[0], name="updated")
+        assert self._dynamodb_table.batch_put_items(items=fake_items + [updated]) == []
+        assert self._dynamodb_table.get_item(hash_key_value=updated["user_id"]) == updated
+        assert self._dynamodb_table.get_item(hash_key_value=fake_items[29]["user_id"]) == fake_items[29]
+
+    def test_batch_put_items_unprocessed(self, monkeypatch: pytest.MonkeyPatch):
+        fake_items = [create_faker_user_item() for _ in range(3)]
+        client = self._dynamodb_table._table.meta.client
+        batch_write_item = client.batch_write_item
+        attempts = []
+
+        def throttled(RequestItems: Any) -> Any:
+            # the first item is always throttled
+            attempts.append(RequestItems)
+            ((table_name, requests),) = RequestItems.items()
+            if requests[1:]:
+                batch_write_item(RequestItems={table_name: requests[1:]})
+            return {"UnprocessedItems": {table_name: requests[:1]}}
+
+        monkeypatch.setattr(client, "batch_write_item", throttled)
+        monkeypatch.setattr("micro_aws.dynamodb_table.time.sleep", lambda seconds: None)
+
+        # given up after the max number of attempts instead of retrying forever
+        assert self._dynamodb_table.batch_put_items(items=fake_items) == fake_items[:1]
+        assert len(attempts) == MAX_BATCH_ATTEMPTS
+        monkeypatch.undo()
+        assert self._dynamodb_table.get_item(hash_key_value=fake_items[2]["user_id"]) == fake_items[2]
+
+    @pytest.mark.parametrize("segments", [1, 3])
+    def test_iter_items(self, segments: int):
+        # Given more items than a single scan page
+        fake_items = [create_faker_user_item() for _ in range(30)]
+        with self._boto3_dynamodb_table.batch_writer() as batch:
+            for fake_item in fake_items:
+                batch.put_item(Item=fake_item)
+        # When the table is scanned with a projection
+        items = list(self._dynamodb_table.iter_items(attributes=["user_id", "name"], segments=segments, page_size=7))
+        # Then every item is returned, with the projected attributes only
+        user_ids = [item["user_id"] for item in items]
+        if segments == 1:
+            # moto ignores Segment: every segment of a parallel scan returns the whole table
+            assert len(user_ids) == len(set(user_ids))
+        assert {fake_item["user_id"] for fake_item in fake_items} <= set(user_ids)
+        assert all(set(item) <= {"user_id", "name"} for item in items)
+        with pytest.raises(ValueError):
+            self._dynamodb_table.iter_items(segments=0)
@@ -0,0 +1,46 @@
+import time
+import uuid
+from typing import Any
+
+import pytest
+from boto3.resources.base import ServiceResource
+
+from micro_aws.idempotency import EXPIRATION_ATTRIBUTE, DynamoDBIdempotencyStore, InMemoryIdempotencyStore
+from micro_aws.dynamodb_table import DynamoDBTable
+
+
+@pytest.fixture(scope="session")
+def idempotency_boto3_table(boto3_dynamodb_resource: ServiceResource) -> Any:
+    return boto3_dynamodb_resource.create_table(
+        TableName="idempotency-table",
+        KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "id", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+
+
+def test_dynamodb_idempotency_store(idempotency_boto3_table: Any):
+    store = DynamoDBIdempotencyStore(table=DynamoDBTable(idempotency_boto3_table), ttl=60)
+    processed, expired, missing = [str(uuid.uuid4()) for _ in range(3)]
+    store.save_processed([processed])
+    # expired items not deleted by DynamoDB yet
+    idempotency_boto3_table.put_item(Item={"id": expired, EXPIRATION_ATTRIBUTE: int(time.time()) - 1})
+
+    assert store.get_processed([processed, expired, missing]) == {processed}
+    assert store.get_processed([]) == set()
+
+
+def test_in_memory_idempotency_store(idempotency_boto3_table: Any):
+    shared_store = DynamoDBIdempotencyStore(table=DynamoDBTable(idempotency_boto3_table))
+    first_container = InMemoryIdempotencyStore(shared_store=shared_store)
+    second_container = InMemoryIdempotencyStore(shared_store=shared_store)
+    local_store = InMemoryIdempotencyStore(max_entries=1)
+    keys = [str(uuid.uuid4()) for _ in range(2)]
+
+    first_container.save_processed(keys[:1])
+    local_store.save_processed(keys)
+
+    assert first_container.get_processed(keys) == set(keys[:1])
+    assert second_container.get_processed(keys) == set(keys[:1])
+    # least recently used key evicted
+    assert local_store.get_processed(keys) == set(keys[1:])
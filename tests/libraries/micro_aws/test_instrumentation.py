@@ -0,0 +1,59 @@
+import io
+import json
+from typing import Any, Dict, List
+
+from micro_aws.base_handler import BaseLambdaHandler
+from micro_aws.instrumentation import NULL_INSTRUMENTATION, EmfSink, InMemorySink
+
+from tests.conftest import LambdaContext
+
+
+class InstrumentedHandler(BaseLambdaHandler):
+    def handle_request(self, event: Dict[str, Any], context: Any, **kwargs: Any) -> List[int]:
+        with self.instrumentation.phase("parse"):
+            records = list(event["records"])
+        return self.process_within_budget(items=records, process=self._process, context=context)
+
+    def _process(self, records: List[int]):
+        for _ in records:
+            self.instrumentation.observe("record", 0.1)
+
+
+def test_instrumentation_disabled():
+    handler = InstrumentedHandler()
+
+    assert handler({"records": [1, 2]}, LambdaContext()) == []
+    assert handler.instrumentation is NULL_INSTRUMENTATION
+
+
+def test_instrumentation():
+    handler = InstrumentedHandler()
+    handler.metrics_sink = InMemorySink()
+
+    handler({"records": [1, 2, 3]}, LambdaContext())
+    handler({"records": [1]}, LambdaContext())
+
+    first, second = handler.metrics_sink.invocations
+    assert not second.cold_start and second.init_duration is None
+    assert list(first.phases) == ["parse"]
+    assert first.histograms["record"].count == 3
+    assert second.histograms["record"].count == 1
+    assert handler.instrumentation is NULL_INSTRUMENTATION
+
+
+def test_emf_sink():
+    stream = io.StringIO()
+    handler = InstrumentedHandler()
+    handler.metrics_sink = EmfSink(namespace="MicroAws", dimensions={"Service": "test"}, stream=stream)
+
+    handler({"records": list(range(150))}, LambdaContext())
+
+    document = json.loads(stream.getvalue())
+    metric_definitions = document["_aws"]["CloudWatchMetrics"][0]
+    assert metric_definitions["Namespace"] == "MicroAws"
+    assert metric_definitions["Dimensions"] == [["Service"]]
+    assert {"Name": "Phase.parse", "Unit": "Milliseconds"} in metric_definitions["Metrics"]
+    assert document["Service"] == "test"
+    assert document["ColdStart"] in (0, 1)
+    # more than 100 records: summarized by the percentiles
+    assert len(document["Latency.record"]) == 100
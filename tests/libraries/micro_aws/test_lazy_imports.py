@@ -0,0 +1,22 @@
+import sys
+import subprocess
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "module, lazy_modules",
+    [
+        ("micro_aws.s3_bucket", ["boto3", "botocore"]),
+        ("micro_aws.sqs_queue", ["boto3", "botocore"]),
+        ("micro_aws.idempotency", ["boto3", "botocore"]),
+        ("micro_aws.clients", ["boto3", "botocore"]),
+        ("micro_core.logging_config", ["pythonjsonlogger"]),
+        ("sqs_users_processor.app", ["boto3", "botocore", "pythonjsonlogger"]),
+    ],
+)
+def test_lazy_imports(module: str, lazy_modules: list):
+    # fresh interpreter: the tests already imported everything
+    code = f"import sys, {module}; print(' '.join(sorted(set({lazy_modules!r}) & set(sys.modules))))"
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert completed.stdout.strip() == ""
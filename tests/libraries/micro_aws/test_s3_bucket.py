@@ -0,0 +1,190 @@
+import io
+import os
+import uuid
+from typing import Any
+
+import pytest
+
+from micro_aws.s3_bucket import MIN_PART_SIZE, S3Bucket, S3ReadCache, S3ReadCacheStats, ChecksumMismatchError
+
+from tests.conftest import FakeClock
+
+
+class TestS3Bucket:
+    @pytest.fixture(autouse=True)
+    def _setup(
+        self,
+        micro_aws_boto3_s3_bucket: Any,
+        micro_s3_bucket: S3Bucket,
+    ):
+        self._boto3_s3_bucket = micro_aws_boto3_s3_bucket
+        self._s3_bucket = micro_s3_bucket
+
+    def test_upload_stream_small_body(self):
+        self._s3_bucket.upload_stream(key="stream/small.json", content=[b'{"a":', b" 1}"], part_size=MIN_PART_SIZE)
+        assert self._s3_bucket.get_content(key="stream/small.json").read() == b'{"a": 1}'
+
+    def test_upload_stream_multipart(self):
+        # Given a content of 2 full parts and a smaller last part
+        content = os.urandom(2 * MIN_PART_SIZE + 1024)
+        # When the content is uploaded as a file-like object
+        self._s3_bucket.upload_stream(
+            key="stream/multipart.bin",
+            content=io.BytesIO(content),
+            part_size=MIN_PART_SIZE,
+            concurrency=2,
+            verify_checksum=True,
+        )
+        # Then the object is the concatenation of the parts
+        assert self._s3_bucket.get_content(key="stream/multipart.bin").read() == content
+        assert self._boto3_s3_bucket.Object("stream/multipart.bin").e_tag.endswith('-3"')
+
+    def test_upload_stream_abort_on_failure(self):
+        def chunks():
+            yield os.urandom(MIN_PART_SIZE)
+            yield os.urandom(MIN_PART_SIZE)
+            raise RuntimeError("broken stream")
+
+        with pytest.raises(RuntimeError):
+            self._s3_bucket.upload_stream(key="stream/failure.bin", content=chunks(), part_size=MIN_PART_SIZE)
+        assert not list(self._boto3_s3_bucket.multipart_uploads.all())
+        assert not list(self._boto3_s3_bucket.objects.filter(Prefix="stream/failure.bin"))
+
+    def test_upload_stream_abort_failure(self, monkeypatch: pytest.MonkeyPatch):
+        def chunks():
+            yield os.urandom(MIN_PART_SIZE)
+            yield os.urandom(MIN_PART_SIZE)
+            raise RuntimeError("broken stream")
+
+        def abort_multipart_upload(**kwargs: Any):
+            raise ConnectionError("abort failed")
+
+        client = self._boto3_s3_bucket.meta.client
+        abort = client.abort_multipart_upload
+        monkeypatch.setattr(client, "abort_multipart_upload", abort_multipart_upload)
+        # the error of the upload is raised, not the one of the abort
+        with pytest.raises(RuntimeError):
+            self._s3_bucket.upload_stream(key="stream/abort-failure.bin", content=chunks(), part_size=MIN_PART_SIZE)
+        for upload in self._boto3_s3_bucket.multipart_uploads.all():
+            abort(Bucket=upload.bucket_name, Key=upload.object_key, UploadId=upload.id)
+
+    def test_upload_stream_checksum_mismatch(self, monkeypatch: pytest.MonkeyPatch):
+        client = self._boto3_s3_bucket.meta.client
+        complete = client.complete_multipart_upload
+
+        def complete_multipart_upload(**kwargs: Any) -> Any:
+            return dict(complete(**kwargs), ETag='"not-the-content-etag-2"')
+
+        monkeypatch.setattr(client, "complete_multipart_upload", complete_multipart_upload)
+        with pytest.raises(ChecksumMismatchError):
+            self._s3_bucket.upload_stream(
+                key="stream/mismatch.bin",
+                content=os.urandom(MIN_PART_SIZE + 1),
+                part_size=MIN_PART_SIZE,
+                verify_checksum=True,
+            )
+
+    def test_download_to(self, tmp_path: Any):
+        content = os.urandom(3 * 1024 * 1024 + 17)
+        self._boto3_s3_bucket.put_object(Key="download/snapshot.bin", Body=content)
+
+        buffer = bytearray(len(content))
+        size = self._s3_bucket.download_to(
+            key="download/snapshot.bin", destination=buffer, concurrency=4, chunk_size=1024 * 1024
+        )
+        assert size == len(content)
+        assert buffer == content
+
+        path = tmp_path / "snapshot.bin"
+        self._s3_bucket.download_to(key="download/snapshot.bin", destination=path, chunk_size=1024 * 1024)
+        assert path.read_bytes() == content
+
+        assert b"".join(self._s3_bucket.iter_chunks(key="download/snapshot.bin", chunk_size=1024)) == content
+
+    def test_download_to_failure(self, tmp_path: Any, monkeypatch: pytest.MonkeyPatch):
+        self._boto3_s3_bucket.put_object(Key="download/failure.bin", Body=b"content")
+
+        def download_ranges(*args: Any):
+            raise ConnectionError("download failed")
+
+        monkeypatch.setattr(self._s3_bucket, "_download_ranges", download_ranges)
+        # the file created by the download is removed, the existing one is kept
+        created, existing = tmp_path / "created.bin", tmp_path / "existing.bin"
+        existing.write_bytes(b"previous")
+        for path in (created, existing):
+            with pytest.raises(ConnectionError):
+                self._s3_bucket.download_to(key="download/failure.bin", destination=path)
+        assert not created.exists()
+        assert existing.exists()
+
+        # the error of the open is raised, not the one of the cleanup
+        with pytest.raises(FileNotFoundError, match="missing"):
+            self._s3_bucket.download_to(key="download/failure.bin", destination=tmp_path / "missing" / "file.bin")
+
+    def test_delete_files(self):
+        keys = [f"delete/{index}.json" for index in range(1005)]
+        for key in keys[:10]:
+            self._boto3_s3_bucket.put_object(Key=key, Body=b"{}")
+
+        errors = self._s3_bucket.delete_files(keys=keys, concurrency=2)
+
+        assert errors == []
+        assert not list(self._boto3_s3_bucket.objects.filter(Prefix="delete/"))
+
+    def test_iter_objects(self):
+        keys = sorted(f"listing/{uuid.uuid4()}.json" for _ in range(40))
+        for key in keys:
+            self._boto3_s3_bucket.put_object(Key=key, Body=b"{}")
+        self._boto3_s3_bucket.put_object(Key="listing/nested/object.json", Body=b"{}")
+
+        objects = list(self._s3_bucket.iter_objects(prefix="listing/", delimiter="/", page_size=7))
+        assert [summary.key for summary in objects] == keys
+        assert all(summary.size == 2 for summary in objects)
+
+        after = list(self._s3_bucket.iter_objects(prefix="listing/", delimiter="/", start_after=keys[19]))
+        assert [summary.key for summary in after] == keys[20:]
+
+        parallel = self._s3_bucket.iter_objects_parallel(prefix="listing/", concurrency=4, page_size=3)
+        assert sorted(summary.key for summary in parallel) == keys
+
+    def test_upload_if_changed(self):
+        key = "changed/user.json"
+        assert self._s3_bucket.upload_if_changed(key=key, body='{"name": "test"}') is not None
+        # cached hash
+        assert self._s3_bucket.upload_if_changed(key=key, body='{"name": "test"}') is None
+        # new container, the hash is read from the object metadata
+        assert S3Bucket(self._boto3_s3_bucket).upload_if_changed(key=key, body='{"name": "test"}') is None
+        assert self._s3_bucket.upload_if_changed(key=key, body='{"name": "changed"}') is not None
+        assert self._s3_bucket.get_content(key=key).read() == b'{"name": "changed"}'
+        # objects uploaded without metadata are compared by ETag
+        self._s3_bucket.upload_content(key=key, body='{"name": "plain"}')
+        assert S3Bucket(self._boto3_s3_bucket).upload_if_changed(key=key, body='{"name": "plain"}') is None
+
+    def test_get_content_read_cache(self):
+        clock = FakeClock()
+        s3_bucket = S3Bucket(self._boto3_s3_bucket, read_cache=S3ReadCache(max_object_bytes=16, ttl=10, clock=clock))
+        self._boto3_s3_bucket.put_object(Key="cache/config.json", Body=b'{"v": 1}')
+        self._boto3_s3_bucket.put_object(Key="cache/large.json", Body=b"x" * 17)
+
+        assert s3_bucket.get_content(key="cache/config.json").read() == b'{"v": 1}'
+        assert s3_bucket.get_content(key="cache/config.json").read() == b'{"v": 1}'
+        clock.now = 10
+        assert s3_bucket.get_content(key="cache/config.json").read() == b'{"v": 1}'
+        assert s3_bucket.read_cache_stats == S3ReadCacheStats(hits=1, revalidations=1, misses=1)
+
+        self._boto3_s3_bucket.put_object(Key="cache/config.json", Body=b'{"v": 2}')
+        clock.now = 20
+        assert s3_bucket.get_content(key="cache/config.json").read() == b'{"v": 2}'
+        # objects bigger than max_object_bytes are never cached
+        assert s3_bucket.get_content(key="cache/large.json").read() == b"x" * 17
+        assert s3_bucket.get_content(key="cache/large.json").read() == b"x" * 17
+        assert s3_bucket.read_cache_stats == S3ReadCacheStats(hits=1, revalidations=1, misses=4)
+
+    def test_upload_if_changed_invalidates_read_cache(self):
+        s3_bucket = S3Bucket(
+            self._boto3_s3_bucket, read_cache=S3ReadCache(max_object_bytes=16, ttl=10, clock=FakeClock())
+        )
+        s3_bucket.upload_if_changed(key="cache/user.json", body=b"v1")
+        assert s3_bucket.get_content(key="cache/user.json").read() == b"v1"
+        assert s3_bucket.upload_if_changed(key="cache/user.json", body=b"v2") is not None
+        assert s3_bucket.get_content(key="cache/user.json").read() == b"v2"
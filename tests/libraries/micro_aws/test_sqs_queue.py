@@ -0,0 +1,88 @@
+import json
+from typing import Any, Dict, List
+
+import pytest
+
+from micro_aws.sqs_queue import SqsQueue
+from micro_core.compression import GZIP, CONTENT_ENCODING_ATTRIBUTE, decode_sqs_message_body
+
+
+def receive_all(boto3_sqs_queue: Any) -> List[Dict[str, Any]]:
+    messages: List[Dict[str, Any]] = []
+    while True:
+        received = boto3_sqs_queue.receive_messages(MaxNumberOfMessages=10, MessageAttributeNames=["All"])
+        if not received:
+            return messages
+        for message in received:
+            messages.append(
+                {"Body": message.body, "MessageAttributes": message.message_attributes, "MessageId": message.message_id}
+            )
+            message.delete()
+
+
+def test_send_messages_with_compression(boto3_sqs_resource: Any):
+    boto3_sqs_queue = boto3_sqs_resource.create_queue(QueueName="test-send-messages-with-compression")
+    sqs_queue = SqsQueue(boto3_sqs_queue, codec=GZIP, compression_threshold=256)
+    small_body = {"action": "create-user", "user_id": "small"}
+    large_body = {"action": "create-user", "user_id": "large", "payload": ["x" * 16] * 100}
+
+    response = sqs_queue.send_messages(bodies=[small_body, large_body] * 6)
+
+    assert len(response["Successful"]) == 12
+    assert not response["Failed"]
+    messages = receive_all(boto3_sqs_queue)
+    assert len(messages) == 12
+    compressed = [message for message in messages if message["MessageAttributes"]]
+    assert len(compressed) == 6
+    for message in compressed:
+        assert message["MessageAttributes"][CONTENT_ENCODING_ATTRIBUTE]["StringValue"] == GZIP
+    assert sorted(json.loads(decode_sqs_message_body(message))["user_id"] for message in messages) == sorted(
+        ["small", "large"] * 6
+    )
+
+
+def test_send_messages_batch_failure(boto3_sqs_resource: Any, monkeypatch: pytest.MonkeyPatch):
+    boto3_sqs_queue = boto3_sqs_resource.create_queue(QueueName="test-send-messages-batch-failure")
+    sqs_queue = SqsQueue(boto3_sqs_queue)
+    send_messages = boto3_sqs_queue.send_messages
+    calls: List[int] = []
+
+    def fail_second_batch(**kwargs: Any) -> Dict[str, Any]:
+        calls.append(len(kwargs["Entries"]))
+        if len(calls) == 2:
+            raise ConnectionError("connection reset")
+        return send_messages(**kwargs)
+
+    monkeypatch.setattr(boto3_sqs_queue, "send_messages", fail_second_batch)
+
+    response = sqs_queue.send_messages(bodies=[{"action": "create-user", "user_id": str(index)} for index in range(25)])
+
+    # only the entries of the failed batch are reported, the next batch is still sent
+    assert calls == [10, 10, 5]
+    assert sorted(int(entry["Id"]) for entry in response["Failed"]) == list(range(10, 20))
+    assert {entry["Code"] for entry in response["Failed"]} == {"ConnectionError"}
+    assert len(response["Successful"]) == 15
+    assert len(receive_all(boto3_sqs_queue)) == 15
+
+
+def test_send_messages_batch_size(boto3_sqs_resource: Any, monkeypatch: pytest.MonkeyPatch):
+    boto3_sqs_queue = boto3_sqs_resource.create_queue(QueueName="test-send-messages-batch-size")
+    sqs_queue = SqsQueue(boto3_sqs_queue)
+    send_messages = boto3_sqs_queue.send_messages
+    calls: List[int] = []
+
+    def count_entries(**kwargs: Any) -> Dict[str, Any]:
+        calls.append(len(kwargs["Entries"]))
+        return send_messages(**kwargs)
+
+    monkeypatch.setattr(boto3_sqs_queue, "send_messages", count_entries)
+
+    # 2 messages of 100 KiB fill the 256 KiB of a batch, the small ones are sent 10 by 10
+    large_bodies = [{"action": "create-user", "user_id": str(index), "payload": "x" * 100 * 1024} for index in range(3)]
+    small_bodies = [{"action": "create-user", "user_id": str(index)} for index in range(3, 15)]
+    response = sqs_queue.send_messages(bodies=large_bodies + small_bodies)
+
+    assert calls == [2, 10, 3]
+    assert not response["Failed"]
+    assert len(response["Successful"]) == 15
+    assert len(receive_all(boto3_sqs_queue)) == 15
@@ -0,0 +1,31 @@
+from micro_core.cache import LRUCache
+
+from tests.conftest import FakeClock
+
+
+def test_lru_cache_eviction():
+    cache = LRUCache(max_entries=3, max_weight=10, weigher=len)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"
+    # over the max weight, the least recently used (b) is evicted
+    cache.put("c", b"1234")
+    assert cache.get("b") is None
+    assert cache.weight == 8
+    # a single value heavier than max weight is not stored
+    assert not cache.put("d", b"12345678901")
+    assert "d" not in cache
+
+
+def test_lru_cache_ttl():
+    clock = FakeClock()
+    cache = LRUCache(ttl=10, clock=clock)
+    cache.put("a", "value")
+    clock.now = 10
+    entry = cache.get_entry("a")
+    assert entry is not None and entry.is_expired(clock.now)
+    cache.touch("a")
+    assert cache.get("a") == "value"
+    clock.now = 20
+    assert cache.get("a") is None
+    assert len(cache) == 0
@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from micro_core.compression import (
+    GZIP,
+    DEFLATE,
+    CONTENT_ENCODING_ATTRIBUTE,
+    compress_body,
+    decompress_body,
+    decode_sqs_message_body,
+)
+
+
+@pytest.mark.parametrize("codec", [GZIP, DEFLATE])
+def test_compress_body_round_trip(codec: str):
+    body = json.dumps([{"action": "create-user", "user_id": str(index)} for index in range(100)])
+    compressed, applied_codec = compress_body(body=body, codec=codec, threshold=0)
+    assert applied_codec == codec
+    assert len(compressed) < len(body)
+    assert decompress_body(body=compressed, codec=applied_codec) == body
+
+
+def test_compress_body_below_threshold():
+    body = json.dumps({"action": "create-user", "user_id": "1"})
+    assert compress_body(body=body, threshold=1024) == (body, None)
+
+
+def test_decode_sqs_message_body():
+    body = json.dumps({"users": ["user"] * 1000})
+    compressed, codec = compress_body(body=body)
+    lambda_record = {
+        "body": compressed,
+        "messageAttributes": {CONTENT_ENCODING_ATTRIBUTE: {"stringValue": codec, "dataType": "String"}},
+    }
+    boto3_message = {
+        "Body": compressed,
+        "MessageAttributes": {CONTENT_ENCODING_ATTRIBUTE: {"StringValue": codec, "DataType": "String"}},
+    }
+    assert decode_sqs_message_body(lambda_record) == body
+    assert decode_sqs_message_body(boto3_message) == body
+    assert decode_sqs_message_body({"body": body, "messageAttributes": {}}) == body
@@ -0,0 +1,55 @@
+import pytest
+
+from micro_core.concurrency_limit import GradientLimit
+
+
+def test_limit_grows_while_latency_is_stable():
+    limit = GradientLimit(initial_limit=10, max_limit=50)
+    for _ in range(100):
+        limit.update(rtt=0.01, in_flight=limit.limit)
+    assert limit.limit == 50
+
+
+def test_limit_does_not_grow_when_unused():
+    limit = GradientLimit(initial_limit=10)
+    for _ in range(100):
+        limit.update(rtt=0.01, in_flight=2)
+    assert limit.limit == 10
+
+
+def test_limit_shrinks_when_latency_grows():
+    limit = GradientLimit(initial_limit=100, min_limit=4)
+    for _ in range(50):
+        limit.update(rtt=0.01, in_flight=100)
+    grown = limit.limit
+    for _ in range(20):
+        limit.update(rtt=0.1, in_flight=limit.limit)
+    assert limit.limit < grown / 2
+    for _ in range(200):
+        limit.update(rtt=1.0, in_flight=limit.limit)
+    assert limit.limit >= 4
+
+
+def test_limit_backs_off_on_drops():
+    limit = GradientLimit(initial_limit=100, min_limit=10)
+    limit.update(rtt=0.01, in_flight=100, dropped=True)
+    assert limit.limit == 98
+    for _ in range(500):
+        limit.update(rtt=0.01, in_flight=100, dropped=True)
+    assert limit.limit == 10
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"initial_limit": 2, "min_limit": 4},
+        {"initial_limit": 300, "max_limit": 200},
+        {"min_limit": 0},
+        {"tolerance": 0.5},
+        {"smoothing": 0},
+        {"backoff": 1},
+    ],
+)
+def test_invalid_limit(kwargs):
+    with pytest.raises(ValueError):
+        GradientLimit(**kwargs)
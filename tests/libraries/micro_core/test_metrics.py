@@ -0,0 +1,20 @@
+import pytest
+
+from micro_core.metrics import Histogram
+
+
+def test_histogram():
+    histogram = Histogram()
+    for value in range(1, 101):
+        histogram.record(float(value))
+    histogram.record(0.0)
+
+    assert histogram.count == 101
+    assert histogram.sum == 5050
+    assert (histogram.min, histogram.max) == (0.0, 100.0)
+    # logarithmic buckets: error below 5%
+    assert histogram.percentile(50) == pytest.approx(50, rel=0.05)
+    assert histogram.percentile(99) == pytest.approx(99, rel=0.05)
+    assert histogram.percentile(100) == 100.0
+    assert histogram.percentile(0) == 0.0
+    assert Histogram().percentile(50) is None
@@ -0,0 +1,78 @@
+import os
+import time
+
+import pytest
+
+from micro_core.prometheus import Gauge, Counter, Histogram, MetricsRegistry
+
+
+def create_registry(directory=None) -> MetricsRegistry:
+    registry = MetricsRegistry(directory=directory)
+    registry.register(Counter("requests_total", "Requests", ["method"]))
+    registry.register(Gauge("in_flight", "In flight"))
+    registry.register(Gauge("lag_seconds", "Lag", mode="max"))
+    registry.register(Histogram("duration_seconds", "Duration", ["route"], buckets=[0.1, 1.0]))
+    return registry
+
+
+def test_render():
+    registry = create_registry()
+    metrics = registry.snapshot()
+    assert set(metrics) == {"requests_total", "in_flight", "lag_seconds", "duration_seconds"}
+    registry._metrics["requests_total"].inc(("GET",))
+    registry._metrics["requests_total"].inc(("GET",), 2)
+    registry._metrics["in_flight"].inc()
+    registry._metrics["lag_seconds"].set(0.25)
+    for value in (0.05, 0.1, 0.5, 3):
+        registry._metrics["duration_seconds"].observe(value, ('/users/{user_id}"',))
+
+    lines = registry.render().splitlines()
+
+    assert "# HELP requests_total Requests" in lines
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{method="GET"} 3' in lines
+    assert "in_flight 1" in lines
+    assert "lag_seconds 0.25" in lines
+    # cumulative buckets, the label values are escaped
+    assert 'duration_seconds_bucket{route="/users/{user_id}\\"",le="0.1"} 2' in lines
+    assert 'duration_seconds_bucket{route="/users/{user_id}\\"",le="1"} 3' in lines
+    assert 'duration_seconds_bucket{route="/users/{user_id}\\"",le="+Inf"} 4' in lines
+    assert 'duration_seconds_sum{route="/users/{user_id}\\""} 3.65' in lines
+    assert 'duration_seconds_count{route="/users/{user_id}\\""} 4' in lines
+
+
+def test_invalid_metrics():
+    registry = create_registry()
+    with pytest.raises(ValueError):
+        registry.register(Counter("requests_total", "Requests"))
+    with pytest.raises(ValueError):
+        registry._metrics["requests_total"].inc(("GET", "/users"))
+    with pytest.raises(ValueError):
+        Gauge("in_flight", "In flight", mode="avg")
+
+
+def test_merge_processes(tmp_path):
+    # two workers sharing the directory, the snapshot of the other one is written by hand
+    worker, other = create_registry(str(tmp_path)), create_registry()
+    for registry, lag in ((worker, 0.5), (other, 0.2)):
+        registry._metrics["requests_total"].inc(("GET",))
+        registry._metrics["in_flight"].inc()
+        registry._metrics["lag_seconds"].set(lag)
+        registry._metrics["duration_seconds"].observe(0.5, ("/users",))
+    other.directory = str(tmp_path)
+    other._snapshot_path = lambda pid: os.path.join(str(tmp_path), "metrics-0.json")  # type: ignore[assignment]
+    other.write_snapshot()
+
+    lines = worker.render().splitlines()
+
+    assert 'requests_total{method="GET"} 2' in lines
+    assert "in_flight 2" in lines
+    assert "lag_seconds 0.5" in lines
+    assert 'duration_seconds_count{route="/users"} 2' in lines
+
+    # the gauges of a dead worker are dropped, its counters are kept
+    stale = time.time() - worker.stale_after - 1
+    os.utime(os.path.join(str(tmp_path), "metrics-0.json"), (stale, stale))
+    lines = worker.render().splitlines()
+    assert 'requests_total{method="GET"} 2' in lines
+    assert "in_flight 1" in lines
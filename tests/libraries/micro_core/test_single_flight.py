@@ -0,0 +1,87 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from micro_core.single_flight import SingleFlight, AsyncSingleFlight, SingleFlightStats
+
+
+def test_single_flight_threads():
+    single_flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    executions = []
+
+    def read() -> dict:
+        executions.append(1)
+        started.set()
+        release.wait(timeout=5)
+        return {"user_id": "a"}
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        leader = executor.submit(single_flight.do, "a", read)
+        assert started.wait(timeout=5)
+        followers = [executor.submit(single_flight.do, "a", read) for _ in range(4)]
+        while single_flight.stats().coalesced < 4:
+            time.sleep(0.001)
+        release.set()
+        results = [leader.result()] + [follower.result() for follower in followers]
+    assert len(executions) == 1
+    assert all(result is results[0] for result in results)
+    assert single_flight.stats() == SingleFlightStats(calls=5, executions=1, coalesced=4)
+    # nothing is cached once the call is done
+    single_flight.do("a", read)
+    assert len(executions) == 2
+
+
+def test_single_flight_threads_error():
+    single_flight = SingleFlight()
+
+    def read():
+        raise KeyError("a")
+
+    with pytest.raises(KeyError):
+        single_flight.do("a", read)
+    assert single_flight.stats().executions == 1
+
+
+def test_async_single_flight():
+    observed = []
+    single_flight = AsyncSingleFlight(observer=lambda key, coalesced: observed.append((key, coalesced)))
+    executions = []
+
+    async def read(key: str) -> dict:
+        executions.append(key)
+        await asyncio.sleep(0.01)
+        return {"user_id": key}
+
+    async def main():
+        calls = [single_flight.do(key, lambda key=key: read(key)) for key in ["a", "a", "a", "b"]]
+        return await asyncio.gather(*calls)
+
+    results = asyncio.run(main())
+    assert sorted(executions) == ["a", "b"]
+    assert results[0] is results[1] is results[2]
+    assert results[3] == {"user_id": "b"}
+    assert single_flight.stats() == SingleFlightStats(calls=4, executions=2, coalesced=2)
+    assert observed == [("a", False), ("a", True), ("a", True), ("b", False)]
+
+
+def test_async_single_flight_cancelled_caller():
+    single_flight = AsyncSingleFlight()
+
+    async def read() -> str:
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def main():
+        first = asyncio.ensure_future(single_flight.do("a", read))
+        second = asyncio.ensure_future(single_flight.do("a", read))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    # the execution shared with the second caller is not cancelled with the first one
+    assert asyncio.run(main()) == "value"
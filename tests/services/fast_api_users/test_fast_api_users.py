@@ -1,12 +1,33 @@
+import json
 import uuid
+import asyncio
+import threading
+import contextvars
+from typing import Any
+from decimal import Decimal
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
+from fastapi import Response
 from starlette.testclient import TestClient
+from fast_api_users.metrics import ServiceMetrics
+from fast_api_users.routers import users_router
+from fast_api_users.dependencies import users, aws_services
 from fast_api_users.models.users_model import User
+from fast_api_users.models.serialization import ModelProjection, FastJSONResponse
+from fast_api_users.dependencies.executor import BlockingExecutor
+from fast_api_users.dependencies.http_cache import CacheGenerations, users_item_cache
+from fast_api_users.middlewares.admission_middleware import AdmissionControlMiddleware
+from fast_api_users.middlewares.compression_middleware import GZIP, ZSTD, BROTLI, negotiate
 
+from micro_core.cache import LRUCache
 from micro_core.utils import pick_keys
+from micro_aws.sqs_queue import SqsQueue
+from micro_core.prometheus import CONTENT_TYPE, MetricsRegistry
 from micro_aws.dynamodb_table import DynamoDBTable
+from micro_core.single_flight import AsyncSingleFlight
+from micro_core.concurrency_limit import GradientLimit
 
 
 @pytest.mark.usefixtures("override_dependencies")
@@ -16,9 +37,11 @@ class TestPhonesParserAPI:
         self,
         test_app: TestClient,
         users_table: DynamoDBTable,
+        micro_sqs_queue: SqsQueue,
     ):
         self._test_app = test_app
         self._users_table = users_table
+        self._micro_sqs_queue = micro_sqs_queue
 
     def test_get_users(self):
         user = self._users_table.add_item(
@@ -45,3 +68,355 @@ class TestPhonesParserAPI:
         user = self._users_table.get_item(hash_key_value=json_response["user_id"])
         assert user["name"] == "test"
         assert user["surname"] == "testing"
+
+    def test_post_users_batch(self):
+        users = [{"name": f"test-{index}", "surname": "testing"} for index in range(30)]
+        response = self._test_app.post(url="/users/batch", json={"users": users})
+        assert response.status_code == 201
+        results = response.json()["results"]
+        assert [result["index"] for result in results] == list(range(30))
+        assert all(result["created"] and result["error"] is None for result in results)
+        user = self._users_table.get_item(hash_key_value=results[29]["user"]["user_id"])
+        assert user["name"] == "test-29"
+
+    def test_post_users_batch_partial_failure(self, monkeypatch: pytest.MonkeyPatch):
+        def send_messages(bodies: list) -> dict:
+            return {
+                "Successful": [{"Id": "0"}],
+                "Failed": [{"Id": "1", "Message": "throttled"}],
+            }
+
+        monkeypatch.setattr(self._micro_sqs_queue, "send_messages", send_messages)
+        users = [{"name": "test", "surname": "testing"}, {"name": "test", "surname": "testing"}]
+        response = self._test_app.post(url="/users/batch", json={"users": users})
+        assert response.status_code == 207
+        first, second = response.json()["results"]
+        assert first["created"] and first["error"] is None
+        assert second["created"] and second["error"] == "create-user event not sent: throttled"
+
+    def test_post_users_batch_unprocessed(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(self._users_table, "batch_put_items", lambda items: items[1:])
+        users = [{"name": "test", "surname": "testing"}, {"name": "throttled", "surname": "testing"}]
+        response = self._test_app.post(url="/users/batch", json={"users": users})
+        assert response.status_code == 207
+        first, second = response.json()["results"]
+        assert first["created"] and first["error"] is None
+        assert not second["created"] and second["error"] == "user not created: unprocessed by DynamoDB"
+
+    def test_post_users_batch_invalid(self):
+        assert self._test_app.post(url="/users/batch", json={"users": []}).status_code == 422
+
+    def test_get_users_page(self):
+        user_id = self._add_user()
+        users, next_token = [], None
+        while True:
+            page = self._test_app.get("/users", params={"next_token": next_token} if next_token else {}).json()
+            users.extend(page["users"])
+            if not (next_token := page["next_token"]):
+                break
+        assert {"user_id": user_id, "name": "test", "surname": "testing", "address": None} in users
+        assert all(list(user) == list(User.__fields__) for user in users)
+        page = self._test_app.get("/users", params={"only_ids": True}).json()
+        assert set(page) == {"user_ids", "next_token"}
+
+    def test_export_users(self):
+        user_ids = {self._add_user() for _ in range(3)}
+        response = self._test_app.get("/users/export", params={"segments": 2})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        users = [json.loads(line) for line in response.text.splitlines()]
+        assert user_ids <= {user["user_id"] for user in users}
+        # only the User fields are exported
+        assert all(set(user) <= set(User.__fields__) for user in users)
+
+    def test_export_users_fields_gzip(self):
+        user_id = self._add_user()
+        response = self._test_app.get(
+            "/users/export", params={"fields": ["user_id", "name"]}, headers={"Accept-Encoding": "gzip"}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        users = [json.loads(line) for line in response.text.splitlines()]
+        assert {"user_id": user_id, "name": "test"} in users
+        assert all(set(user) <= {"user_id", "name"} for user in users)
+
+    def test_compression(self):
+        for _ in range(20):
+            self._add_user()
+        response = self._test_app.get("/users", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert "accept-encoding" in response.headers["vary"].lower()
+        assert int(response.headers["content-length"]) < len(response.content)
+        assert len(response.json()["users"]) > 0
+        # below the minimum size
+        response = self._test_app.get("/users/health", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+        # not accepted by the client
+        response = self._test_app.get("/users", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
+
+    def test_export_users_unknown_fields(self):
+        assert self._test_app.get("/users/export", params={"fields": ["password"]}).status_code == 400
+
+    def _add_user(self) -> str:
+        user = self._users_table.add_item(
+            item={"user_id": str(uuid.uuid4()), "name": "test", "surname": "testing", "version": 1}
+        )
+        return user["user_id"]
+
+    def test_get_user_not_modified(self):
+        user_id = self._add_user()
+        response = self._test_app.get(f"/users/{user_id}")
+        assert response.status_code == 200
+        assert response.headers["etag"] == '"v1"'
+        assert response.headers["cache-control"] == "private, no-cache"
+
+        response = self._test_app.get(f"/users/{user_id}", headers={"If-None-Match": '"v0", W/"v1"'})
+        assert response.status_code == 304
+        assert response.headers["etag"] == '"v1"'
+        assert response.content == b""
+
+        self._users_table.update_item_by_key(hash_key_value=user_id, updates={"name": "updated", "version": 2})
+        response = self._test_app.get(f"/users/{user_id}", headers={"If-None-Match": '"v1"'})
+        assert response.status_code == 200
+        assert response.headers["etag"] == '"v2"'
+        assert response.json()["name"] == "updated"
+
+    def test_get_user_content_etag(self):
+        user = self._users_table.add_item(item={"user_id": str(uuid.uuid4()), "name": "test", "surname": "testing"})
+        first = self._test_app.get(f"/users/{user['user_id']}")
+        second = self._test_app.get(f"/users/{user['user_id']}", headers={"If-None-Match": first.headers["etag"]})
+        assert first.headers["etag"].startswith('"') and len(first.headers["etag"]) == 34
+        assert second.status_code == 304
+
+    def test_get_user_item_cache(self):
+        user_id = self._add_user()
+        cache: LRUCache = LRUCache(ttl=60)
+        self._test_app.app.dependency_overrides[users_item_cache] = lambda: cache  # type: ignore[attr-defined]
+        try:
+            assert self._test_app.get(f"/users/{user_id}").status_code == 200
+            # served from the cache without reading the table
+            self._users_table.update_item_by_key(hash_key_value=user_id, updates={"version": 2})
+            response = self._test_app.get(f"/users/{user_id}", headers={"If-None-Match": '"v1"'})
+            assert response.status_code == 304
+            # deleted through the api: evicted from the cache
+            assert self._test_app.delete(f"/users/{user_id}").status_code == 200
+            assert self._test_app.get(f"/users/{user_id}").status_code == 404
+        finally:
+            del self._test_app.app.dependency_overrides[users_item_cache]  # type: ignore[attr-defined]
+
+    def test_get_user_concurrent_delete(self, monkeypatch: pytest.MonkeyPatch):
+        user_id = self._add_user()
+        cache: LRUCache = LRUCache(ttl=60)
+        generations = CacheGenerations()
+        executor = BlockingExecutor(max_workers=2)
+        read, deleted = threading.Event(), threading.Event()
+        get_item = self._users_table.get_item
+
+        def slow_get_item(**kwargs: Any) -> Any:
+            item = get_item(**kwargs)
+            read.set()
+            deleted.wait(timeout=5)
+            return item
+
+        monkeypatch.setattr(self._users_table, "get_item", slow_get_item)
+        dependencies = {"users_table": self._users_table, "executor": executor, "item_cache": cache}
+
+        async def get_user():
+            return await users_router.get_user(
+                user_id=user_id,
+                response=Response(),
+                if_none_match=None,
+                cache_control="no-cache",
+                version_attribute="version",
+                single_flight=AsyncSingleFlight(),
+                generations=generations,
+                **dependencies,
+            )
+
+        async def interleave():
+            # the user is read before the delete and returned after it
+            pending = asyncio.create_task(get_user())
+            await asyncio.get_running_loop().run_in_executor(None, read.wait, 5)
+            await users_router.delete_user(
+                user_id=user_id, micro_sqs_queue=self._micro_sqs_queue, generations=generations, **dependencies
+            )
+            deleted.set()
+            return await pending
+
+        try:
+            assert asyncio.run(interleave())["user_id"] == user_id
+            # not put back in the cache after the delete evicted it
+            assert cache.get(user_id) is None
+        finally:
+            executor.shutdown()
+
+    def test_cache_generations(self):
+        generations = CacheGenerations(max_entries=2)
+        before = generations.get("a")
+        generations.bump("a")
+        assert generations.get("a") != before
+        # "a" forgotten: it still has not the generation of the reads started before the bump
+        generations.bump("b")
+        generations.bump("c")
+        assert generations.get("a") != before
+
+    def test_correlation_id_reused(self):
+        response = self._test_app.get("/users/health", headers={"x-correlation-id": "abc"})
+        assert response.status_code == 200
+        assert response.headers["x-correlation-id"] == "abc"
+
+    def test_correlation_id_generated(self):
+        response = self._test_app.get("/users/not-found-user-id")
+        assert response.status_code == 404
+        assert uuid.UUID(response.headers["x-correlation-id"])
+
+    def test_metrics(self):
+        assert self._test_app.get("/users/not-found-user-id").status_code == 404
+        response = self._test_app.get("/users/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == CONTENT_TYPE
+        # labelled by route template, not by path
+        assert (
+            'http_request_duration_seconds_count{method="GET",route="/users/{user_id}",status="404"}' in response.text
+        )
+        assert "# TYPE aws_call_duration_seconds histogram" in response.text
+        assert 'single_flight_executions_total{operation="get_item"}' in response.text
+        assert "# TYPE single_flight_coalesced_total counter" in response.text
+        assert "# TYPE event_loop_lag_seconds histogram" in response.text
+
+
+class TestBlockingExecutor:
+    def test_run_off_the_event_loop(self):
+        request_id: contextvars.ContextVar[str] = contextvars.ContextVar("request_id")
+        executor = BlockingExecutor(max_workers=2)
+
+        def blocking_call(value: int) -> tuple:
+            return threading.current_thread().name, request_id.get(), value
+
+        async def route() -> tuple:
+            request_id.set("abc")
+            return await executor.run(blocking_call, value=1)
+
+        try:
+            thread_name, context_value, value = asyncio.run(route())
+        finally:
+            executor.shutdown()
+        assert thread_name.startswith("aws")
+        assert (context_value, value) == ("abc", 1)
+
+    def test_run_raises(self):
+        executor = BlockingExecutor(max_workers=1)
+
+        def blocking_call():
+            raise KeyError("missing")
+
+        try:
+            with pytest.raises(KeyError):
+                asyncio.run(executor.run(blocking_call))
+        finally:
+            executor.shutdown()
+
+    def test_invalid_max_workers(self):
+        with pytest.raises(ValueError):
+            BlockingExecutor(max_workers=0)
+
+
+def test_model_projection():
+    items = [{"user_id": "1", "name": "a", "surname": "b", "created_at": "2023-01-01", "version": Decimal(3)}]
+    projected = ModelProjection(User).project_all(items)
+    # same body as the response_model serialization, without the validation
+    assert projected == [User(**items[0]).dict()]
+    assert FastJSONResponse({"version": Decimal(3), "ratio": Decimal("0.5")}).body == b'{"version":3,"ratio":0.5}'
+    with pytest.raises(KeyError):
+        ModelProjection(User).project({"user_id": "1"})
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        (None, None),
+        ("identity", None),
+        ("gzip, deflate, br", BROTLI),
+        ("gzip;q=0.5, br;q=0.4", GZIP),
+        ("gzip;q=0, *", ZSTD),
+        ("*;q=0", None),
+    ],
+)
+def test_negotiate(accept_encoding, expected):
+    assert negotiate(accept_encoding, [ZSTD, BROTLI, GZIP]) == expected
+
+
+def test_admission_control():
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        if scope["path"] == "/users/slow":
+            await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    metrics = ServiceMetrics(MetricsRegistry())
+    middleware = AdmissionControlMiddleware(app, GradientLimit(initial_limit=5, min_limit=1, max_limit=5), metrics)
+
+    async def request(method: str, path: str) -> tuple:
+        messages: list = []
+
+        async def send(message):
+            messages.append(message)
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        scope = {"type": "http", "method": method, "path": path, "headers": [], "state": {"correlation_id": "abc"}}
+        await middleware(scope, receive, send)
+        return messages[0]["status"], dict(messages[0]["headers"]), messages[1]["body"]
+
+    async def overload():
+        slow = [asyncio.create_task(request("GET", "/users/slow")) for _ in range(4)]
+        await asyncio.sleep(0.01)
+        # 4 in flight: the writes are over their share of the limit (0.8 x 5), the reads are not
+        write, read = await request("POST", "/users/"), await request("GET", "/users/")
+        fifth = asyncio.create_task(request("GET", "/users/slow"))
+        await asyncio.sleep(0.01)
+        rejected_read, health = await request("GET", "/users/"), await request("GET", "/users/health")
+        release.set()
+        await asyncio.gather(*slow, fifth)
+        return write, read, rejected_read, health
+
+    write, read, rejected_read, health = asyncio.run(overload())
+
+    assert write[0] == 503
+    assert write[1][b"retry-after"] == b"1"
+    assert json.loads(write[2]) == {"uuid": "abc", "message": "Service overloaded, retry later"}
+    assert read[0] == 200
+    assert rejected_read[0] == 503
+    assert health[0] == 200
+    assert middleware.in_flight == 0
+    text = metrics.registry.render()
+    assert 'admission_requests_shed_total{priority="write"} 1' in text
+    assert 'admission_requests_shed_total{priority="read"} 1' in text
+    # the slow responses shrank the limit
+    assert middleware.limit.limit < 5
+    assert f"admission_concurrency_limit {middleware.limit.limit}" in text
+
+
+def test_users_table_shared_by_threads(
+    users_boto3_table: Any, users_table_name: str, region_name: str, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", region_name)
+    users.users_table.cache_clear()
+    aws_services.boto3_dynamodb_resource.cache_clear()
+    try:
+        table = users.users_table(aws_services.boto3_dynamodb_resource(), users_table_name)
+        # the dependencies run on any thread of the threadpool: a single table per process
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            tables = list(
+                executor.map(
+                    lambda _: users.users_table(aws_services.boto3_dynamodb_resource(), users_table_name), range(8)
+                )
+            )
+        assert all(other is table for other in tables)
+    finally:
+        users.users_table.cache_clear()
+        aws_services.boto3_dynamodb_resource.cache_clear()
@@ -70,3 +70,27 @@ def test_app_batch_partial_response(
     assert ret == expected_response
     assert len(processor_result.fail_messages) == 1
     assert processor_result.success_messages[0] == successful_record
+
+
+def test_app_batch_fifo_message_group(
+    sqs_event: Dict[str, List[Dict[str, Any]]], sqs_batch_processing_lambda_context: LambdaContext
+):
+    # GIVEN a failed record followed by a valid one in the same message group, and one in another group
+    failed_record, skipped_record = sqs_event["Records"][1], sqs_event["Records"][0]
+    successful_record = {
+        **skipped_record,
+        "messageId": "3c8e4d8a-2f7a-4d4b-9a59-1ad7ac6f5f52",
+        "attributes": {**skipped_record["attributes"], "MessageGroupId": "other-group"},
+    }
+    for record in (failed_record, skipped_record):
+        record["attributes"]["MessageGroupId"] = "group"
+    sqs_event["Records"] = [failed_record, skipped_record, successful_record]
+
+    # WHEN
+    ret = lambda_handler(sqs_event, sqs_batch_processing_lambda_context)
+
+    # THEN the valid record of the group is skipped, so that it is not processed before the failed one
+    assert ret == {
+        "batchItemFailures": [{"itemIdentifier": record["messageId"]} for record in (failed_record, skipped_record)]
+    }
+    assert processor.success_messages == [successful_record]
@@ -0,0 +1,233 @@
+import json
+import time
+import uuid
+from typing import Any, Dict, List
+
+import pytest
+
+from micro_aws.s3_bucket import S3Bucket
+from micro_aws.idempotency import InMemoryIdempotencyStore
+from micro_aws.dynamodb_table import DynamoDBTable
+from micro_aws.instrumentation import InMemorySink
+
+from tests.conftest import LambdaContext
+from sqs_users_processor.app import SQSUsersProcessor
+
+
+def sqs_record(body: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "messageId": str(uuid.uuid4()),
+        "receiptHandle": "AQEBwJnKyrHigUMZj6rYigCgxlaS3SLy0a",
+        "body": json.dumps(body),
+        "attributes": {"ApproximateReceiveCount": "1"},
+        "messageAttributes": {},
+        "eventSource": "aws:sqs",
+        "eventSourceARN": "arn:aws:sqs:eu-west-1:123456789012:micro-aws-processor",
+        "awsRegion": "eu-west-1",
+    }
+
+
+def sqs_event(bodies: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"Records": [sqs_record(body) for body in bodies]}
+
+
+class TestSQSUsersProcessor:
+    @pytest.fixture(autouse=True)
+    def _setup(
+        self,
+        users_table: DynamoDBTable,
+        micro_s3_bucket: S3Bucket,
+        micro_aws_boto3_s3_bucket: Any,
+    ):
+        self._users_table = users_table
+        self._boto3_s3_bucket = micro_aws_boto3_s3_bucket
+        self._processor = SQSUsersProcessor(users_table=users_table, micro_s3_bucket=micro_s3_bucket)
+
+    def _create_users(self, count: int) -> List[str]:
+        user_ids = [str(uuid.uuid4()) for _ in range(count)]
+        for user_id in user_ids:
+            self._users_table.add_item(item={"user_id": user_id, "name": "test", "surname": "testing"})
+        return user_ids
+
+    def _object_keys(self) -> List[str]:
+        return [summary.key for summary in self._boto3_s3_bucket.objects.filter(Prefix="users/")]
+
+    def test_create_and_delete_users(self):
+        user_ids = self._create_users(3)
+
+        response = self._processor(
+            sqs_event([{"action": "create-user", "user_id": user_id} for user_id in user_ids]), LambdaContext()
+        )
+        assert response == {"batchItemFailures": []}
+        for user_id in user_ids:
+            assert f"users/{user_id}.json" in self._object_keys()
+        content = json.loads(self._boto3_s3_bucket.Object(f"users/{user_ids[0]}.json").get()["Body"].read())
+        assert content["user_id"] == user_ids[0]
+
+        self._processor(
+            sqs_event([{"action": "delete-user", "user_id": user_id} for user_id in user_ids]), LambdaContext()
+        )
+        for user_id in user_ids:
+            assert f"users/{user_id}.json" not in self._object_keys()
+
+    def test_partial_batch_failures(self, boto3_s3_resource: Any):
+        user_ids = self._create_users(2)
+        event = sqs_event(
+            [
+                {"action": "create-user", "user_id": user_ids[0]},
+                {"action": "delete-user", "user_id": user_ids[1]},
+                # poison messages: reported too, moved to the dead-letter queue by the redrive policy
+                {"action": "unknown-action", "user_id": user_ids[0]},
+                {"action": "create-user", "user_id": str(uuid.uuid4())},
+                {"user_id": user_ids[0]},
+            ]
+        )
+        store = InMemoryIdempotencyStore()
+        processor = SQSUsersProcessor(
+            users_table=self._users_table,
+            micro_s3_bucket=S3Bucket.from_boto3_s3_resource(boto3_s3_resource, "not-existing-bucket"),
+            idempotency_store=store,
+        )
+
+        response = processor(event, LambdaContext())
+
+        message_ids = [record["messageId"] for record in event["Records"]]
+        assert sorted(failure["itemIdentifier"] for failure in response["batchItemFailures"]) == sorted(message_ids)
+        # skipped if remembered as processed: the poison messages would never reach the dead-letter queue
+        assert store.get_processed(message_ids) == set()
+
+    def test_coalesce_actions_per_user(self):
+        user_ids = self._create_users(2)
+        event = sqs_event(
+            [
+                {"action": "create-user", "user_id": user_ids[0]},
+                {"action": "delete-user", "user_id": user_ids[0]},
+                {"action": "delete-user", "user_id": user_ids[1]},
+                {"action": "create-user", "user_id": user_ids[1]},
+            ]
+        )
+        # duplicate delivery of the same message
+        event["Records"].append(dict(event["Records"][3]))
+
+        response = self._processor(event, LambdaContext())
+
+        assert response == {"batchItemFailures": []}
+        assert f"users/{user_ids[0]}.json" not in self._object_keys()
+        assert f"users/{user_ids[1]}.json" in self._object_keys()
+
+    def test_coalesce_resent_messages(self):
+        user_ids = self._create_users(1)
+        event = sqs_event(
+            [
+                {"action": "create-user", "user_id": user_ids[0]},
+                {"action": "delete-user", "user_id": user_ids[0]},
+                # re-send of the first message by the producer: new messageId, same body
+                {"action": "create-user", "user_id": user_ids[0]},
+            ]
+        )
+
+        response = self._processor(event, LambdaContext())
+
+        assert response == {"batchItemFailures": []}
+        assert f"users/{user_ids[0]}.json" not in self._object_keys()
+
+    def test_skip_processed_messages(self, micro_s3_bucket: S3Bucket, boto3_s3_resource: Any):
+        user_ids = self._create_users(1)
+        event = sqs_event([{"action": "create-user", "user_id": user_ids[0]}])
+        message_id = event["Records"][0]["messageId"]
+        store = InMemoryIdempotencyStore()
+        failing_processor = SQSUsersProcessor(
+            users_table=self._users_table,
+            micro_s3_bucket=S3Bucket.from_boto3_s3_resource(boto3_s3_resource, "not-existing-bucket"),
+            idempotency_store=store,
+        )
+        processor = SQSUsersProcessor(
+            users_table=self._users_table,
+            micro_s3_bucket=micro_s3_bucket,
+            idempotency_store=store,
+        )
+
+        # the failed messages are not remembered: they are processed when redelivered
+        assert failing_processor(event, LambdaContext()) == {"batchItemFailures": [{"itemIdentifier": message_id}]}
+        assert store.get_processed([message_id]) == set()
+        assert processor(event, LambdaContext()) == {"batchItemFailures": []}
+        assert store.get_processed([message_id]) == {message_id}
+
+        self._boto3_s3_bucket.Object(f"users/{user_ids[0]}.json").delete()
+        assert processor(event, LambdaContext()) == {"batchItemFailures": []}
+        assert f"users/{user_ids[0]}.json" not in self._object_keys()
+
+    def test_defer_records_out_of_time_budget(self):
+        user_ids = self._create_users(2)
+        event = sqs_event([{"action": "create-user", "user_id": user_id} for user_id in user_ids])
+        # LambdaContext: 1 second left, all of it reserved to the safety margin
+        self._processor.safety_margin = 1.0
+
+        response = self._processor(event, LambdaContext())
+
+        assert response == {
+            "batchItemFailures": [{"itemIdentifier": record["messageId"]} for record in event["Records"]]
+        }
+        for user_id in user_ids:
+            assert f"users/{user_id}.json" not in self._object_keys()
+
+    def test_phase_metrics(self):
+        user_ids = self._create_users(2)
+        event = sqs_event(
+            [
+                {"action": "create-user", "user_id": user_ids[0]},
+                {"action": "delete-user", "user_id": user_ids[1]},
+            ]
+        )
+        self._processor.metrics_sink = InMemorySink()
+
+        self._processor(event, LambdaContext())
+
+        (metrics,) = self._processor.metrics_sink.invocations
+        assert set(metrics.phases) == {"logging", "parse", "dynamodb", "s3"}
+        assert metrics.histograms["record"].count == 2
+
+    def test_single_batch_calls_per_chunk(self, monkeypatch: pytest.MonkeyPatch):
+        user_ids = self._create_users(25)
+        event = sqs_event(
+            [{"action": "create-user", "user_id": user_id} for user_id in user_ids[:15]]
+            + [{"action": "delete-user", "user_id": user_id} for user_id in user_ids[15:]]
+        )
+        calls: List[str] = []
+        batch_get_items, delete_files = self._users_table.batch_get_items, self._processor._micro_s3_bucket.delete_files
+
+        def counted_batch_get_items(**kwargs: Any) -> Any:
+            calls.append("get")
+            return batch_get_items(**kwargs)
+
+        def counted_delete_files(**kwargs: Any) -> Any:
+            calls.append("delete")
+            return delete_files(**kwargs)
+
+        monkeypatch.setattr(self._users_table, "batch_get_items", counted_batch_get_items)
+        monkeypatch.setattr(self._processor._micro_s3_bucket, "delete_files", counted_delete_files)
+
+        assert self._processor(event, LambdaContext()) == {"batchItemFailures": []}
+
+        # more users than the concurrency: still one BatchGetItem and one bulk delete
+        assert sorted(calls) == ["delete", "get"]
+        assert {f"users/{user_id}.json" for user_id in user_ids[:15]} <= set(self._object_keys())
+
+    def test_record_latency(self, monkeypatch: pytest.MonkeyPatch):
+        user_ids = self._create_users(10)
+        event = sqs_event([{"action": "create-user", "user_id": user_id} for user_id in user_ids])
+        upload_if_changed = self._processor._micro_s3_bucket.upload_if_changed
+
+        def slow_upload(**kwargs: Any) -> Any:
+            time.sleep(0.05)
+            return upload_if_changed(**kwargs)
+
+        monkeypatch.setattr(self._processor._micro_s3_bucket, "upload_if_changed", slow_upload)
+        self._processor.metrics_sink = InMemorySink()
+
+        self._processor(event, LambdaContext())
+
+        (metrics,) = self._processor.metrics_sink.invocations
+        # the uploads run in parallel: every record takes the 50 ms of its own upload
+        assert metrics.histograms["record"].count == 10
+        assert metrics.histograms["record"].percentile(0) >= 45